@@ -1,21 +1,48 @@
 import os
 import random # Rastgele tür seçimi için eklendi
 import traceback # Hata ayıklama için eklendi
-from flask import Flask, request, jsonify, redirect, url_for, session
+import heapq
+import threading
+import json
+import atexit
+from functools import wraps
+import sqlite3
+import time
+import hmac
+from flask import Flask, Response, g, request, jsonify, redirect, url_for, session
 from flask_cors import CORS
-import spotipy
 from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials # Client Credentials eklendi
 from spotipy import SpotifyException
 import logging
+import numpy as np
 from urllib.parse import quote_plus # URL encoding için eklendi
+from cache import TTLCache
+from concurrency import iter_parallel, run_parallel, UpstreamTimeoutError
+from spotify_client import SpotifyClientManager, use_accounts_url
+from token_refresh import TokenRefresher, TokenRefreshUnavailable, TOKEN_REFRESH_BACKOFF
+from scheduler import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from catalog import TrackCatalog
+from genre_graph import GenreGraph
+from ranking import diversify
+from session_store import ServerSideSessionInterface, create_session_backend, compact_user_data
+from recommendation_pool import RecommendationPool
+from projection import FastJSONProvider, FieldsSyntaxError, parse_fields, project
+from etags import content_digest, make_etag
+from metadata_store import MetadataStore
+from coalescing import RequestCoalescer, ConcurrencyLimitExceeded, COALESCE_RETRY_AFTER
+from metrics import registry as metrics_registry, register_cache_metrics, HTTP_REQUEST_SECONDS, COALESCED_REQUESTS, CONCURRENCY_REJECTIONS, METRICS_TOKEN
+from profiling import SamplingProfiler, profiling_requested, PROFILING_HEADER
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app) # orjson kuruluysa onu kullanır
 
 # CORS ayarları
 # Geliştirme ortamı için frontend'in çalıştığı adresi belirtin.
 # Üretimde daha kısıtlı bir origin listesi kullanın.
-CORS(app, resources={r"/*": {"origins": ["http://127.0.0.1:5500", "http://localhost:5500"]}}, supports_credentials=True)
+# ETag ve Retry-After başlıkları frontend JavaScript'inden okunabilsin diye dışa açılır.
+CORS(app, resources={r"/*": {"origins": ["http://127.0.0.1:5500", "http://localhost:5500"]}}, supports_credentials=True,
+     expose_headers=["ETag", "Retry-After", "X-Profile-File"])
 
 # Logging ayarı
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
@@ -39,6 +66,10 @@ missing_vars = []
 if not SPOTIPY_CLIENT_ID: missing_vars.append("SPOTIPY_CLIENT_ID")
 if not SPOTIPY_CLIENT_SECRET: missing_vars.append("SPOTIPY_CLIENT_SECRET")
 
+# Oturum verisi (token ve kullanıcı bilgisi) sunucuda tutulur; cookie'de sadece imzalı oturum ID'si bulunur.
+# SESSION_BACKEND: 'memory' (varsayılan, tek süreç) veya 'sqlite' (SESSION_SQLITE_PATH, worker'lar arası paylaşılır)
+app.session_interface = ServerSideSessionInterface(create_session_backend())
+
 if app.secret_key == "123!@#":
     logger.warning("Varsayılan FLASK_SECRET_KEY kullanılıyor. Lütfen üretim ortamı için güvenli bir anahtar ayarlayın (FLASK_SECRET_KEY ortam değişkeni).")
 
@@ -50,26 +81,33 @@ if missing_vars:
 # --- Spotify İstemcileri ---
 sp_oauth = None
 sp_cc = None
-AVAILABLE_GENRE_SEEDS = ['pop', 'rock', 'electronic', 'hip-hop', 'latin', 'jazz', 'classical', 'turkish pop', 'r-n-b', 'indie', 'dance', 'metal', 'alternative', 'acoustic', 'chill', 'country', 'funk', 'reggae', 'soul'] # Başlangıç için varsayılan liste
+sp_cc_background = None # Önbellek yenileme gibi arka plan işleri için (düşük öncelik)
+# Tüm Spotify çağrıları (OAuth token istekleri dahil) aynı bağlantı havuzunu kullanır
+spotify_clients = SpotifyClientManager()
+AVAILABLE_GENRE_SEEDS = ['pop', 'rock', 'electronic', 'hip-hop', 'latin', 'jazz', 'classical', 'turkish pop', 'r-n-b', 'indie', 'dance', 'metal', 'alternative', 'acoustic', 'chill', 'country', 'funk', 'reggae', 'soul'] # Tür grafı (genre_graph) henüz boşken kullanılan başlangıç listesi
 
 try:
     # Spotify OAuth (Kullanıcı Girişi İçin)
-    sp_oauth = SpotifyOAuth(
+    # SPOTIFY_API_URL / SPOTIFY_ACCOUNTS_URL ile sahte bir sunucuya yönlendirilebilir (bkz. bench/)
+    sp_oauth = use_accounts_url(SpotifyOAuth(
         client_id=SPOTIPY_CLIENT_ID,
         client_secret=SPOTIPY_CLIENT_SECRET,
         redirect_uri=SPOTIPY_REDIRECT_URI,
         scope=SPOTIPY_SCOPES,
-        show_dialog=True # Her seferinde yetki ekranını gösterir (geliştirme için kullanışlı)
-    )
+        show_dialog=True, # Her seferinde yetki ekranını gösterir (geliştirme için kullanışlı)
+        requests_session=spotify_clients.session
+    ))
 
     # Spotify Client Credentials (Genel API Erişimi İçin)
-    client_credentials_manager = SpotifyClientCredentials(
+    client_credentials_manager = use_accounts_url(SpotifyClientCredentials(
         client_id=SPOTIPY_CLIENT_ID,
-        client_secret=SPOTIPY_CLIENT_SECRET
-    )
-    sp_cc = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+        client_secret=SPOTIPY_CLIENT_SECRET,
+        requests_session=spotify_clients.session
+    ))
+    sp_cc = spotify_clients.app_client(client_credentials_manager)
+    sp_cc_background = spotify_clients.app_client(client_credentials_manager, priority=PRIORITY_BACKGROUND)
 
-    logger.info(f"Statik tür listesi kullanılıyor ({len(AVAILABLE_GENRE_SEEDS)} adet).")
+    logger.info(f"Statik tür listesi yedek olarak kullanılıyor ({len(AVAILABLE_GENRE_SEEDS)} adet).")
 
 except SpotifyException as e:
     logger.error(f"Spotify istemcisi başlatılırken Spotify API hatası: {e}")
@@ -80,11 +118,632 @@ except Exception as e:
     exit(1)
 
 
+# --- Dinleme Geçmişi Önbelleği ---
+# Top artist/track verileri günler içinde değişir; her istekte Spotify'a tekrar gitmeye gerek yok.
+TOP_ITEMS_CACHE_TTL = int(os.environ.get("TOP_ITEMS_CACHE_TTL", 6 * 60 * 60)) # saniye
+TOP_ITEMS_CACHE_SIZE = int(os.environ.get("TOP_ITEMS_CACHE_SIZE", 4096)) # (kullanıcı, tür, time_range) kaydı
+TOP_ITEMS_FETCH_LIMIT = 20 # Tek çağrıda alınır, rotalar ihtiyaç duydukları kadarını dilimler
+top_items_cache = TTLCache(maxsize=TOP_ITEMS_CACHE_SIZE, ttl=TOP_ITEMS_CACHE_TTL)
+
+
+def get_top_items(sp, user_id, item_type, time_range, limit):
+    """
+    Kullanıcının top artist ('artists') veya top track ('tracks') listesini döndürür.
+    Sonuçlar kullanıcı ve time_range bazında önbelleğe alınır; önbellekte yoksa Spotify'dan çekilir.
+    """
+    key = (user_id, item_type, time_range)
+    items = top_items_cache.get(key)
+    if items is None:
+        logger.debug(f"Kullanıcı {user_id} için top {item_type} ({time_range}) Spotify'dan çekiliyor...")
+        if item_type == 'artists':
+            data = sp.current_user_top_artists(limit=TOP_ITEMS_FETCH_LIMIT, time_range=time_range)
+        else:
+            data = sp.current_user_top_tracks(limit=TOP_ITEMS_FETCH_LIMIT, time_range=time_range)
+        items = [item for item in (data or {}).get('items', []) if item]
+        top_items_cache.set(key, items)
+    else:
+        logger.debug(f"Kullanıcı {user_id} için top {item_type} ({time_range}) önbellekten alındı.")
+    return items[:limit]
+
+
+def invalidate_user_caches(user_id):
+    """Kullanıcıya ait önbellek kayıtlarını temizler (örn: çıkış yapıldığında)."""
+    removed = top_items_cache.invalidate(lambda key: key[0] == user_id)
+    if user_playlists_cache.pop(user_id) is not None:
+        removed += 1
+    recommendation_pool.forget(user_id)
+    logger.debug(f"Kullanıcı {user_id} için {removed} adet önbellek kaydı silindi.")
+
+
+# --- Arama Sonucu Önbelleği (Tüm Kullanıcılar İçin Ortak) ---
+# Aynı sanatçı adları ve "<tür> music" sorguları kullanıcılar arasında çok tekrarlanır.
+# Taze kayıtlar doğrudan, bayat kayıtlar ise arka planda yenilenirken sunulur (stale-while-revalidate).
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 30 * 60)) # saniye
+SEARCH_CACHE_STALE_TTL = int(os.environ.get("SEARCH_CACHE_STALE_TTL", 6 * 60 * 60)) # saniye
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", 2000)) # sorgu sayısı
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL, stale_ttl=SEARCH_CACHE_STALE_TTL)
+_search_revalidating = set()
+_search_revalidating_lock = threading.Lock()
+
+
+def _compact_search_items(items):
+    """Önbellekte yer kaplayan ama kullanılmayan alanları (örn: available_markets) atar."""
+    compact_items = []
+    for item in items:
+        if not item:
+            continue
+        item = {k: v for k, v in item.items() if k != 'available_markets'}
+        if isinstance(item.get('album'), dict):
+            item['album'] = {k: v for k, v in item['album'].items() if k != 'available_markets'}
+        compact_items.append(item)
+    return compact_items
+
+
+def _fetch_search_items(sp, key):
+    query, search_type, market, limit = key
+    results = sp.search(q=query, type=search_type, limit=limit, market=market)
+    items = _compact_search_items(((results or {}).get(f"{search_type}s") or {}).get('items') or [])
+    search_cache.set(key, items)
+    persist_metadata('search', [(json.dumps(key), items)], SEARCH_CACHE_TTL, SEARCH_CACHE_STALE_TTL)
+    return items
+
+
+def _revalidate_search(key):
+    try:
+        _fetch_search_items(sp_cc_background, key)
+        logger.debug(f"Bayat arama önbelleği yenilendi: {key}")
+    except Exception as e:
+        logger.warning(f"Arama önbelleği arka planda yenilenemedi ({key}): {e}")
+    finally:
+        with _search_revalidating_lock:
+            _search_revalidating.discard(key)
+
+
+def cached_search(sp, query, search_type='track', market=None, limit=50):
+    """
+    Spotify search sonuçlarını (items listesi) (query, type, market, limit) anahtarıyla önbellekten döndürür.
+    Bayat kayıt bulunursa hemen döndürülür ve uygulama istemcisi (sp_cc_background) ile arka planda yenilenir.
+    """
+    key = (" ".join(query.split()).lower(), search_type, market, limit)
+    items, is_stale = search_cache.lookup(key)
+    if items is not None:
+        if is_stale:
+            with _search_revalidating_lock:
+                start_revalidation = key not in _search_revalidating
+                _search_revalidating.add(key)
+            if start_revalidation:
+                threading.Thread(target=_revalidate_search, args=(key,), daemon=True).start()
+        logger.debug(f"Arama önbellekten sunuldu: {key} (bayat: {is_stale}) - {search_cache.stats()}")
+        return items
+    return _fetch_search_items(sp, key)
+
+
+# --- Sanatçı Meta Verisi Önbelleği ve Arama İpucu (Seed) Çözümleme ---
+ARTIST_CACHE_TTL = int(os.environ.get("ARTIST_CACHE_TTL", 24 * 60 * 60)) # saniye
+ARTIST_CACHE_SIZE = int(os.environ.get("ARTIST_CACHE_SIZE", 20000)) # sanatçı sayısı
+ARTISTS_BATCH_LIMIT = 50 # sp.artists tek çağrıda en fazla 50 ID kabul eder
+artist_cache = TTLCache(maxsize=ARTIST_CACHE_SIZE, ttl=ARTIST_CACHE_TTL)
+
+
+def _compact_artist(artist):
+    return {
+        "id": artist['id'],
+        "name": artist.get('name'),
+        "genres": artist.get('genres') or [],
+        "popularity": artist.get('popularity'),
+        "images": artist.get('images') or [],
+        "external_urls": artist.get('external_urls') or {},
+    }
+
+
+def remember_artists(artists):
+    """Başka çağrılardan gelen tam sanatçı nesnelerini (örn: top artists) önbelleğe ve kataloğa ekler."""
+    for artist in artists:
+        if artist and artist.get('id') and 'genres' in artist:
+            compact_artist = _compact_artist(artist)
+            artist_cache.set(artist['id'], compact_artist)
+            persist_metadata('artist', [(artist['id'], compact_artist)], ARTIST_CACHE_TTL, METADATA_STORE_TTL)
+    track_catalog.add_artists(artists)
+    genre_graph.add_artists(artists)
+
+
+def get_artists(sp, artist_ids):
+    """
+    Sanatçı meta verilerini ID sırasıyla döndürür. Önbellekte olmayanlar tek (50'lik gruplar halinde)
+    sp.artists çağrısıyla toplu olarak çekilir.
+    """
+    artists = {}
+    missing_ids = []
+    for artist_id in dict.fromkeys(artist_ids):
+        artist = artist_cache.get(artist_id)
+        if artist is None:
+            missing_ids.append(artist_id)
+        else:
+            artists[artist_id] = artist
+    for start in range(0, len(missing_ids), ARTISTS_BATCH_LIMIT):
+        batch = missing_ids[start:start + ARTISTS_BATCH_LIMIT]
+        logger.debug(f"{len(batch)} adet sanatçı bilgisi Spotify'dan toplu olarak çekiliyor...")
+        response = sp.artists(batch)
+        for artist in (response or {}).get('artists') or []:
+            if artist and artist.get('id'):
+                artists[artist['id']] = _compact_artist(artist)
+                artist_cache.set(artist['id'], artists[artist['id']])
+                persist_metadata('artist', [(artist['id'], artists[artist['id']])], ARTIST_CACHE_TTL, METADATA_STORE_TTL)
+    track_catalog.add_artists(artists.values())
+    genre_graph.add_artists(artists.values())
+    return [artists[artist_id] for artist_id in artist_ids if artist_id in artists]
+
+
+def resolve_search_seeds(sp, user_id, time_range='short_term', limit=5):
+    """
+    Kullanıcının dinleme geçmişinden arama ipuçlarını (query, query_basis) listesi olarak çıkarır.
+    Önce tüm top artist'ler, yoksa tüm top track'lerin sanatçıları ve türleri kullanılır.
+    Top track'lerin sanatçı ID'leri zaten yanıtın içinde olduğundan ek olarak en fazla bir toplu
+    sp.artists çağrısı yapılır (önbellek doluysa hiç yapılmaz).
+    (seeds, taste_artists) döndürür; taste_artists zevk vektörü için kullanılan sanatçılardır.
+    Hiç ipucu yoksa ikisi de boş liste olur.
+    """
+    # Top artist ve top track birbirinden bağımsız; soğuk önbellekte ikisi paralel çekilir.
+    top_items = run_parallel({
+        'artists': lambda: get_top_items(sp, user_id, 'artists', time_range, limit),
+        'tracks': lambda: get_top_items(sp, user_id, 'tracks', time_range, limit),
+    })
+    top_tracks = top_items['tracks']
+    remember_tracks(top_tracks)
+    top_artists = [artist for artist in top_items['artists'] if artist.get('name')]
+    if top_artists:
+        remember_artists(top_artists)
+        return [(artist['name'], f"en çok dinlenen sanatçı ({artist['name']})") for artist in top_artists], top_artists
+
+    artist_ids = [artist['id'] for track in top_tracks for artist in (track.get('artists') or [])[:1] if artist and artist.get('id')]
+    if not artist_ids:
+        return [], []
+
+    seeds = []
+    taste_artists = get_artists(sp, artist_ids)
+    for artist in taste_artists:
+        if artist.get('genres'):
+            seeds.extend((f"{genre} music", f"en çok dinlenen şarkının türü ({genre})") for genre in artist['genres'])
+        elif artist.get('name'):
+            seeds.append((artist['name'], f"en çok dinlenen şarkının sanatçısı ({artist['name']})"))
+    return seeds, taste_artists
+
+
+# --- Yerel Şarkı Kataloğu ---
+# Görülen tüm şarkı/sanatçılar burada birikir; öneriler kullanıcının zevk vektörüne göre katalogdan sıralanır.
+RECOMMENDATION_COUNT = 12
+CATALOG_CANDIDATE_POOL = int(os.environ.get("CATALOG_CANDIDATE_POOL", 1000)) # Çeşitlilik sıralamasına girecek en iyi aday sayısı
+CATALOG_MIN_MATCHES = int(os.environ.get("CATALOG_MIN_MATCHES", 200)) # Katalogda bu kadar eşleşme varsa canlı arama atlanır
+track_catalog = TrackCatalog()
+_catalog_enrich_pending = set()
+_catalog_enrich_lock = threading.Lock()
+
+
+def _enrich_catalog_artists(artist_ids):
+    try:
+        get_artists(sp_cc_background, artist_ids) # get_artists sonuçları kataloğa da ekler
+    except Exception as e:
+        logger.warning(f"Katalog için sanatçı türleri alınamadı: {e}")
+    finally:
+        with _catalog_enrich_lock:
+            _catalog_enrich_pending.difference_update(artist_ids)
+
+
+def _compact_track(track):
+    """Kataloğun kullandığı alanlar (kalıcı depoda yer kaplamaması için)."""
+    album = track.get('album') or {}
+    return {
+        "id": track['id'],
+        "name": track.get('name'),
+        "popularity": track.get('popularity'),
+        "artists": [{"id": artist['id'], "name": artist.get('name')} for artist in track.get('artists') or [] if artist and artist.get('id')],
+        "album": {"id": album.get('id'), "images": album.get('images') or []},
+    }
+
+
+def remember_tracks(tracks):
+    """Şarkıları kataloğa ekler; katalogda olmayanlar kalıcı depoya da yazılır."""
+    new_tracks = [track for track in tracks if track and track.get('id') and track['id'] not in track_catalog.track_index]
+    track_catalog.add_tracks(tracks)
+    persist_metadata('track', [(track['id'], _compact_track(track)) for track in new_tracks], METADATA_STORE_TTL)
+
+
+def catalog_ingest(tracks):
+    """
+    Şarkıları kataloğa ekler. Türleri bilinmeyen sanatçılar (önce önbellekten, yoksa toplu
+    sp.artists çağrısıyla) arka planda tamamlanır; istek bunu beklemez.
+    """
+    remember_tracks(tracks)
+    artist_ids = {artist['id'] for track in tracks for artist in (track.get('artists') or [])[:1] if artist and artist.get('id')}
+    with _catalog_enrich_lock:
+        artist_ids = [artist_id for artist_id in track_catalog.unknown_artist_ids(artist_ids) if artist_id not in _catalog_enrich_pending]
+        _catalog_enrich_pending.update(artist_ids)
+    if artist_ids:
+        threading.Thread(target=_enrich_catalog_artists, args=(artist_ids,), daemon=True).start()
+
+
+# --- Tür Grafı ---
+# Görülen tüm sanatçı türlerinden öğrenilen tür sıklıkları ve birlikte görülme ilişkileri; az türü olan
+# kullanıcıların zevkini benzer türlerle genişletmek ve geçmişi olmayanlara tür seçmek için kullanılır.
+GENRE_EXPANSION_THRESHOLD = 5 # Kullanıcının bundan az türü varsa benzer türlerle genişletilir
+GENRE_EXPANSION_NEIGHBOURS = 3 # Tür başına eklenecek benzer tür sayısı
+GENRE_EXPANSION_WEIGHT = 0.3 # Benzer türlerin ağırlığı (asıl türün ağırlığı x benzerlik x bu oran)
+genre_graph = GenreGraph()
+try:
+    if genre_graph.load():
+        logger.info(f"Tür grafı yüklendi: {len(genre_graph)} tür ({genre_graph.path}).")
+except (OSError, ValueError) as e:
+    logger.warning(f"Tür grafı yüklenemedi, boş graf ile başlanıyor ({genre_graph.path}): {e}")
+genre_graph.start_autosave()
+atexit.register(genre_graph.save)
+
+
+# --- Kalıcı Meta Veri Deposu ---
+# Sanatçı, şarkı ve arama sonuçları yerel SQLite dosyasına arka planda yazılır; worker'lar başlangıçta
+# önbellekleri ve kataloğu buradan doldurarak yeniden başlatma/deploy sonrası Spotify'a soğuk önbellek
+# yükü bindirmez. Depo açılamazsa uygulama deposuz (sadece bellekte önbellekle) çalışır.
+METADATA_STORE_TTL = int(os.environ.get("METADATA_STORE_TTL", 7 * 24 * 60 * 60)) # saniye; şarkılar ve kataloğa yüklenecek sanatçı türleri
+try:
+    metadata_store = MetadataStore(kind_max_rows={'search': SEARCH_CACHE_SIZE})
+except sqlite3.Error as e:
+    logger.warning(f"Meta veri deposu açılamadı, deposuz devam ediliyor: {e}")
+    metadata_store = None
+
+
+def persist_metadata(kind, items, ttl, stale_ttl=0):
+    """(key, value) çiftlerini kalıcı depoya yazılmak üzere sıraya alır (istek diske yazmayı beklemez)."""
+    if metadata_store is not None and items:
+        metadata_store.put_many(kind, items, ttl, stale_ttl)
+
+
+def warm_caches_from_store():
+    """Sanatçı ve arama önbelleklerini, şarkı kataloğunu ve tür grafını kalıcı depodan doldurur."""
+    started = time.monotonic()
+    artists = list(metadata_store.load('artist'))
+    track_catalog.add_artists(artist for _, artist, _ in artists)
+    genre_graph.add_artists(artist for _, artist, _ in artists)
+    # En son güncellenenler en son eklenir ki LRU sırasında en yeni olarak kalsınlar
+    for artist_id, artist, fresh_remaining in reversed(artists[:ARTIST_CACHE_SIZE]):
+        if fresh_remaining > 0:
+            artist_cache.set(artist_id, artist, ttl=fresh_remaining)
+    tracks = [track for _, track, _ in metadata_store.load('track')]
+    track_catalog.add_tracks(reversed(tracks))
+    searches = list(metadata_store.load('search', limit=SEARCH_CACHE_SIZE))
+    for key, items, fresh_remaining in reversed(searches):
+        search_cache.set(tuple(json.loads(key)), items, ttl=fresh_remaining) # Negatifse bayat olarak yüklenir
+    logger.info(f"Meta veri deposundan yüklendi: {len(artists)} sanatçı, {len(tracks)} şarkı, {len(searches)} arama "
+                f"({time.monotonic() - started:.2f} sn, {metadata_store.path}).")
+
+
+if metadata_store is not None:
+    try:
+        warm_caches_from_store()
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"Meta veri deposundan yüklenemedi, soğuk önbellekle başlanıyor: {e}")
+    metadata_store.start()
+    atexit.register(metadata_store.close)
+
+
+def related_genres(genre_weights, limit=GENRE_EXPANSION_NEIGHBOURS):
+    """Kullanıcının türlerine benzeyen (henüz listede olmayan) türleri {tür: ağırlık} olarak döndürür."""
+    related = {}
+    for genre, weight in genre_weights.items():
+        for other, similarity in genre_graph.related(genre, limit):
+            if other not in genre_weights:
+                related[other] = max(related.get(other, 0), weight * similarity)
+    return related
+
+
+def build_taste(taste_artists):
+    """
+    Sanatçı listesinden (sıra ağırlıklı) tür ve sanatçı ağırlıklarını çıkarır.
+    Tür sayısı azsa tür grafındaki benzer türler düşük ağırlıkla eklenir.
+    """
+    genre_weights = {}
+    artist_weights = {}
+    for rank, artist in enumerate(taste_artists):
+        weight = 1.0 / (1 + rank) ** 0.5
+        artist_weights[artist['id']] = artist_weights.get(artist['id'], 0) + weight
+        for genre in artist.get('genres') or []:
+            genre_weights[genre] = genre_weights.get(genre, 0) + weight
+    if genre_weights:
+        max_weight = max(genre_weights.values())
+        genre_weights = {genre: weight / max_weight for genre, weight in genre_weights.items()}
+        if len(genre_weights) < GENRE_EXPANSION_THRESHOLD:
+            for genre, weight in related_genres(genre_weights).items():
+                genre_weights[genre] = GENRE_EXPANSION_WEIGHT * weight
+    return genre_weights, artist_weights
+
+
+# --- Çoklu İpucu (Multi-Seed) Arama ---
+DEFAULT_SEED_COUNT = int(os.environ.get("DEFAULT_SEED_COUNT", 3)) # Aynı anda kaç ipucu için arama yapılır
+MAX_SEED_COUNT = 5
+DEFAULT_PER_SEED_LIMIT = 50 # İpucu başına istenecek sonuç sayısı (Spotify en fazla 50 döndürür)
+MULTI_SEED_MERGE_LIMIT = 150 # Birleştirilen sonuçlardan en iyi kaç tanesi tutulur
+
+
+def select_seeds(seeds, seed_count, rng=random):
+    """Aynı sorguyu tekrar etmeden en fazla seed_count ipucu seçer (sık geçen ipuçlarının seçilme şansı daha yüksek)."""
+    remaining = list(seeds)
+    selected = {}
+    while remaining and len(selected) < seed_count:
+        query, basis = rng.choice(remaining)
+        selected[query] = basis
+        remaining = [seed for seed in remaining if seed[0] != query]
+    return list(selected.items())
+
+
+def multi_seed_search(sp, seeds, per_seed_limit, k=MULTI_SEED_MERGE_LIMIT):
+    """
+    Her ipucu için aramayı paralel yapar ve sonuçları sınırlı bir top-k heap ile birleştirir.
+    Aynı şarkı (ID veya ISRC) birden fazla ipucundan gelirse en yüksek puanlı olanı tutulur.
+    Puan: ipucu sırası ve sonuçtaki konum (Spotify'ın alaka sırası) + biraz popülerlik.
+    Şarkılar puana göre azalan sırada döndürülür.
+    """
+    results = run_parallel({
+        index: (lambda query=query: cached_search(sp, query, search_type='track', limit=per_seed_limit))
+        for index, (query, _) in enumerate(seeds)
+    })
+    best = {} # ISRC veya ID -> (puan, şarkı)
+    for seed_rank, items in results.items():
+        seed_weight = 1.0 / (1 + 0.25 * seed_rank)
+        for position, track in enumerate(items):
+            if not track.get('id'):
+                continue
+            relevance = 1.0 - position / max(len(items), 1)
+            score = seed_weight * (0.8 * relevance + 0.2 * (track.get('popularity') or 0) / 100)
+            key = (track.get('external_ids') or {}).get('isrc') or track['id']
+            if key not in best or best[key][0] < score:
+                best[key] = (score, track)
+
+    heap = [] # (puan, sıra, şarkı) - en düşük puan en üstte
+    for order, (score, track) in enumerate(best.values()):
+        entry = (score, -order, track)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    return [track for _, _, track in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+def json_body():
+    """İstek gövdesindeki JSON nesnesini döndürür: gövde yoksa veya JSON değilse {}, nesne (dict) değilse None."""
+    body = request.get_json(silent=True)
+    if body is None:
+        return {}
+    return body if isinstance(body, dict) else None
+
+
+def get_int_param(params, name, default, minimum, maximum):
+    """İstek parametresini tam sayıya çevirip [minimum, maximum] aralığına sıkıştırır. Geçersizse ValueError."""
+    value = params.get(name)
+    if value is None or value == '':
+        return default
+    return max(minimum, min(maximum, int(value)))
+
+
+# --- Yanıt Projeksiyonu ---
+# /profile varsayılan olarak sadece frontend'in kullandığı alanları döndürür (ham Spotify nesneleri yerine).
+# İstemci 'fields' parametresiyle (Spotify'ın fields söz dizimiyle) farklı bir alan kümesi isteyebilir.
+PROFILE_FIELDS = (
+    "user(id,display_name,email,images(url),external_urls(spotify)),"
+    "top_artists(id,name,images(url),external_urls(spotify)),"
+    "top_tracks(id,name,artists(id,name),album(name,images(url)),external_urls(spotify)),"
+    "top_genres"
+)
+
+
+def get_fields_param(params, default=None):
+    """İstekteki 'fields' ifadesini ayrıştırır (yoksa default). Geçersizse FieldsSyntaxError; projeksiyon yoksa None."""
+    spec = params.get('fields') or default
+    return parse_fields(spec) if spec else None
+
+
+# --- Playlist İçerik İndeksi ---
+# Playlist'teki şarkı ID'leri bir kez sayfalanıp snapshot_id ile birlikte saklanır. Sonraki eklemelerde
+# sadece snapshot_id kontrol edilir; playlist başka yerden değişmediyse yeniden sayfalama yapılmaz.
+# Çok büyük playlist'ler için indeks tutulmaz (track_ids=None); ekleme tekrar kontrolü yapılmadan yapılır.
+PLAYLIST_INDEX_TTL = int(os.environ.get("PLAYLIST_INDEX_TTL", 60 * 60)) # saniye
+PLAYLIST_INDEX_SIZE = int(os.environ.get("PLAYLIST_INDEX_SIZE", 2000)) # playlist sayısı
+PLAYLIST_INDEX_MAX_PAGES = int(os.environ.get("PLAYLIST_INDEX_MAX_PAGES", 20)) # İndeks için en fazla kaç sayfa (100 şarkı) çekilir
+PLAYLIST_INDEX_MAX_WAIT = float(os.environ.get("PLAYLIST_INDEX_MAX_WAIT", 1)) # İndeks sayfaları sırada en fazla kaç saniye bekler
+PLAYLIST_INDEX_RETRY_AFTER = int(os.environ.get("PLAYLIST_INDEX_RETRY_AFTER", 30)) # Oluşturulamayan indeks kaç saniye sonra yeniden denenir
+PLAYLIST_ITEMS_PAGE_LIMIT = 100 # playlist_items ve playlist_add_items tek çağrıda en fazla 100 şarkı kabul eder
+PLAYLIST_BULK_ADD_MAX = int(os.environ.get("PLAYLIST_BULK_ADD_MAX", 500)) # Tek istekte eklenebilecek en fazla şarkı
+# İndeks sayfalarındaki şarkılar kataloğa da eklenir; bu yüzden ID'nin yanında kataloğun kullandığı alanlar da istenir
+PLAYLIST_ITEM_FIELDS = "items(track(id,name,popularity,external_ids,artists(id,name),album(id,images)))"
+PLAYLIST_INDEX_FIELDS = f"snapshot_id,tracks(total,{PLAYLIST_ITEM_FIELDS})" # İlk sayfa snapshot_id ile aynı çağrıda gelir
+playlist_index_cache = TTLCache(maxsize=PLAYLIST_INDEX_SIZE, ttl=PLAYLIST_INDEX_TTL) # playlist_id -> {snapshot_id, track_ids}
+
+
+def to_track_id(track_uri_or_id):
+    """'spotify:track:<id>' URI'sini veya çıplak ID'yi şarkı ID'sine çevirir."""
+    return track_uri_or_id.rsplit(':', 1)[-1] if track_uri_or_id.startswith('spotify:track:') else track_uri_or_id
+
+
+def _item_tracks(items):
+    return [item['track'] for item in items if item and item.get('track') and item['track'].get('id')]
+
+
+def get_playlist_index(sp, playlist_id, page_sp=None):
+    """
+    Playlist'in {snapshot_id, track_ids} indeksini döndürür.
+    Önbellekteki indeks için sadece snapshot_id sorgulanır (tek çağrı). İndeks yoksa veya playlist
+    değişmişse ilk sayfa snapshot_id ile aynı çağrıda alınır, kalan sayfalar ise page_sp ile (arka plan
+    önceliği, kısa sıra beklemesi) sırayla çekilir; böylece büyük bir playlist kullanıcının etkileşimli
+    bütçesini tüketmez, bütçe doluysa ekleme indekssiz yapılır (bkz. add_tracks_to_playlist).
+    Playlist PLAYLIST_INDEX_MAX_PAGES sayfadan büyükse track_ids=None olan (indekssiz) bir kayıt döner.
+    """
+    cached = playlist_index_cache.get(playlist_id)
+    if cached and cached['track_ids'] is None:
+        return cached
+    playlist = sp.playlist(playlist_id, fields='snapshot_id' if cached else PLAYLIST_INDEX_FIELDS)
+    if cached and cached['snapshot_id'] == playlist.get('snapshot_id'):
+        logger.debug(f"Playlist {playlist_id} indeksi önbellekten alındı.")
+        return cached
+    if cached:
+        logger.debug(f"Playlist {playlist_id} değişmiş (snapshot_id farklı), indeks yeniden oluşturuluyor...")
+        playlist = sp.playlist(playlist_id, fields=PLAYLIST_INDEX_FIELDS)
+
+    tracks = playlist.get('tracks') or {}
+    first_items = tracks.get('items') or []
+    offsets = range(len(first_items), tracks.get('total') or 0, PLAYLIST_ITEMS_PAGE_LIMIT)
+    if len(offsets) + 1 > PLAYLIST_INDEX_MAX_PAGES:
+        logger.info(f"Playlist {playlist_id} indekslenemeyecek kadar büyük ({tracks.get('total')} şarkı), indeks tutulmayacak.")
+        index = {"snapshot_id": playlist.get('snapshot_id'), "track_ids": None}
+        playlist_index_cache.set(playlist_id, index)
+        return index
+
+    page_sp = page_sp or sp
+    playlist_tracks = _item_tracks(first_items)
+    for offset in offsets:
+        page = page_sp.playlist_items(playlist_id, fields=PLAYLIST_ITEM_FIELDS, limit=PLAYLIST_ITEMS_PAGE_LIMIT,
+                                      offset=offset, additional_types=('track',))
+        playlist_tracks.extend(_item_tracks((page or {}).get('items') or []))
+    catalog_ingest(playlist_tracks)
+    track_ids = {track['id'] for track in playlist_tracks}
+    index = {"snapshot_id": playlist.get('snapshot_id'), "track_ids": frozenset(track_ids)}
+    playlist_index_cache.set(playlist_id, index)
+    logger.debug(f"Playlist {playlist_id} indeksi oluşturuldu: {len(track_ids)} şarkı, {len(offsets) + 1} sayfa.")
+    return index
+
+
+def add_tracks_to_playlist(sp, playlist_id, track_ids, page_sp=None):
+    """
+    Şarkıları playlist'e 100'lük gruplar halinde ekler; playlist'te zaten olanlar ve tekrarlar atlanır.
+    Her başarılı eklemeden sonra indeks, dönen snapshot_id ile güncellenir (yeniden sayfalama gerekmez).
+    İndeks oluşturulamazsa (playlist çok büyük, istek bütçesi dolu veya zaman aşımı) ekleme başarısız
+    olmaz; sadece istekteki tekrarlar atlanarak doğrudan eklenir. Bütçe/zaman aşımı durumunda indeks
+    PLAYLIST_INDEX_RETRY_AFTER saniye boyunca yeniden denenmez.
+    (added_ids, skipped_ids, snapshot_id) döndürür.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    try:
+        index = get_playlist_index(sp, playlist_id, page_sp)
+    except (SpotifyException, UpstreamTimeoutError) as e:
+        if isinstance(e, SpotifyException) and e.http_status != 429:
+            raise
+        logger.warning(f"Playlist {playlist_id} indeksi oluşturulamadı, tekrar kontrolü yapılmadan eklenecek: {e}")
+        index = {"snapshot_id": None, "track_ids": None}
+        # Bütçe doluyken sonraki eklemeler de indeksi yeniden denemesin
+        playlist_index_cache.set(playlist_id, index, ttl=PLAYLIST_INDEX_RETRY_AFTER)
+    known_ids = index['track_ids'] or frozenset()
+    new_ids = [track_id for track_id in track_ids if track_id not in known_ids]
+    skipped_ids = [track_id for track_id in track_ids if track_id in known_ids]
+    added_ids = []
+    snapshot_id = index['snapshot_id']
+    try:
+        for start in range(0, len(new_ids), PLAYLIST_ITEMS_PAGE_LIMIT):
+            chunk = new_ids[start:start + PLAYLIST_ITEMS_PAGE_LIMIT]
+            response = sp.playlist_add_items(playlist_id, [f'spotify:track:{track_id}' for track_id in chunk])
+            snapshot_id = (response or {}).get('snapshot_id')
+            added_ids.extend(chunk)
+    finally:
+        # Yarıda kalan eklemelerde de eklenen kısım indekse yansıtılır; snapshot_id yoksa indeks geçersizdir
+        # İndekssiz playlist'lerin kaydı (track_ids=None) olduğu gibi bırakılır
+        if added_ids and snapshot_id and index['track_ids'] is not None:
+            playlist_index_cache.set(playlist_id, {"snapshot_id": snapshot_id, "track_ids": index['track_ids'] | set(added_ids)})
+        elif added_ids and index['track_ids'] is not None:
+            playlist_index_cache.pop(playlist_id)
+    return added_ids, skipped_ids, snapshot_id
+
+
+# --- Kullanıcı Playlist Listesi ---
+# İlk sayfadaki 'total' ile kalan sayfalar en fazla PLAYLISTS_PAGE_CONCURRENCY'lik gruplar halinde paralel
+# çekilir. Liste kısa süre taze kabul edilir; sonrasında sadece ilk sayfa çekilip toplam sayı ve playlist'lerin
+# snapshot_id'leri karşılaştırılır, değişiklik yoksa önbellekteki liste (tek çağrıyla) yeniden kullanılır.
+# İlk sayfa sonraki sayfalardaki değişiklikleri göstermediği için bu kısayol sadece son tam çekimden
+# PLAYLISTS_FULL_REFRESH_INTERVAL saniye sonrasına kadar kullanılır; sonrasında liste tamamen yeniden çekilir.
+PLAYLISTS_PAGE_LIMIT = 50 # current_user_playlists tek çağrıda en fazla 50 playlist döndürür
+PLAYLISTS_PAGE_CONCURRENCY = int(os.environ.get("PLAYLISTS_PAGE_CONCURRENCY", 8)) # Aynı anda en fazla kaç sayfa çekilir
+PLAYLISTS_FULL_REFRESH_INTERVAL = int(os.environ.get("PLAYLISTS_FULL_REFRESH_INTERVAL", 5 * 60)) # saniye
+PLAYLISTS_CACHE_TTL = int(os.environ.get("PLAYLISTS_CACHE_TTL", 60)) # saniye
+PLAYLISTS_CACHE_STALE_TTL = int(os.environ.get("PLAYLISTS_CACHE_STALE_TTL", 30 * 60)) # saniye
+PLAYLISTS_CACHE_SIZE = int(os.environ.get("PLAYLISTS_CACHE_SIZE", 4096)) # kullanıcı sayısı
+user_playlists_cache = TTLCache(maxsize=PLAYLISTS_CACHE_SIZE, ttl=PLAYLISTS_CACHE_TTL, stale_ttl=PLAYLISTS_CACHE_STALE_TTL) # user_id -> (playlists, son tam çekim zamanı)
+
+
+def _compact_playlists(response):
+    return [{"id": playlist['id'], "name": playlist.get('name'), "snapshot_id": playlist.get('snapshot_id')}
+            for playlist in (response or {}).get('items') or [] if playlist and playlist.get('id')]
+
+
+def _drop_stale_playlist_indexes(playlists):
+    """snapshot_id'si değişmiş playlist'lerin içerik indekslerini siler (bir sonraki eklemede yeniden oluşturulur)."""
+    for playlist in playlists:
+        index = playlist_index_cache.peek(playlist['id'])
+        if index and index['snapshot_id'] != playlist['snapshot_id']:
+            playlist_index_cache.pop(playlist['id'])
+
+
+def iter_user_playlists(sp, user_id):
+    """
+    Kullanıcının tüm playlist'lerini sayfa sayfa (her biri {id, name, snapshot_id} listesi) üretir.
+    İlk sayfa hemen, kalan sayfalar PLAYLISTS_PAGE_CONCURRENCY'lik gruplar halinde paralel çekilip sırayla,
+    hazır oldukça üretilir. Önbellekten sunulduğunda tüm liste tek sayfa olarak gelir.
+    """
+    cached, is_stale = user_playlists_cache.lookup(user_id)
+    if cached is not None and not is_stale:
+        logger.debug(f"Kullanıcı {user_id} playlist listesi önbellekten alındı.")
+        yield cached[0]
+        return
+
+    first_response = sp.current_user_playlists(limit=PLAYLISTS_PAGE_LIMIT, offset=0)
+    first_page = _compact_playlists(first_response)
+    total = (first_response or {}).get('total') or len(first_page)
+    if cached is not None:
+        cached_playlists, fetched_at = cached
+        if len(cached_playlists) == total and cached_playlists[:len(first_page)] == first_page and \
+                time.monotonic() - fetched_at < PLAYLISTS_FULL_REFRESH_INTERVAL:
+            logger.debug(f"Kullanıcı {user_id} playlist listesi değişmemiş, önbellek yenilendi.")
+            user_playlists_cache.set(user_id, cached)
+            yield cached_playlists
+            return
+
+    fetched_at = time.monotonic()
+    playlists = list(first_page)
+    _drop_stale_playlist_indexes(first_page)
+    yield first_page
+    offsets = range(PLAYLISTS_PAGE_LIMIT, total, PLAYLISTS_PAGE_LIMIT)
+    for start in range(0, len(offsets), PLAYLISTS_PAGE_CONCURRENCY):
+        pages = iter_parallel({
+            offset: (lambda offset=offset: sp.current_user_playlists(limit=PLAYLISTS_PAGE_LIMIT, offset=offset))
+            for offset in offsets[start:start + PLAYLISTS_PAGE_CONCURRENCY]
+        })
+        for _, response in pages:
+            page = _compact_playlists(response)
+            playlists.extend(page)
+            _drop_stale_playlist_indexes(page)
+            yield page
+    logger.debug(f"Kullanıcı {user_id} için {len(playlists)}/{total} playlist çekildi.")
+    user_playlists_cache.set(user_id, (playlists, fetched_at))
+
+
+def wants_stream():
+    """İstemci NDJSON akışı istediyse (?stream=1 veya Accept: application/x-ndjson) True döner."""
+    return request.args.get('stream', '').lower() in ('1', 'true') or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def ndjson_line(record):
+    """Bir kaydı NDJSON akışının bir satırına çevirir."""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
 # --- Token Yardımcı Fonksiyonu ---
+# Aynı kullanıcının eşzamanlı istekleri tek bir yenilemeyi paylaşır; süresi dolmak üzere olan
+# token'lar istek beklemeden arka planda yenilenir.
+token_refresher = TokenRefresher(
+    sp_oauth,
+    on_refresh=lambda old_token_info, new_token_info: spotify_clients.evict(old_token_info['access_token']) # Eski token'a ait istemciyi at
+)
+
+
 def get_token():
     """
-    Session'dan token bilgisini alır. Süresi dolmuşsa yenilemeye çalışır.
-    Başarısız olursa veya token yoksa None döner.
+    Session'dan token bilgisini alır. Süresi dolmuşsa yenilemeye çalışır, dolmak üzereyse
+    arka planda yenilemeyi başlatır. Başarısız olursa veya token yoksa None döner; yenileme geçici
+    olarak yapılamıyorsa (zaman aşımı) session korunur ve TokenRefreshUnavailable (503) fırlatılır.
     """
     token_info = session.get('token_info')
     if not token_info:
@@ -98,6 +757,12 @@ def get_token():
         return None
 
     try:
+        latest_token_info = token_refresher.latest(token_info)
+        if latest_token_info is not token_info:
+            logger.debug("Arka planda yenilenmiş token session'a yazılıyor.")
+            token_info = latest_token_info
+            session['token_info'] = token_info
+
         if sp_oauth.is_token_expired(token_info):
             logger.info("Spotify token süresi dolmuş, yenileniyor...")
             refresh_token = token_info.get('refresh_token')
@@ -107,14 +772,24 @@ def get_token():
                  session.pop('user_data', None)
                  return None
 
-            new_token_info = sp_oauth.refresh_access_token(refresh_token)
+            try:
+                new_token_info = token_refresher.refresh(token_info)
+            except TokenRefreshUnavailable as e:
+                # Geçici hata: oturum korunur; token henüz gerçekten dolmadıysa (is_token_expired 60 sn erken
+                # True döner) mevcut token ile devam edilir, dolduysa istek 503 ile yanıtlanır.
+                if token_info.get('expires_at', 0) > time.time():
+                    logger.warning(f"{e} Süresi henüz dolmamış mevcut token kullanılıyor.")
+                    return token_info
+                raise
             session['token_info'] = new_token_info
-            logger.info("Token başarıyla yenilendi.")
             return new_token_info
         else:
             logger.debug("Mevcut token hala geçerli.")
+            token_refresher.refresh_ahead_of_expiry(token_info)
             return token_info
 
+    except TokenRefreshUnavailable:
+        raise
     except SpotifyException as e:
         logger.error(f"Token yenilenirken Spotify API hatası: {e}. Kullanıcının tekrar giriş yapması gerekebilir.")
         session.pop('token_info', None)
@@ -126,6 +801,148 @@ def get_token():
         session.pop('user_data', None)
         return None
 
+
+@app.errorhandler(TokenRefreshUnavailable)
+def _token_refresh_unavailable(e):
+    logger.warning(f"{e} İstek 503 ile yanıtlandı: {request.path}")
+    return jsonify({"error": "Spotify oturumu şu anda yenilenemiyor. Lütfen biraz bekleyip tekrar deneyin."}), 503, \
+        {'Retry-After': str(int(TOKEN_REFRESH_BACKOFF))}
+
+
+def get_spotify_client(token_info, priority=PRIORITY_INTERACTIVE, max_wait=None):
+    """Token için havuzlu istemciyi döndürür; kullanıcı başına istek bütçesi session'daki kullanıcı ID'sine göre tutulur."""
+    user_id = (session.get('user_data') or {}).get('id')
+    return spotify_clients.for_token(token_info['access_token'], user_key=user_id, priority=priority, max_wait=max_wait)
+
+
+def rate_limit_headers(e):
+    """429 hatalarında istemciye Retry-After başlığını iletir."""
+    retry_after = (getattr(e, 'headers', None) or {}).get('Retry-After')
+    if e.http_status == 429 and retry_after:
+        return {'Retry-After': retry_after}
+    return {}
+
+
+def conditional_json(etag, build_payload):
+    """
+    Koşullu GET yanıtı: İstemcinin If-None-Match değeri etag ile eşleşirse gövde hiç oluşturulmadan
+    304 döner, aksi halde build_payload() JSON olarak gönderilir. Yanıtlar kullanıcıya özel olduğundan
+    paylaşılan önbelleklerde saklanmaz; tarayıcı her seferinde ETag ile yeniden doğrular.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.update(('Cookie', 'Origin'))
+    return response
+
+
+# --- Eşzamanlı İstek Birleştirme ---
+# Çift tıklama veya birden fazla sekme aynı kullanıcı için aynı isteği aynı anda gönderir; bunlar tek bir
+# hesaplamayı paylaşır. Kullanıcı başına aynı anda çalışan farklı istek sayısı sınırlıdır, sınır aşılırsa
+# istek kuyruğa alınmaz, hemen 429 + Retry-After döner.
+request_coalescer = RequestCoalescer()
+
+
+def _request_key(user_id):
+    """(kullanıcı, rota, normalize edilmiş parametreler, If-None-Match) anahtarı. JSON nesnesi olmayan gövdeler anahtara girmez."""
+    params = {**request.args.to_dict(), **(json_body() or {})}
+    params = json.dumps({name: str(value) for name, value in params.items()}, sort_keys=True)
+    return (user_id, request.method, request.path, params, request.headers.get('If-None-Match'))
+
+
+def _too_many_requests(e):
+    logger.warning(f"{e} İstek reddedildi: {request.path}")
+    CONCURRENCY_REJECTIONS.inc(request.url_rule.rule)
+    return jsonify({"error": "Aynı anda çok fazla istek yapıldı. Lütfen biraz bekleyip tekrar deneyin."}), 429, {'Retry-After': str(COALESCE_RETRY_AFTER)}
+
+
+def coalesced(view):
+    """
+    Rota için eşzamanlı aynı istekleri birleştirir: yanıt bir kez oluşturulur, gövde (bytes), durum kodu ve
+    başlıklar bekleyen isteklerle paylaşılır. Session cookie'si her isteğin kendisi için ayrıca yazılır.
+    Akış (NDJSON) yanıtları paylaşılmaz ama akış bitene kadar kullanıcının eşzamanlı istek sınırına sayılır.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = (session.get('user_data') or {}).get('id')
+        if not user_id:
+            return view(*args, **kwargs)
+
+        if wants_stream():
+            try:
+                request_coalescer.acquire(user_id)
+            except ConcurrencyLimitExceeded as e:
+                return _too_many_requests(e)
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                request_coalescer.release(user_id)
+                raise
+            response.call_on_close(lambda: request_coalescer.release(user_id))
+            return response
+
+        def render():
+            response = app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+        try:
+            (body, status_code, headers), shared = request_coalescer.run(_request_key(user_id), user_id, render)
+        except ConcurrencyLimitExceeded as e:
+            return _too_many_requests(e)
+        if shared:
+            COALESCED_REQUESTS.inc(request.url_rule.rule)
+            logger.debug(f"Eşzamanlı aynı istek paylaşılan yanıtla sunuldu: {request.path} (Kullanıcı: {user_id})")
+        return app.response_class(body, status=status_code, headers=headers)
+    return wrapper
+
+
+# --- Metrikler ve Profilleme ---
+# Rota ve Spotify çağrısı başına süre histogramları, önbellek isabet oranları ve 429/tekrar deneme/token
+# yenileme sayıları /metrics adresinden Prometheus formatında okunur. PROFILING_ENABLED açıksa PROFILING_HEADER
+# başlığıyla gelen istekler örneklenerek profillenir; sonuç PROFILING_DIR'e yazılır (X-Profile-File başlığı).
+register_cache_metrics({
+    "top_items": top_items_cache,
+    "search": search_cache,
+    "artist": artist_cache,
+    "playlist_index": playlist_index_cache,
+    "user_playlists": user_playlists_cache,
+})
+metrics_registry.callback("track_catalog_tracks", "Yerel katalogdaki şarkı sayısı.", "gauge", (), lambda: {(): len(track_catalog)})
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    if profiling_requested(request.headers.get(PROFILING_HEADER)):
+        g.profiler = SamplingProfiler().start()
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method, str(response.status_code))
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        try:
+            response.headers['X-Profile-File'] = profiler.save(route.strip('/').replace('/', '_') or 'index')
+            logger.info(f"{route} profillendi: {profiler.samples} örnek, {profiler.elapsed * 1000:.1f} ms ({response.headers['X-Profile-File']}).")
+        except OSError as e:
+            logger.warning(f"Profil sonucu kaydedilemedi: {e}")
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        return jsonify({"error": "Yetkisiz."}), 401
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 # --- Rotalar ---
 @app.route('/')
 def index():
@@ -203,7 +1020,7 @@ def fetch_and_store_user_data():
              session.pop('user_data', None)
              return redirect(f"{FRONTEND_URL}?error=internal_error_token")
 
-        sp = spotipy.Spotify(auth=access_token)
+        sp = spotify_clients.for_token(access_token)
         user_data = sp.me()
         if not user_data or 'id' not in user_data:
              logger.error(f"Spotify API'den geçerli kullanıcı verisi alınamadı: {user_data}")
@@ -212,7 +1029,8 @@ def fetch_and_store_user_data():
         user_id = user_data['id']
         username = user_data.get('display_name', user_id)
 
-        session['user_data'] = user_data
+        invalidate_user_caches(user_id) # Yeni girişte dinleme geçmişini tazeden çek
+        session['user_data'] = compact_user_data(user_data) # Sadece rotaların kullandığı alanlar saklanır
         logger.info(f"Kullanıcı bilgileri session'a kaydedildi: {username} ({user_id})")
 
         logger.info(f"Kullanıcı verileri başarıyla çekildi. Frontend'e yönlendiriliyor: {FRONTEND_URL}")
@@ -246,7 +1064,7 @@ def get_user_data_from_session():
     if user_data and token_info:
         username = user_data.get('display_name', user_data.get('id', 'N/A'))
         logger.info(f"Mevcut kullanıcı verisi döndürülüyor: {username}")
-        return jsonify(user_data)
+        return conditional_json(make_etag('user_data', content_digest(user_data, memo=False)), lambda: user_data)
     elif user_data and not token_info:
         logger.warning("Kullanıcı verisi var ama token geçersiz/yenilenemedi. Tekrar giriş gerekli.")
         session.pop('user_data', None)
@@ -260,16 +1078,257 @@ def get_user_data_from_session():
 def logout():
     user_id = session.get('user_data', {}).get('id', 'Bilinmeyen Kullanıcı')
     logger.info(f"Kullanıcı {user_id} oturumu sonlandırılıyor.")
+    invalidate_user_caches(user_id)
     session.pop('token_info', None)
     session.pop('user_data', None)
     return jsonify({"message": "Başarıyla çıkış yapıldı."})
 
 
+# --- Öneri Hesaplama ---
+# İstek bağlamından (session, request) bağımsızdır; hem /recommendations hem de arka plandaki öneri
+# havuzu tarafından kullanılır.
+
+
+def choose_recommendation_seeds(sp, user_id, seed_count, rng):
+    """
+    Kullanıcının dinleme geçmişinden seed_count arama ipucu seçer; geçmiş yoksa rastgele popüler türler kullanılır.
+    (selected_seeds, query_basis, taste_artists) döndürür. Tür listesi de boşsa selected_seeds boş olur.
+    """
+    selected_seeds = []
+    logger.debug(f"Kullanıcı {user_id} için arama ipuçları çözümleniyor...")
+    seeds, taste_artists = resolve_search_seeds(sp, user_id)
+    if seeds:
+        selected_seeds = select_seeds(seeds, seed_count, rng)
+        logger.info(f"Kullanıcı {user_id} için {len(seeds)} ipucu arasından {len(selected_seeds)} tanesi seçildi.")
+
+    if selected_seeds and len(selected_seeds) < seed_count:
+        # Az ipucu varsa kullanıcının türlerine benzeyen türlerle tamamla
+        genre_weights = {genre: 1.0 for artist in taste_artists for genre in artist.get('genres') or []}
+        selected_queries = {query for query, _ in selected_seeds}
+        for genre, _ in sorted(related_genres(genre_weights).items(), key=lambda item: item[1], reverse=True):
+            if len(selected_seeds) >= seed_count:
+                break
+            if f"{genre} music" not in selected_queries:
+                selected_seeds.append((f"{genre} music", f"dinlediğiniz türlere benzer tür ({genre})"))
+
+    if not selected_seeds:
+        logger.warning(f"Kullanıcı {user_id} için kişisel arama ipucu bulunamadı. Sık görülen türlerden seçilecek.")
+        # Tür grafından sıklıkla orantılı seçim; graf henüz boşsa (veya yetersizse) statik listeden tamamlanır
+        selected_genres = genre_graph.sample(seed_count, rng)
+        fallback_genres = [genre for genre in AVAILABLE_GENRE_SEEDS if genre not in selected_genres]
+        selected_genres += rng.sample(fallback_genres, min(seed_count - len(selected_genres), len(fallback_genres)))
+        if not selected_genres:
+            logger.error("Kullanılabilir tür listesi boş! Varsayılan arama yapılamıyor.")
+            return [], "", taste_artists
+        selected_seeds = [(f"{genre} music", f"rastgele popüler tür ({genre})") for genre in selected_genres]
+        logger.info(f"Varsayılan arama türleri seçildi: {', '.join(selected_genres)}")
+
+    query_basis = ", ".join(basis for _, basis in selected_seeds)
+    logger.info(f"Kullanılacak Arama Sorguları: {[query for query, _ in selected_seeds]} (Kaynak: {query_basis})")
+    return selected_seeds, query_basis, taste_artists
+
+
+def rank_recommendations(sp, user_id, selected_seeds, query_basis, taste_artists, per_seed_limit, count,
+                         rank_seed=None, exclude_ids=()):
+    """
+    Adayları katalogdan (gerekirse canlı aramayla) toplar, zevk vektörüne göre sıralar ve çeşitliliği
+    gözeterek en fazla count şarkı kartı seçer. Kullanıcının son top track'leri ve exclude_ids hariç tutulur.
+    (cards, query_basis) döndürür; aramaya gerek kalmadıysa query_basis buna göre değişir.
+    """
+    # Kullanıcının zevk vektörüne göre yerel katalogda yeterli eşleşme varsa canlı aramaya gerek yok
+    genre_weights, artist_weights = build_taste(taste_artists)
+    exclude_ids = set(exclude_ids)
+    exclude_ids.update(track['id'] for track in get_top_items(sp, user_id, 'tracks', 'short_term', limit=TOP_ITEMS_FETCH_LIMIT) if track.get('id'))
+    with track_catalog.lock:
+        ranked_rows, ranked_scores, match_count = track_catalog.top_k(genre_weights, CATALOG_CANDIDATE_POOL, artist_weights, exclude_ids)
+        if taste_artists and match_count >= CATALOG_MIN_MATCHES:
+            logger.info(f"Katalogda {match_count} eşleşme bulundu, canlı arama atlanıyor (Kullanıcı: {user_id}).")
+            return select_cards(ranked_rows, ranked_scores, count, rank_seed), "dinleme zevkinize en yakın şarkılar"
+        ranked_ids = track_catalog.ids(ranked_rows) # Satırlar arama sırasında (katalog sıkıştırılırsa) değişebilir
+
+    # Spotify'dan (veya önbellekten) arama sonuçlarını al
+    logger.info(f"Spotify search API {len(selected_seeds)} ipucu için paralel çağrılıyor...")
+    logger.debug(f"Params - seeds: {selected_seeds}, type: 'track', limit: {per_seed_limit}")
+    all_tracks = multi_seed_search(sp, selected_seeds, per_seed_limit)
+    logger.info(f"Spotify search API'den cevap alındı, {len(all_tracks)} tekil sonuç birleştirildi.")
+    catalog_ingest(all_tracks)
+
+    # Katalog adaylarına arama sonuçları eklenir: zevkle eşleşenler katalog puanıyla (katalog tekrar taranmaz,
+    # sadece arama sonuçları puanlanır), eşleşmeyenler arama sırasına göre daha düşük alaka puanıyla
+    with track_catalog.lock:
+        ranked = {}
+        for track_id, score in zip(ranked_ids, ranked_scores.tolist()):
+            row = track_catalog.track_index.get(track_id)
+            if row is not None:
+                ranked[row] = score
+        search_rows = [track_catalog.track_index.get(track['id']) for track in all_tracks if track['id'] not in exclude_ids]
+        search_rows = np.asarray([row for row in dict.fromkeys(search_rows) if row is not None and row not in ranked], dtype=np.int64)
+        search_scores = track_catalog.score_rows(search_rows, genre_weights, artist_weights, exclude_ids=exclude_ids)
+        matched = np.isfinite(search_scores)
+        relevance = list(ranked.values()) + search_scores[matched].tolist()
+        search_base = min(relevance) / 2 if relevance else 1.0
+        unmatched = search_rows[~matched]
+        candidate_rows = np.concatenate([np.fromiter(ranked, dtype=np.int64, count=len(ranked)), search_rows[matched], unmatched])
+        relevance = np.concatenate([np.asarray(relevance, dtype=np.float64),
+                                    search_base * (1 - np.arange(len(unmatched)) / max(len(unmatched), 1))])
+        logger.info(f"{len(candidate_rows)} aday bulundu (katalog eşleşmesi: {match_count}, arama sonucu: {len(all_tracks)}).")
+        return select_cards(candidate_rows, relevance, count, rank_seed), query_basis
+
+
+def select_cards(candidate_rows, relevance, count, rank_seed=None):
+    """
+    Aynı sanatçı/albümden tekrarları cezalandırarak en iyi count adayı seçer ve şarkı kartlarına çevirir.
+    Satırlar katalog kilidi altında elde edilmiş olmalıdır (bkz. TrackCatalog).
+    """
+    with track_catalog.lock:
+        artist_keys, album_keys, popularity = track_catalog.features(candidate_rows)
+        selected = diversify(relevance, artist_keys, album_keys, popularity, count, seed=rank_seed)
+        return track_catalog.cards(candidate_rows[selected].tolist())
+
+
+def iter_recommendation_batches(sp, user_id, selected_seeds, query_basis, taste_artists, per_seed_limit, count,
+                                rank_seed=None, exclude_ids=()):
+    """
+    rank_recommendations'ın akış sürümü: şarkı kartlarını hazır oldukça (cards, query_basis) grupları olarak üretir.
+    Katalogda yeterli eşleşme varsa tüm kartlar tek grupta gelir. Yoksa aramalar paralel yapılır ve her ipucunun
+    sonucu geldikçe (ipucu sırasıyla) o ipucunun adaylarından kalan kotanın payına düşen kadar kart seçilir;
+    ilk kartlar tek bir arama süresinde hazır olur. Toplam kart sayısı en fazla count'tur.
+    """
+    genre_weights, artist_weights = build_taste(taste_artists)
+    exclude_ids = set(exclude_ids)
+    exclude_ids.update(track['id'] for track in get_top_items(sp, user_id, 'tracks', 'short_term', limit=TOP_ITEMS_FETCH_LIMIT) if track.get('id'))
+    cards = None
+    with track_catalog.lock:
+        ranked_rows, ranked_scores, match_count = track_catalog.top_k(genre_weights, CATALOG_CANDIDATE_POOL, artist_weights, exclude_ids)
+        if taste_artists and match_count >= CATALOG_MIN_MATCHES:
+            logger.info(f"Katalogda {match_count} eşleşme bulundu, canlı arama atlanıyor (Kullanıcı: {user_id}).")
+            cards = select_cards(ranked_rows, ranked_scores, count, rank_seed)
+    if cards is not None:
+        yield cards, "dinleme zevkinize en yakın şarkılar"
+        return
+
+    logger.info(f"Spotify search API {len(selected_seeds)} ipucu için paralel çağrılıyor (akış)...")
+    searches = iter_parallel({
+        index: (lambda query=query: cached_search(sp, query, search_type='track', limit=per_seed_limit))
+        for index, (query, _) in enumerate(selected_seeds)
+    })
+    seen_isrcs = set() # Aynı şarkının farklı kayıtları (ISRC) farklı ipuçlarından tekrar gelmesin
+    remaining_seeds = len(selected_seeds)
+    emitted = 0
+    try:
+        for _, items in searches:
+            catalog_ingest(items)
+            quota = -(-(count - emitted) // remaining_seeds) # Kalan kota kalan ipuçlarına eşit bölünür (yukarı yuvarlanır)
+            remaining_seeds -= 1
+            if quota <= 0:
+                continue
+            isrcs = {} # track_id -> isrc
+            for track in items:
+                isrc = (track.get('external_ids') or {}).get('isrc')
+                if track.get('id') and track['id'] not in exclude_ids and isrc not in seen_isrcs:
+                    isrcs.setdefault(track['id'], isrc)
+            with track_catalog.lock:
+                rows = [row for row in (track_catalog.track_index.get(track_id) for track_id in isrcs) if row is not None]
+                if not rows:
+                    continue
+                candidate_rows = np.asarray(list(dict.fromkeys(rows)), dtype=np.int64)
+                # Zevkle eşleşen şarkılar katalog puanıyla, eşleşmeyenler arama sırasına göre daha düşük puanla
+                # sıralanır; sadece bu aramanın sonuçları puanlanır (katalog tekrar taranmaz)
+                scores = track_catalog.score_rows(candidate_rows, genre_weights, artist_weights, exclude_ids=exclude_ids)
+                matched = np.isfinite(scores)
+                search_base = scores[matched].min() / 2 if matched.any() else 1.0
+                relevance = np.where(matched, scores, search_base * (1 - np.arange(len(candidate_rows)) / len(candidate_rows)))
+                cards = select_cards(candidate_rows, relevance, quota, rank_seed)
+            exclude_ids.update(card['id'] for card in cards)
+            seen_isrcs.update(isrcs[card['id']] for card in cards)
+            seen_isrcs.discard(None)
+            emitted += len(cards)
+            yield cards, query_basis
+    finally:
+        searches.close() # İstemci bağlantıyı kapatırsa bekleyen aramalar iptal edilir
+
+
+def recommendations_message(query_basis, found=True):
+    message = f"Sonuçlar '{query_basis}' baz alınarak yapılan aramaya göre gösterilmektedir."
+    if not found:
+         message += " Bu aramaya uygun sonuç bulunamadı."
+    return message
+
+
+def recommendations_payload(cards, query_basis):
+    return {"recommendations": cards, "message": recommendations_message(query_basis, bool(cards))}
+
+
+# --- Öneri Havuzu ---
+# Aktif kullanıcılar için öneriler arka planda önceden hesaplanır; varsayılan parametreli istekler
+# havuzdaki bir sonraki gösterilmemiş sayfayı alır.
+def build_recommendation_pool(user_id, token_info, exclude_ids, count):
+    """Arka plan worker'ı için: kullanıcının (yenilenmiş olabilecek) token'ıyla count öneri hesaplar."""
+    token_info = token_refresher.latest(token_info)
+    if sp_oauth.is_token_expired(token_info):
+        logger.debug(f"Kullanıcı {user_id} için token süresi dolmuş, öneri havuzu bir sonraki isteğe bırakıldı.")
+        return []
+    sp = spotify_clients.for_token(token_info['access_token'], user_key=user_id, priority=PRIORITY_BACKGROUND)
+    rng = random.Random()
+    selected_seeds, query_basis, taste_artists = choose_recommendation_seeds(sp, user_id, DEFAULT_SEED_COUNT, rng)
+    if not selected_seeds:
+        return []
+    cards, query_basis = rank_recommendations(sp, user_id, selected_seeds, query_basis, taste_artists,
+                                              DEFAULT_PER_SEED_LIMIT, count, exclude_ids=exclude_ids)
+    return [(card, query_basis) for card in cards]
+
+
+recommendation_pool = RecommendationPool(build_recommendation_pool)
+
+
 # --- Öneri Rotaları (Search Endpoint'i Kullanarak Güncellendi) ---
 
 
+def recommendations_stream(batches, query_basis, fields=None, on_done=None):
+    """
+    (cards, query_basis) gruplarını NDJSON akışı olarak gönderir: her grup bir {"recommendations": [...]} satırı,
+    en sonda {"message", "query_basis"} özet satırı. Akış tamamlanınca gönderilen tüm kartlarla on_done çağrılır.
+    Akış başladıktan sonraki hatalar {"error"} satırı olarak yazılır.
+    """
+    def generate():
+        sent = []
+        basis = query_basis
+        try:
+            for cards, basis in batches:
+                if not cards:
+                    continue
+                sent.extend(cards)
+                yield ndjson_line(project({"recommendations": cards}, fields))
+            logger.info(f"Başarıyla {len(sent)} adet sonuç akış olarak gönderildi.")
+            yield ndjson_line(project({"message": recommendations_message(basis, bool(sent)), "query_basis": basis}, fields))
+            if on_done:
+                on_done(sent)
+        except SpotifyException as e:
+            logger.error(f"Öneri akışı sırasında Spotify hatası: Status={e.http_status}, Msg={e.msg}")
+            yield ndjson_line({"error": "Spotify'dan arama sonucu alınamadı.", "details": quote_plus(str(e.msg)),
+                               "login_required": e.http_status in [401, 403]})
+        except UpstreamTimeoutError as e:
+            logger.error(f"Öneri akışı sırasında zaman aşımı: {e}")
+            yield ndjson_line({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."})
+        except Exception as e:
+            logger.error(f"Öneri akışı sırasında beklenmedik hata: {e}", exc_info=True)
+            yield ndjson_line({"error": "Arama sonuçları alınırken beklenmedik bir sunucu hatası oluştu."})
+        finally:
+            if hasattr(batches, 'close'):
+                batches.close() # Üreteçse bekleyen aramalar iptal edilir
+    return Response(generate(), mimetype='application/x-ndjson', headers={"X-Accel-Buffering": "no"}) # Proxy tamponlamasın
+
+
 @app.route('/recommendations', methods=['POST'])
+@coalesced
 def get_recommendations_for_user():
+    """
+    Kullanıcıya RECOMMENDATION_COUNT şarkı önerir. Parametresiz istekler önceden hazırlanmış havuzdan
+    (daha önce gösterilmemiş şarkılarla) hemen yanıtlanır; seed_count, per_seed_limit veya seed verilirse
+    öneriler istek içinde hesaplanır.
+    ?stream=1 (veya Accept: application/x-ndjson) ile NDJSON akışı döndürülür: her ipucunun kartları hazır
+    oldukça {"recommendations": [...]} satırları, en sonda {"message", "query_basis"} özet satırı gönderilir.
+    """
     logger.info("Geçmişe dayalı müzik arama isteği alındı.")
     token_info = get_token()
     if not token_info:
@@ -291,57 +1350,43 @@ def get_recommendations_for_user():
              logger.error(f"Kullanıcı {user_id} için access_token alınamadı.")
              session.pop('token_info', None); session.pop('user_data', None)
              return jsonify({"error": "Oturum hatası (token alınamadı). Lütfen tekrar giriş yapın.", "login_required": True}), 401
-        sp = spotipy.Spotify(auth=access_token)
+        sp = get_spotify_client(token_info)
 
-        # 1. Arama için ipucu verileri çek
-        search_query = None
-        query_basis = "rastgele popüler türler"
+        # İstek parametreleri (JSON gövdesi veya query string): kaç ipucu ve ipucu başına kaç sonuç
+        body = json_body()
+        if body is None:
+            return jsonify({"error": "İstek gövdesi bir JSON nesnesi olmalıdır."}), 400
+        params = {**request.args.to_dict(), **body}
+        try:
+            seed_count = get_int_param(params, 'seed_count', DEFAULT_SEED_COUNT, 1, MAX_SEED_COUNT)
+            per_seed_limit = get_int_param(params, 'per_seed_limit', DEFAULT_PER_SEED_LIMIT, 1, DEFAULT_PER_SEED_LIMIT)
+            # seed verilirse ipucu seçimi ve sıralama tekrarlanabilir olur (testler için)
+            rank_seed = get_int_param(params, 'seed', None, 0, 2 ** 32 - 1)
+        except (TypeError, ValueError):
+            return jsonify({"error": "seed_count, per_seed_limit ve seed tam sayı olmalıdır."}), 400
+        try:
+            fields = get_fields_param(params) # örn: "recommendations(id,title),message"
+        except FieldsSyntaxError as e:
+            return jsonify({"error": f"Geçersiz fields ifadesi: {e}"}), 400
+        rng = random.Random(rank_seed)
+        stream = wants_stream()
+
+        # 0. Parametresiz isteklerde önceden hazırlanmış havuzdan bir sonraki sayfayı al
+        use_pool = not any(params.get(name) not in (None, '') for name in ('seed_count', 'per_seed_limit', 'seed'))
+        if use_pool:
+            recommendation_pool.touch(user_id, token_info)
+            page = recommendation_pool.take(user_id, RECOMMENDATION_COUNT)
+            if page:
+                logger.info(f"Kullanıcı {user_id} için {len(page)} öneri hazır havuzdan sunuldu.")
+                if stream:
+                    return recommendations_stream([([card for card, _ in page], page[0][1])], page[0][1], fields)
+                return jsonify(project(recommendations_payload([card for card, _ in page], page[0][1]), fields))
 
+        # 1. Arama için ipucu verileri çek
         try:
-            logger.debug(f"Kullanıcı {user_id} için top artists çekiliyor...")
-            top_artists_data = sp.current_user_top_artists(limit=5, time_range='short_term')
-            if top_artists_data and top_artists_data.get('items'):
-                top_artists = [artist for artist in top_artists_data['items'] if artist and artist.get('name')]
-                if top_artists:
-                    selected_artist = top_artists[0]['name']
-                    search_query = f"{selected_artist}"
-                    query_basis = f"en çok dinlenen sanatçı ({selected_artist})"
-                    logger.info(f"Arama için en çok dinlenen sanatçı bulundu: {selected_artist}")
-
-            if not search_query:
-                logger.debug(f"Kullanıcı {user_id} için top tracks çekiliyor...")
-                top_tracks_data = sp.current_user_top_tracks(limit=5, time_range='short_term')
-                if top_tracks_data and top_tracks_data.get('items'):
-                    track_ids = [track['id'] for track in top_tracks_data['items'] if track and track.get('id')]
-                    if track_ids:
-                        first_track_details = sp.track(track_ids[0])
-                        if first_track_details and first_track_details.get('artists'):
-                            first_artist_id = first_track_details['artists'][0]['id']
-                            if first_artist_id:
-                                artist_details = sp.artist(first_artist_id)
-                                if artist_details and artist_details.get('genres'):
-                                    selected_genre = random.choice(artist_details['genres'])
-                                    search_query = f"{selected_genre} music"
-                                    query_basis = f"en çok dinlenen şarkının türü ({selected_genre})"
-                                    logger.info(f"Arama için en çok dinlenen şarkının türü bulundu: {selected_genre}")
-                                elif artist_details and artist_details.get('name'):
-                                     selected_artist = artist_details['name']
-                                     search_query = f"{selected_artist}"
-                                     query_basis = f"en çok dinlenen şarkının sanatçısı ({selected_artist})"
-                                     logger.info(f"Arama için en çok dinlenen şarkının sanatçısı bulundu: {selected_artist}")
-
-            if not search_query:
-                 logger.warning(f"Kullanıcı {user_id} için kişisel arama ipucu bulunamadı. Rastgele popüler türler kullanılacak.")
-                 if not AVAILABLE_GENRE_SEEDS:
-                      logger.error("Kullanılabilir tür listesi boş! Varsayılan arama yapılamıyor.")
-                      return jsonify({"error": "Arama yapmak için yeterli veri veya yapılandırma bulunamadı."}), 500
-                 else:
-                      selected_genre = random.choice(AVAILABLE_GENRE_SEEDS)
-                      search_query = f"{selected_genre} music"
-                      query_basis = f"rastgele popüler tür ({selected_genre})"
-                      logger.info(f"Varsayılan arama türü seçildi: {selected_genre}")
-
-            logger.info(f"Kullanılacak Arama Sorgusu: '{search_query}' (Kaynak: {query_basis})")
+            selected_seeds, query_basis, taste_artists = choose_recommendation_seeds(sp, user_id, seed_count, rng)
+            if not selected_seeds:
+                return jsonify({"error": "Arama yapmak için yeterli veri veya yapılandırma bulunamadı."}), 500
 
         except SpotifyException as e:
             logger.error(f"Spotify'dan arama ipucu verisi çekilemedi (Kullanıcı: {user_id}): {e}")
@@ -350,25 +1395,31 @@ def get_recommendations_for_user():
             if login_req: session.pop('token_info', None); session.pop('user_data', None)
             # Hata mesajını JSON içinde güvenli hale getir
             safe_details = quote_plus(str(e.msg))
-            return jsonify({"error": f"Spotify dinleme geçmişinize erişirken bir sorun oluştu.", "details": safe_details, "login_required": login_req}), error_status
+            return jsonify({"error": f"Spotify dinleme geçmişinize erişirken bir sorun oluştu.", "details": safe_details, "login_required": login_req}), error_status, rate_limit_headers(e)
+        except UpstreamTimeoutError as e:
+            logger.error(f"Arama ipucu verileri zaman aşımına uğradı (Kullanıcı: {user_id}): {e}")
+            return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
         except Exception as e:
             logger.error(f"Arama ipucu verilerini işlerken beklenmedik hata (Kullanıcı: {user_id}): {e}", exc_info=True)
             return jsonify({"error": "Dinleme geçmişiniz işlenirken beklenmedik bir hata oluştu."}), 500
 
-        # 2. Spotify'dan arama sonuçlarını al
-        search_results = None
+        if stream:
+            # Akışta sadece gösterilecek sayfa hesaplanır. Havuz kullanılıyorsa gösterilenler işaretlenir ve havuz,
+            # akış bittikten sonra (arama sonuçları önbellekteyken) arka planda doldurulur.
+            exclude_ids = recommendation_pool.shown_ids(user_id) if use_pool else ()
+            batches = iter_recommendation_batches(sp, user_id, selected_seeds, query_basis, taste_artists, per_seed_limit,
+                                                  RECOMMENDATION_COUNT, rank_seed=rank_seed, exclude_ids=exclude_ids)
+            def on_done(cards):
+                recommendation_pool.mark_shown(user_id, [card['id'] for card in cards])
+                recommendation_pool.refill(user_id)
+            return recommendations_stream(batches, query_basis, fields, on_done if use_pool else None)
+
+        # 2. Adayları topla, sırala ve seç (havuz kullanılıyorsa havuzun tamamı bir kerede hesaplanır)
         try:
-            logger.info("Spotify search API çağrılıyor...")
-            # Daha fazla çeşitlilik için daha fazla sonuç isteyelim (örn: 50)
-            search_limit = 50
-            logger.debug(f"Params - q: '{search_query}', type: 'track', limit: {search_limit}")
-            search_results = sp.search(
-                q=search_query,
-                type='track',
-                limit=search_limit,
-                #market='TR' # Pazar belirtmek sonuçları iyileştirebilir
-            )
-            logger.info("Spotify search API'den cevap alındı.")
+            count = recommendation_pool.size if use_pool else RECOMMENDATION_COUNT
+            exclude_ids = recommendation_pool.shown_ids(user_id) if use_pool else ()
+            cards, query_basis = rank_recommendations(sp, user_id, selected_seeds, query_basis, taste_artists,
+                                                      per_seed_limit, count, rank_seed=rank_seed, exclude_ids=exclude_ids)
 
         except SpotifyException as e:
              logger.error(f"Spotify search API hatası (Kullanıcı: {user_id}): Status={e.http_status}, Code={e.code}, Msg={e.msg}")
@@ -382,47 +1433,25 @@ def get_recommendations_for_user():
              elif status_code == 429: error_msg = "Çok fazla istek yapıldı. Lütfen biraz bekleyip tekrar deneyin."
              # Hata mesajını JSON içinde güvenli hale getir
              safe_details = quote_plus(str(e.msg))
-             return jsonify({"error": error_msg, "details": safe_details, "login_required": login_req}), status_code
+             return jsonify({"error": error_msg, "details": safe_details, "login_required": login_req}), status_code, rate_limit_headers(e)
+        except UpstreamTimeoutError as e:
+             logger.error(f"Spotify araması zaman aşımına uğradı (Kullanıcı: {user_id}): {e}")
+             return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
         except Exception as e:
              logger.error(f"Spotify arama sonuçları alınırken beklenmedik hata (Kullanıcı: {user_id}): {e}", exc_info=True)
              return jsonify({"error": "Arama sonuçları alınırken beklenmedik bir sunucu hatası oluştu."}), 500
 
-        # 3. Sonucu JSON formatına çevir
-        recommendations_json = []
-        if search_results and search_results.get('tracks') and search_results['tracks'].get('items'):
-            all_tracks = search_results['tracks']['items']
-            logger.info(f"Spotify aramasından {len(all_tracks)} adet potansiyel sonuç bulundu.")
-            # Alınan sonuçlardan rastgele bir alt küme seçelim (örn: 10 tane)
-            sample_size = min(12, len(all_tracks)) # En fazla 10 veya bulunan şarkı sayısı kadar
-            selected_tracks = random.sample(all_tracks, sample_size) if all_tracks else []
-            logger.info(f"Rastgele {len(selected_tracks)} adet sonuç seçildi.")
-
-            for track in selected_tracks:
-                 if track and track.get('id'):
-                    album_art = None
-                    if track.get('album') and isinstance(track['album'].get('images'), list) and track['album']['images']:
-                        images = track['album']['images']
-                        # Orta boy resmi tercih et (genellikle index 1), yoksa ilkini al
-                        album_art = images[1]['url'] if len(images) > 1 else images[0]['url']
-
-                    recommendations_json.append({
-                        "id": track['id'],
-                        "title": track.get('name', 'N/A'),
-                        "artist": ", ".join([artist.get('name', 'N/A') for artist in track.get('artists', []) if artist]),
-                        "album_art_url": album_art,
-                        "spotify_url": track.get('external_urls', {}).get('spotify'),
-                        #"preview_url": track.get('preview_url'), # Önizleme URL'si eklendi
-                    })
-            logger.info(f"Başarıyla {len(recommendations_json)} adet rastgele seçilmiş sonuç formatlandı.")
+        recommendations_json = cards[:RECOMMENDATION_COUNT]
+        if use_pool:
+            # İlk sayfa şimdi gösterilir, kalanlar sonraki istekler için havuza girer
+            recommendation_pool.mark_shown(user_id, [card['id'] for card in recommendations_json])
+            recommendation_pool.fill(user_id, [(card, query_basis) for card in cards[RECOMMENDATION_COUNT:]])
+        if recommendations_json:
+            logger.info(f"Başarıyla {len(recommendations_json)} adet sonuç formatlandı.")
         else:
-            logger.warning(f"Kullanıcı {user_id} için Spotify API aramasından geçerli sonuç ('tracks'/'items') alınamadı veya boş döndü.")
-
-        response_payload = {"recommendations": recommendations_json}
-        response_payload["message"] = f"Sonuçlar '{query_basis}' baz alınarak yapılan aramaya göre gösterilmektedir."
-        if not recommendations_json:
-             response_payload["message"] += " Bu aramaya uygun sonuç bulunamadı."
+            logger.warning(f"Kullanıcı {user_id} için katalogda veya Spotify API aramasında geçerli sonuç bulunamadı.")
 
-        return jsonify(response_payload)
+        return jsonify(project(recommendations_payload(recommendations_json, query_basis), fields))
 
     except Exception as e:
         logger.exception(f"Kişisel arama sırasında kritik hata oluştu (Kullanıcı: {user_id}): {e}")
@@ -431,117 +1460,233 @@ def get_recommendations_for_user():
 # --- YENİ ROTALAR ---
 
 @app.route('/playlists')
+@coalesced
 def get_user_playlists():
-    """Kullanıcının Spotify playlist'lerini listeler."""
+    """
+    Kullanıcının tüm Spotify playlist'lerini [{id, name}] olarak listeler.
+    ?stream=1 (veya Accept: application/x-ndjson) ile her satırı bir playlist olan NDJSON akışı döndürülür;
+    ilk sayfa, kalan sayfalar beklenmeden gönderilir.
+    """
     logger.info("Kullanıcı playlist'leri isteği alındı.")
     token_info = get_token()
     if not token_info:
         return jsonify({"error": "Yetkilendirme gerekli.", "login_required": True}), 401
+    user_id = (session.get('user_data') or {}).get('id')
+    if not user_id:
+        return jsonify({"error": "Oturum hatası. Lütfen tekrar giriş yapın.", "login_required": True}), 401
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        playlists = sp.current_user_playlists(limit=50) # Daha fazla playlist için limit artırılabilir
-        user_playlists = [{"id": pl['id'], "name": pl['name']} for pl in playlists.get('items', []) if pl] # Şimdilik tümünü al
-        logger.info(f"{len(user_playlists)} adet playlist bulundu.")
-        return jsonify(user_playlists)
+        sp = get_spotify_client(token_info)
+        pages = iter_user_playlists(sp, user_id)
+        first_page = next(pages) # İlk sayfadaki hatalar normal hata yanıtı olarak döner
+
+        if wants_stream():
+            def generate():
+                page = first_page
+                try:
+                    while True:
+                        yield "".join(ndjson_line({"id": playlist['id'], "name": playlist['name']}) for playlist in page)
+                        page = next(pages)
+                except StopIteration:
+                    pass
+                except Exception as e:
+                    logger.error(f"Playlist akışı sırasında hata: {e}")
+                    yield ndjson_line({"error": "Playlistlerin bir kısmı alınamadı."})
+            return Response(generate(), mimetype='application/x-ndjson')
+
+        playlists = first_page + [playlist for page in pages for playlist in page]
+        logger.info(f"{len(playlists)} adet playlist bulundu.")
+        # Önbellekten gelen listenin özeti hatırlandığından tekrar eden isteklerde hesaplama yapılmaz
+        etag = make_etag('playlists', content_digest(first_page if len(playlists) == len(first_page) else playlists))
+        return conditional_json(etag, lambda: [{"id": playlist['id'], "name": playlist['name']} for playlist in playlists])
     except SpotifyException as e:
         logger.error(f"Kullanıcı playlist'leri alınırken hata: {e}")
-        status_code = e.http_status if e.http_status in [401, 403] else 500
+        status_code = e.http_status if e.http_status in [401, 403, 429] else 500
         login_req = status_code in [401, 403]
         if login_req: session.pop('token_info', None); session.pop('user_data', None)
         # Hata mesajını JSON içinde güvenli hale getir
         safe_details = quote_plus(str(e.msg))
-        return jsonify({"error": "Playlistler alınamadı.", "details": safe_details, "login_required": login_req}), status_code
+        return jsonify({"error": "Playlistler alınamadı.", "details": safe_details, "login_required": login_req}), status_code, rate_limit_headers(e)
+    except UpstreamTimeoutError as e:
+        logger.error(f"Playlistler alınırken zaman aşımı: {e}")
+        return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
     except Exception as e:
         logger.error(f"Playlist alırken beklenmedik hata: {e}", exc_info=True)
         return jsonify({"error": "Sunucu hatası."}), 500
 
+def playlist_add_error_response(e):
+    """Playlist'e ekleme sırasında oluşan SpotifyException'ı JSON hata yanıtına çevirir."""
+    status_code = e.http_status if e.http_status in [400, 401, 403, 404, 429] else 500
+    login_req = status_code in [401, 403]
+    if login_req: session.pop('token_info', None); session.pop('user_data', None)
+    error_msg = "Şarkı eklenemedi."
+    if status_code == 403: error_msg = "Bu playlist'e şarkı ekleme izniniz yok veya scope eksik."
+    if status_code == 404: error_msg = "Playlist veya şarkı bulunamadı."
+    if status_code == 400: error_msg = "Geçersiz istek (playlist veya şarkı ID'si hatalı olabilir)."
+    if status_code == 429: error_msg = "Çok fazla istek yapıldı. Lütfen biraz bekleyip tekrar deneyin."
+    # Hata mesajını JSON içinde güvenli hale getir
+    safe_details = quote_plus(str(e.msg))
+    return jsonify({"error": error_msg, "details": safe_details, "login_required": login_req}), status_code, rate_limit_headers(e)
+
 @app.route('/playlist/add', methods=['POST'])
 def add_track_to_playlist():
-    """Belirtilen şarkıyı belirtilen playlist'e ekler."""
+    """Belirtilen şarkıyı belirtilen playlist'e ekler (playlist'te zaten varsa eklemez)."""
     logger.info("Playlist'e şarkı ekleme isteği alındı.")
     token_info = get_token()
     if not token_info:
         return jsonify({"error": "Yetkilendirme gerekli.", "login_required": True}), 401
 
-    data = request.get_json()
+    data = json_body()
+    if data is None:
+        return jsonify({"error": "İstek gövdesi bir JSON nesnesi olmalıdır."}), 400
     playlist_id = data.get('playlist_id')
     track_uri_or_id = data.get('track_uri') # Frontend track ID veya URI gönderebilir
 
     if not playlist_id or not track_uri_or_id:
         logger.warning("Eksik bilgi: playlist_id ve track_uri gerekli.")
         return jsonify({"error": "Eksik bilgi: playlist_id ve track_uri gerekli."}), 400
+    if not isinstance(playlist_id, str) or not isinstance(track_uri_or_id, str):
+        return jsonify({"error": "playlist_id ve track_uri metin olmalıdır."}), 400
 
-    # Track ID'yi URI formatına çevir (eğer ID geldiyse)
-    if not track_uri_or_id.startswith('spotify:track:'):
-         track_uri = f'spotify:track:{track_uri_or_id}'
-    else:
-         track_uri = track_uri_or_id
-
-    logger.debug(f"Şarkı {track_uri} playlist {playlist_id}'ye ekleniyor...")
+    track_id = to_track_id(track_uri_or_id)
+    logger.debug(f"Şarkı {track_id} playlist {playlist_id}'ye ekleniyor...")
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        sp.playlist_add_items(playlist_id, [track_uri])
-        logger.info(f"Şarkı {track_uri}, playlist {playlist_id}'ye başarıyla eklendi.")
+        sp = get_spotify_client(token_info)
+        page_sp = get_spotify_client(token_info, PRIORITY_BACKGROUND, PLAYLIST_INDEX_MAX_WAIT)
+        added_ids, _, _ = add_tracks_to_playlist(sp, playlist_id, [track_id], page_sp)
+        if not added_ids:
+            logger.info(f"Şarkı {track_id} zaten playlist {playlist_id}'de, eklenmedi.")
+            return jsonify({"error": "Bu şarkı zaten playlist'te."}), 409
+        logger.info(f"Şarkı {track_id}, playlist {playlist_id}'ye başarıyla eklendi.")
         return jsonify({"message": "Şarkı başarıyla playlist'e eklendi!"})
     except SpotifyException as e:
         logger.error(f"Playlist'e şarkı eklenirken hata: {e}")
-        status_code = e.http_status if e.http_status in [400, 401, 403, 404] else 500
-        login_req = status_code in [401, 403]
-        if login_req: session.pop('token_info', None); session.pop('user_data', None)
-        error_msg = "Şarkı eklenemedi."
-        if status_code == 403: error_msg = "Bu playlist'e şarkı ekleme izniniz yok veya scope eksik."
-        if status_code == 404: error_msg = "Playlist veya şarkı bulunamadı."
-        if status_code == 400: error_msg = "Geçersiz istek (örn: şarkı zaten playlist'te olabilir)."
-        # Hata mesajını JSON içinde güvenli hale getir
-        safe_details = quote_plus(str(e.msg))
-        return jsonify({"error": error_msg, "details": safe_details, "login_required": login_req}), status_code
+        return playlist_add_error_response(e)
+    except UpstreamTimeoutError as e:
+        logger.error(f"Playlist içeriği alınırken zaman aşımı: {e}")
+        return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
     except Exception as e:
         logger.error(f"Playlist'e eklerken beklenmedik hata: {e}", exc_info=True)
         return jsonify({"error": "Sunucu hatası."}), 500
 
+@app.route('/playlist/add_bulk', methods=['POST'])
+def add_tracks_to_playlist_bulk():
+    """
+    Birden fazla şarkıyı tek istekte playlist'e ekler: {"playlist_id": ..., "track_ids": [ID veya URI, ...]}.
+    Playlist'te zaten olan şarkılar atlanır, kalanlar 100'lük gruplar halinde eklenir.
+    """
+    logger.info("Playlist'e toplu şarkı ekleme isteği alındı.")
+    token_info = get_token()
+    if not token_info:
+        return jsonify({"error": "Yetkilendirme gerekli.", "login_required": True}), 401
+
+    data = json_body()
+    if data is None:
+        return jsonify({"error": "İstek gövdesi bir JSON nesnesi olmalıdır."}), 400
+    playlist_id = data.get('playlist_id')
+    track_uris_or_ids = data.get('track_ids')
+
+    if not playlist_id or not isinstance(track_uris_or_ids, list) or not track_uris_or_ids:
+        logger.warning("Eksik bilgi: playlist_id ve track_ids listesi gerekli.")
+        return jsonify({"error": "Eksik bilgi: playlist_id ve track_ids listesi gerekli."}), 400
+    if not isinstance(playlist_id, str):
+        return jsonify({"error": "playlist_id metin olmalıdır."}), 400
+    if not all(isinstance(track, str) and track for track in track_uris_or_ids):
+        return jsonify({"error": "track_ids sadece şarkı ID'si veya URI'si içermelidir."}), 400
+    if len(track_uris_or_ids) > PLAYLIST_BULK_ADD_MAX:
+        return jsonify({"error": f"Tek istekte en fazla {PLAYLIST_BULK_ADD_MAX} şarkı eklenebilir."}), 400
+
+    track_ids = [to_track_id(track) for track in track_uris_or_ids]
+    logger.debug(f"{len(track_ids)} şarkı playlist {playlist_id}'ye ekleniyor...")
+    try:
+        sp = get_spotify_client(token_info)
+        page_sp = get_spotify_client(token_info, PRIORITY_BACKGROUND, PLAYLIST_INDEX_MAX_WAIT)
+        added_ids, skipped_ids, snapshot_id = add_tracks_to_playlist(sp, playlist_id, track_ids, page_sp)
+        logger.info(f"Playlist {playlist_id}: {len(added_ids)} şarkı eklendi, {len(skipped_ids)} şarkı zaten vardı.")
+        message = f"{len(added_ids)} şarkı playlist'e eklendi."
+        if skipped_ids:
+            message += f" {len(skipped_ids)} şarkı zaten playlist'te olduğu için atlandı."
+        return jsonify({"message": message, "added": added_ids, "skipped": skipped_ids, "snapshot_id": snapshot_id})
+    except SpotifyException as e:
+        logger.error(f"Playlist'e toplu şarkı eklenirken hata: {e}")
+        return playlist_add_error_response(e)
+    except UpstreamTimeoutError as e:
+        logger.error(f"Playlist içeriği alınırken zaman aşımı: {e}")
+        return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
+    except Exception as e:
+        logger.error(f"Playlist'e toplu eklerken beklenmedik hata: {e}", exc_info=True)
+        return jsonify({"error": "Sunucu hatası."}), 500
+
 @app.route('/profile')
+@coalesced
 def get_user_profile():
-    """Kullanıcının profil bilgilerini (top artist/track/genre) döndürür."""
+    """
+    Kullanıcının profil bilgilerini (top artist/track/genre) döndürür.
+    Varsayılan alanlar PROFILE_FIELDS'tadır; ?fields=... ile başka bir alan kümesi istenebilir.
+    """
     logger.info("Kullanıcı profili isteği alındı.")
     token_info = get_token()
     if not token_info:
         return jsonify({"error": "Yetkilendirme gerekli.", "login_required": True}), 401
 
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
+        sp = get_spotify_client(token_info)
         time_range = 'medium_term' # Orta vade (son ~6 ay) - 'short_term' veya 'long_term' de olabilir
+        user_data = session.get('user_data', {})
+        user_id = user_data.get('id')
+        if not user_id:
+            return jsonify({"error": "Oturum hatası. Lütfen tekrar giriş yapın.", "login_required": True}), 401
+        try:
+            fields = get_fields_param(request.args, PROFILE_FIELDS)
+        except FieldsSyntaxError as e:
+            return jsonify({"error": f"Geçersiz fields ifadesi: {e}"}), 400
 
         logger.debug(f"Profil için {time_range} verileri çekiliyor...")
-        top_artists = sp.current_user_top_artists(limit=10, time_range=time_range)
-        top_tracks = sp.current_user_top_tracks(limit=10, time_range=time_range)
-
-        # Türleri sanatçılardan türet
-        top_genres = {}
-        if top_artists and top_artists.get('items'):
-            for artist in top_artists['items']:
-                if artist and artist.get('genres'):
-                    for genre in artist['genres']:
-                        top_genres[genre] = top_genres.get(genre, 0) + 1
-        # Türe göre sıklığa göre sırala
-        sorted_genres = sorted(top_genres.items(), key=lambda item: item[1], reverse=True)[:10] # İlk 10 tür
-
-        profile_data = {
-            "user": session.get('user_data', {}), # Temel kullanıcı bilgisi
-            "top_artists": top_artists.get('items', []),
-            "top_tracks": top_tracks.get('items', []),
-            "top_genres": sorted_genres
-        }
+        top_items = run_parallel({
+            'artists': lambda: get_top_items(sp, user_id, 'artists', time_range, limit=10),
+            'tracks': lambda: get_top_items(sp, user_id, 'tracks', time_range, limit=10),
+        })
+        top_artists = top_items['artists']
+        top_tracks = top_items['tracks']
+        # Katalog ve tür grafı beslemesi 304 yanıtında da yapılır (build_profile o durumda çağrılmaz)
+        remember_artists(top_artists)
+        remember_tracks(top_tracks)
+
+        def build_profile():
+            # Türleri sanatçılardan türet
+            top_genres = {}
+            if top_artists:
+                for artist in top_artists:
+                    if artist and artist.get('genres'):
+                        for genre in artist['genres']:
+                            top_genres[genre] = top_genres.get(genre, 0) + 1
+            # Türe göre sıklığa göre sırala
+            sorted_genres = sorted(top_genres.items(), key=lambda item: item[1], reverse=True)[:10] # İlk 10 tür
+
+            profile_data = {
+                "user": user_data, # Temel kullanıcı bilgisi
+                "top_artists": top_artists,
+                "top_tracks": top_tracks,
+                "top_genres": sorted_genres
+            }
+            return project(profile_data, fields)
+
+        # ETag, önbellekteki Spotify verilerinin özetlerinden türetilir; eşleşirse profil hiç oluşturulmaz
+        etag = make_etag('profile', request.args.get('fields') or '', content_digest(user_data, memo=False),
+                         content_digest(top_artists), content_digest(top_tracks))
         logger.info("Profil verileri başarıyla çekildi.")
-        return jsonify(profile_data)
+        return conditional_json(etag, build_profile)
 
     except SpotifyException as e:
          logger.error(f"Profil verisi alınırken hata: {e}")
-         status_code = e.http_status if e.http_status in [401, 403] else 500
+         status_code = e.http_status if e.http_status in [401, 403, 429] else 500
          login_req = status_code in [401, 403]
          if login_req: session.pop('token_info', None); session.pop('user_data', None)
          # Hata mesajını JSON içinde güvenli hale getir
          safe_details = quote_plus(str(e.msg))
-         return jsonify({"error": "Profil verileri alınamadı.", "details": safe_details, "login_required": login_req}), status_code
+         return jsonify({"error": "Profil verileri alınamadı.", "details": safe_details, "login_required": login_req}), status_code, rate_limit_headers(e)
+    except UpstreamTimeoutError as e:
+         logger.error(f"Profil verisi alınırken zaman aşımı: {e}")
+         return jsonify({"error": "Spotify zamanında yanıt vermedi. Lütfen tekrar deneyin."}), 504
     except Exception as e:
          logger.error(f"Profil alırken beklenmedik hata: {e}", exc_info=True)
          return jsonify({"error": "Sunucu hatası."}), 500
@@ -0,0 +1,428 @@
+"""
+Benchmark ve testler için yerel, sahte Spotify Web API + Accounts sunucusu (sadece standart kütüphane).
+
+Uygulamanın kullandığı endpoint'leri gerçekçi boyutta, deterministik verilerle sunar:
+  Accounts: GET /authorize (hemen redirect_uri'ye code ile yönlendirir), POST /api/token
+  Web API : /v1/me, /v1/me/top/{artists,tracks}, /v1/search, /v1/artists, /v1/me/playlists,
+            /v1/playlists/{id}, /v1/playlists/{id}/items (GET ve POST)
+Her /authorize çağrısı yeni bir kullanıcı oluşturur; access token'lar kullanıcıya bağlıdır.
+
+Gecikme, 429 enjeksiyonu ve yük boyutları komut satırından ayarlanır:
+    python bench/fake_spotify.py --port 8900 --latency-ms 40 --jitter 0.5 --rate-limit-ratio 0.01
+Uygulamayı bu sunucuya yönlendirmek için:
+    SPOTIFY_API_URL=http://127.0.0.1:8900/v1/ SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8900
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+GENRES = [
+    'pop', 'dance pop', 'turkish pop', 'turkish rock', 'anatolian rock', 'arabesk', 'rock', 'alternative rock',
+    'indie rock', 'indie pop', 'hip hop', 'turkish hip hop', 'rap', 'trap', 'r&b', 'soul', 'funk', 'jazz',
+    'smooth jazz', 'blues', 'classical', 'electronic', 'house', 'deep house', 'techno', 'edm', 'metal',
+    'heavy metal', 'hard rock', 'punk', 'folk', 'acoustic', 'singer-songwriter', 'country', 'latin', 'reggaeton',
+    'reggae', 'k-pop', 'lo-fi', 'chill', 'ambient', 'soundtrack', 'synthpop', 'new wave', 'grunge', 'emo',
+]
+MARKETS = ['TR', 'US', 'GB', 'DE', 'FR', 'NL', 'SE', 'NO', 'DK', 'FI', 'ES', 'IT', 'PT', 'BR', 'MX', 'AR', 'CA', 'AU',
+           'JP', 'KR', 'IN', 'PL', 'CZ', 'AT', 'CH', 'BE', 'IE', 'GR', 'RO', 'HU', 'BG', 'UA', 'IL', 'AE', 'SA', 'EG',
+           'ZA', 'NG', 'KE', 'MA', 'CL', 'CO', 'PE', 'UY', 'NZ', 'SG', 'MY', 'TH', 'VN', 'PH', 'ID', 'TW', 'HK']
+
+
+class FakeSpotifyConfig:
+    def __init__(self, latency_ms=40.0, jitter=0.5, rate_limit_ratio=0.0, retry_after=1, artists=2000, tracks=20000,
+                 playlists=40, playlist_tracks=150, markets=40, seed=42):
+        self.latency_ms = latency_ms # Ortalama yanıt gecikmesi
+        self.jitter = jitter # Gecikmenin ±oranı (0.5: %50-%150 arası)
+        self.rate_limit_ratio = rate_limit_ratio # Web API isteklerinin bu oranı 429 döner
+        self.retry_after = retry_after # 429 yanıtlarındaki Retry-After (saniye)
+        self.artists = artists # Katalogdaki sanatçı sayısı
+        self.tracks = tracks # Katalogdaki şarkı sayısı
+        self.playlists = playlists # Kullanıcı başına playlist sayısı
+        self.playlist_tracks = playlist_tracks # Playlist başına başlangıç şarkı sayısı
+        self.markets = min(markets, len(MARKETS)) # available_markets uzunluğu (yük boyutunu belirler)
+        self.seed = seed
+
+
+def _spotify_id(prefix, index):
+    """22 karakterlik (Spotify ID'leriyle aynı uzunlukta) deterministik ID."""
+    return f"{prefix}{index:020d}"
+
+
+def _index(spotify_id):
+    try:
+        return int(spotify_id[2:])
+    except ValueError:
+        return None
+
+
+def _stable_rng(*parts):
+    return random.Random(hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=8).digest())
+
+
+class FakeSpotify:
+    """Sahte Spotify verisi ve durumu (kullanıcılar, token'lar, playlist içerikleri)."""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._codes = {} # authorization code -> user_id
+        self._tokens = {} # access_token -> user_id
+        self._refresh_tokens = {} # refresh_token -> user_id
+        self._playlists = {} # playlist_id -> {"snapshot": int, "track_ids": list}
+        self._user_counter = itertools.count(1)
+        self._token_counter = itertools.count(1)
+        self.calls = {} # "METHOD yol" -> Web API çağrı sayısı (ID'ler {id} olarak)
+        self.rate_limited = 0 # Enjekte edilen 429 sayısı
+        self.artist = lru_cache(maxsize=None)(self._artist)
+        self.track = lru_cache(maxsize=config.tracks)(self._track)
+
+    # --- Veri ---
+    def _images(self, kind, spotify_id):
+        return [{"url": f"https://i.scdn.co/image/{kind}-{spotify_id}-{size}", "height": size, "width": size}
+                for size in (640, 300, 64)]
+
+    def _artist(self, index):
+        rng = _stable_rng(self.config.seed, 'artist', index)
+        artist_id = _spotify_id('ar', index)
+        return {
+            "id": artist_id,
+            "name": f"Sanatçı {index}",
+            "genres": rng.sample(GENRES, rng.randint(1, 4)),
+            "popularity": rng.randint(5, 95),
+            "followers": {"href": None, "total": rng.randint(100, 5000000)},
+            "images": self._images('artist', artist_id),
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+            "href": f"https://api.spotify.com/v1/artists/{artist_id}",
+            "type": "artist",
+            "uri": f"spotify:artist:{artist_id}",
+        }
+
+    def _simple_artist(self, index):
+        artist = self.artist(index)
+        return {key: artist[key] for key in ("id", "name", "external_urls", "href", "type", "uri")}
+
+    def _track(self, index):
+        rng = _stable_rng(self.config.seed, 'track', index)
+        track_id = _spotify_id('tr', index)
+        album_id = _spotify_id('al', index // 10)
+        artist_indexes = [index % self.config.artists] + ([rng.randrange(self.config.artists)] if rng.random() < 0.2 else [])
+        markets = MARKETS[:self.config.markets]
+        return {
+            "id": track_id,
+            "name": f"Şarkı {index}",
+            "artists": [self._simple_artist(artist_index) for artist_index in artist_indexes],
+            "album": {
+                "id": album_id,
+                "name": f"Albüm {index // 10}",
+                "album_type": "album",
+                "release_date": f"{rng.randint(1970, 2025)}-01-01",
+                "total_tracks": 10,
+                "images": self._images('album', album_id),
+                "artists": [self._simple_artist(artist_indexes[0])],
+                "available_markets": markets,
+                "external_urls": {"spotify": f"https://open.spotify.com/album/{album_id}"},
+                "uri": f"spotify:album:{album_id}",
+            },
+            "available_markets": markets,
+            "duration_ms": rng.randint(120000, 360000),
+            "explicit": rng.random() < 0.1,
+            "external_ids": {"isrc": f"TRX{index // 2:09d}"}, # Her iki şarkıdan biri aynı ISRC'li (farklı yayın)
+            "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+            "popularity": rng.randint(0, 100),
+            "preview_url": None,
+            "track_number": index % 10 + 1,
+            "type": "track",
+            "uri": f"spotify:track:{track_id}",
+        }
+
+    def _paging(self, items, total, limit, offset, url):
+        next_url = f"{url}?{urlencode({'limit': limit, 'offset': offset + limit})}" if offset + limit < total else None
+        return {"href": url, "items": items, "limit": limit, "offset": offset, "total": total, "next": next_url, "previous": None}
+
+    # --- Yetkilendirme ---
+    def authorize(self):
+        user_id = f"benchuser{next(self._user_counter)}"
+        code = f"code-{user_id}-{next(self._token_counter)}"
+        with self._lock:
+            self._codes[code] = user_id
+        return code
+
+    def issue_token(self, form):
+        grant_type = (form.get('grant_type') or [''])[0]
+        with self._lock:
+            if grant_type == 'authorization_code':
+                user_id = self._codes.pop((form.get('code') or [''])[0], None)
+                if user_id is None:
+                    return None
+            elif grant_type == 'refresh_token':
+                user_id = self._refresh_tokens.get((form.get('refresh_token') or [''])[0])
+                if user_id is None:
+                    return None
+            elif grant_type == 'client_credentials':
+                user_id = None
+            else:
+                return None
+            counter = next(self._token_counter)
+            token = {"access_token": f"at-{user_id or 'app'}-{counter}", "token_type": "Bearer", "expires_in": 3600}
+            self._tokens[token["access_token"]] = user_id
+            if user_id is not None:
+                token["refresh_token"] = f"rt-{user_id}-{counter}"
+                token["scope"] = (form.get('scope') or [''])[0] or "user-top-read"
+                self._refresh_tokens[token["refresh_token"]] = user_id
+        return token
+
+    def count_call(self, method, segments, rate_limited=False):
+        endpoint = "/".join("{id}" if len(part) == 22 and part[:2] in ('ar', 'tr', 'al', 'pl') else part for part in segments)
+        with self._lock:
+            key = f"{method} {endpoint}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.rate_limited += rate_limited
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "total_calls": sum(self.calls.values()), "rate_limited": self.rate_limited}
+
+    def user_for_token(self, authorization):
+        if not authorization or not authorization.startswith('Bearer '):
+            return False
+        with self._lock:
+            return self._tokens.get(authorization[len('Bearer '):], False)
+
+    # --- Web API ---
+    def me(self, user_id):
+        return {
+            "id": user_id, "display_name": f"Kullanıcı {user_id}", "email": f"{user_id}@example.com",
+            "country": "TR", "product": "premium", "type": "user", "uri": f"spotify:user:{user_id}",
+            "images": self._images('user', user_id), "followers": {"href": None, "total": 3},
+            "external_urls": {"spotify": f"https://open.spotify.com/user/{user_id}"},
+        }
+
+    def top(self, user_id, kind, params, url):
+        limit, offset = int(params.get('limit', 20)), int(params.get('offset', 0))
+        rng = _stable_rng(self.config.seed, user_id, kind, params.get('time_range', 'medium_term'))
+        if kind == 'artists':
+            indexes = rng.sample(range(self.config.artists), min(50, self.config.artists))
+            items = [self.artist(index) for index in indexes[offset:offset + limit]]
+        else:
+            indexes = rng.sample(range(self.config.tracks), min(50, self.config.tracks))
+            items = [self.track(index) for index in indexes[offset:offset + limit]]
+        return self._paging(items, len(indexes), limit, offset, url)
+
+    def search(self, params, url):
+        limit, offset = int(params.get('limit', 10)), int(params.get('offset', 0))
+        query = params.get('q', '').lower()
+        rng = _stable_rng(self.config.seed, 'search', query)
+        # Tür sorgularında ("<tür> music") o türdeki sanatçıların şarkıları öne çıkar
+        genre = query[:-len(' music')] if query.endswith(' music') else None
+        results = []
+        for index in rng.sample(range(self.config.tracks), min(400, self.config.tracks)):
+            if genre is None or genre in self.artist(index % self.config.artists)['genres'] or rng.random() < 0.3:
+                results.append(index)
+        search_type = params.get('type', 'track').split(',')[0]
+        if search_type == 'artist':
+            items = [self.artist(index % self.config.artists) for index in results[offset:offset + limit]]
+        else:
+            items = [self.track(index) for index in results[offset:offset + limit]]
+        return {f"{search_type}s": self._paging(items, len(results), limit, offset, url)}
+
+    def artists(self, params):
+        ids = [artist_id for artist_id in params.get('ids', '').split(',') if artist_id]
+        return {"artists": [self.artist(_index(artist_id) % self.config.artists) if _index(artist_id) is not None else None
+                            for artist_id in ids]}
+
+    def _playlist_state(self, playlist_id):
+        with self._lock:
+            state = self._playlists.get(playlist_id)
+            if state is None:
+                rng = _stable_rng(self.config.seed, 'playlist', playlist_id)
+                track_ids = [_spotify_id('tr', index) for index in rng.sample(range(self.config.tracks), min(self.config.playlist_tracks, self.config.tracks))]
+                state = self._playlists[playlist_id] = {"snapshot": 1, "track_ids": track_ids}
+            return state
+
+    def _playlist_summary(self, user_id, number):
+        playlist_id = f"pl{abs(hash((user_id, number))) % 10 ** 20:020d}"
+        state = self._playlist_state(playlist_id)
+        return {
+            "id": playlist_id, "name": f"Playlist {number}", "public": True, "collaborative": False,
+            "description": "", "images": self._images('playlist', playlist_id),
+            "owner": {"id": user_id, "display_name": user_id, "type": "user"},
+            "snapshot_id": f"snap-{state['snapshot']}", "tracks": {"href": None, "total": len(state['track_ids'])},
+            "type": "playlist", "uri": f"spotify:playlist:{playlist_id}",
+        }
+
+    def user_playlists(self, user_id, params, url):
+        limit, offset = int(params.get('limit', 20)), int(params.get('offset', 0))
+        items = [self._playlist_summary(user_id, number) for number in range(offset, min(offset + limit, self.config.playlists))]
+        return self._paging(items, self.config.playlists, limit, offset, url)
+
+    def _playlist_items(self, playlist_id, params, url):
+        state = self._playlist_state(playlist_id)
+        limit, offset = int(params.get('limit', 100)), int(params.get('offset', 0))
+        items = [{"added_at": "2024-01-01T00:00:00Z", "track": self.track(_index(track_id))}
+                 for track_id in state['track_ids'][offset:offset + limit]]
+        return self._paging(items, len(state['track_ids']), limit, offset, url)
+
+    def playlist(self, playlist_id, params, url):
+        state = self._playlist_state(playlist_id)
+        if params.get('fields') == 'snapshot_id':
+            return {"snapshot_id": f"snap-{state['snapshot']}"}
+        return {"id": playlist_id, "snapshot_id": f"snap-{state['snapshot']}",
+                "tracks": self._playlist_items(playlist_id, {}, f"{url}/items")}
+
+    def add_items(self, playlist_id, body):
+        uris = body.get('uris', []) if isinstance(body, dict) else body
+        state = self._playlist_state(playlist_id)
+        with self._lock:
+            state['track_ids'].extend(uri.rsplit(':', 1)[-1] for uri in uris)
+            state['snapshot'] += 1
+            return {"snapshot_id": f"snap-{state['snapshot']}"}
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: uygulamanın bağlantı havuzu gerçekçi çalışsın
+    fake = None # make_server tarafından atanır
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload=None, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode() if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send(status, {"error": {"status": status, "message": message}}, headers)
+
+    def _delay(self):
+        config = self.fake.config
+        if config.latency_ms > 0:
+            time.sleep(config.latency_ms / 1000 * random.uniform(1 - config.jitter, 1 + config.jitter))
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        parts = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+        path = parts.path.rstrip('/')
+        body = self._read_body()
+        self._delay()
+
+        # --- Accounts ---
+        if path == '/authorize':
+            code = self.fake.authorize()
+            location = f"{params.get('redirect_uri', '')}?{urlencode({'code': code, 'state': params.get('state', '')})}"
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if path == '/api/token' and method == 'POST':
+            token = self.fake.issue_token(parse_qs(body.decode()))
+            if token is None:
+                return self._send(400, {"error": "invalid_grant", "error_description": "Invalid code or refresh token"})
+            return self._send(200, token)
+
+        # --- Web API ---
+        if not path.startswith('/v1/'):
+            return self._error(404, "Not found")
+        user_id = self.fake.user_for_token(self.headers.get('Authorization'))
+        if user_id is False:
+            return self._error(401, "Invalid access token")
+        segments = path[len('/v1/'):].split('/')
+        rate_limited = bool(self.fake.config.rate_limit_ratio) and random.random() < self.fake.config.rate_limit_ratio
+        self.fake.count_call(method, segments, rate_limited)
+        if rate_limited:
+            return self._error(429, "API rate limit exceeded", {"Retry-After": str(self.fake.config.retry_after)})
+
+        url = f"http://{self.headers.get('Host')}{path}"
+        if segments[0] == 'me' and user_id is None:
+            return self._error(403, "User endpoints require a user token")
+        if segments == ['me']:
+            return self._send(200, self.fake.me(user_id))
+        if segments[:2] == ['me', 'top'] and len(segments) == 3:
+            return self._send(200, self.fake.top(user_id, segments[2], params, url))
+        if segments == ['me', 'playlists']:
+            return self._send(200, self.fake.user_playlists(user_id, params, url))
+        if segments == ['search']:
+            return self._send(200, self.fake.search(params, url))
+        if segments == ['artists']:
+            return self._send(200, self.fake.artists(params))
+        if segments[0] == 'playlists' and len(segments) == 2 and method == 'GET':
+            return self._send(200, self.fake.playlist(segments[1], params, url))
+        if segments[0] == 'playlists' and len(segments) == 3 and segments[2] in ('items', 'tracks'):
+            if method == 'POST':
+                return self._send(201, self.fake.add_items(segments[1], json.loads(body or b"[]")))
+            return self._send(200, self.fake._playlist_items(segments[1], params, url))
+        return self._error(404, f"Unsupported endpoint: {method} {path}")
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # İstemcinin (uygulamanın bağlantı havuzu) bağlantıyı kapatması normaldir, iz basılmaz
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(config, host='127.0.0.1', port=0):
+    """
+    Sahte sunucuyu oluşturur (başlatmaz); port=0 ise boş bir port seçilir (server.server_address).
+    Veri ve çağrı sayıları server.fake üzerinden okunabilir.
+    """
+    fake = FakeSpotify(config)
+    handler = type("BoundFakeSpotifyHandler", (FakeSpotifyHandler,), {"fake": fake})
+    server = FakeSpotifyServer((host, port), handler)
+    server.fake = fake
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yerel sahte Spotify API sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Ortalama yanıt gecikmesi (ms)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Gecikmenin ±oranı")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="429 dönecek Web API isteklerinin oranı")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 yanıtlarındaki Retry-After (saniye)")
+    parser.add_argument("--artists", type=int, default=2000)
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--playlists", type=int, default=40, help="Kullanıcı başına playlist sayısı")
+    parser.add_argument("--playlist-tracks", type=int, default=150, help="Playlist başına şarkı sayısı")
+    parser.add_argument("--markets", type=int, default=40, help="available_markets uzunluğu (yük boyutu)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    config = FakeSpotifyConfig(args.latency_ms, args.jitter, args.rate_limit_ratio, args.retry_after, args.artists,
+                               args.tracks, args.playlists, args.playlist_tracks, args.markets, args.seed)
+    server = make_server(config, args.host, args.port)
+    print(f"Sahte Spotify sunucusu http://{args.host}:{server.server_address[1]} adresinde çalışıyor.", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+"""
+Uygulamanın tüm rotalarını yerel sahte Spotify sunucusuna karşı eşzamanlı çalıştıran çevrimdışı benchmark.
+
+Sahte sunucu (bench/fake_spotify.py) bu süreçte, uygulama ise ayrı bir süreçte boş portlarda başlatılır;
+uygulama SPOTIFY_API_URL/SPOTIFY_ACCOUNTS_URL ile sahte sunucuya yönlendirilir, meta veri deposu ve tür
+grafiği geçici bir klasörde tutulur. Her sanal kullanıcı gerçek OAuth akışıyla (/login -> /authorize ->
+/callback -> /fetch_and_store_user_data) giriş yapar. Ardından rotalar ağırlıklı karışımla çağrılır ve
+rota başına istek sayısı, hata, throughput ve p50/p95/p99 gecikmeleri raporlanır.
+
+Örnek (proje kök dizininden):
+    python bench/run_bench.py --users 8 --concurrency 16 --duration 30 --latency-ms 40 --output bench_output.txt
+CI için --max-error-rate (429 hariç hatalar) ve --max-throttle-rate (429 yanıtları; uygulamanın bütçe veya
+eşzamanlılık sınırıyla reddettiği istekler) ile eşik verilebilir; aşılırsa çıkış kodu 1 olur. --json sonuçları makine
+tarafından okunabilir biçimde yazar (örn: iki commit'in sonuçlarını karşılaştırmak için).
+Uygulamanın kendi Spotify istek bütçesi (SPOTIFY_APP_RATE, SPOTIFY_USER_RATE vb.) de ölçüme dahildir;
+sadece uygulama kodunun maliyeti ölçülecekse --app-env SPOTIFY_APP_RATE=1000 gibi değerlerle gevşetilebilir.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from fake_spotify import FakeSpotifyConfig, make_server
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FRONTEND_URL = "http://frontend.bench.invalid/" # Giriş akışının bittiğini anlamak için; bu adrese istek gönderilmez
+
+# Rota adı -> (ağırlık, yöntem, yol, JSON gövdesi üreten fonksiyon veya None)
+ROUTES = {
+    "GET /": (1, 'GET', '/', None),
+    "GET /user_data": (3, 'GET', '/user_data', None),
+    "GET /profile": (3, 'GET', '/profile', None),
+    "POST /recommendations": (5, 'POST', '/recommendations', lambda user: {}),
+    "POST /recommendations (seed)": (2, 'POST', '/recommendations', lambda user: {"seed": random.randrange(2 ** 16), "seed_count": 3}),
+    "POST /recommendations?stream=1": (3, 'POST', '/recommendations?stream=1', lambda user: {"seed": random.randrange(2 ** 16)}),
+    "GET /playlists": (3, 'GET', '/playlists', None),
+    "GET /playlists?stream=1": (1, 'GET', '/playlists?stream=1', None),
+    "POST /playlist/add": (2, 'POST', '/playlist/add',
+                           lambda user: {"playlist_id": user.playlist_id, "track_uri": f"spotify:track:tr{random.randrange(10 ** 6):020d}"}),
+    "POST /playlist/add_bulk": (1, 'POST', '/playlist/add_bulk',
+                                lambda user: {"playlist_id": user.playlist_id, "track_ids": [f"tr{random.randrange(10 ** 6):020d}" for _ in range(5)]}),
+    "GET /metrics": (1, 'GET', '/metrics', None),
+}
+
+
+class _KeepAllResponses(urllib.request.HTTPErrorProcessor):
+    """Hata ve yönlendirme yanıtlarını istisnaya çevirmeden döndürür (yönlendirmeler elle izlenir)."""
+
+    def http_response(self, request, response):
+        return response
+
+    https_response = http_response
+
+
+class BenchUser:
+    """Kendi çerez kavanozu (Flask session) olan sanal kullanıcı."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _KeepAllResponses())
+        self.playlist_id = None
+
+    def request(self, method, url, body=None):
+        """İsteği gönderir, gövdenin tamamını okur ve (durum, başlıklar, gövde) döndürür."""
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        req = urllib.request.Request(url if '://' in url else self.base_url + url, data=data, headers=headers, method=method)
+        with self.opener.open(req, timeout=self.timeout) as response:
+            return response.status, response.headers, response.read()
+
+    def login(self):
+        """OAuth akışını yönlendirmeleri izleyerek tamamlar; frontend'e hatasız dönülürse başarılıdır."""
+        url = '/login'
+        for _ in range(6):
+            status, headers, _ = self.request('GET', url)
+            location = headers.get('Location')
+            if status not in (301, 302, 303, 307) or not location:
+                raise RuntimeError(f"Giriş akışı {url} adresinde beklenmeyen yanıtla durdu: HTTP {status}")
+            if location.startswith(FRONTEND_URL):
+                if 'error=' in location:
+                    raise RuntimeError(f"Giriş başarısız: {location}")
+                break
+            url = location
+        else:
+            raise RuntimeError("Giriş akışı çok fazla yönlendirme içeriyor.")
+        status, _, body = self.request('GET', '/playlists')
+        if status != 200 or not json.loads(body):
+            raise RuntimeError(f"Playlist'ler alınamadı: HTTP {status}")
+        self.playlist_id = json.loads(body)[0]['id']
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.exceptions = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency, status=None):
+        with self.lock:
+            self.latencies.append(latency)
+            if status is None:
+                self.exceptions += 1
+            else:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def errors(self):
+        """İstisnalar ve 429 dışındaki 4xx/5xx yanıtlar. 429'lar ayrıca sayılır (throttle_rate, --max-throttle-rate)."""
+        return self.exceptions + sum(count for status, count in self.statuses.items() if status >= 400 and status != 429)
+
+
+def percentile(sorted_values, ratio):
+    """Sıralı listede en yakın sıra (nearest-rank) yöntemiyle yüzdelik."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(ratio * len(sorted_values)) - 1))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port, fake_url, work_dir, extra_env):
+    """
+    Uygulamayı ayrı bir süreçte work_dir içinde başlatır (spotipy token önbelleği gibi göreli dosyalar
+    proje klasörüne yazılmaz); günlükler work_dir/app.log dosyasına yazılır.
+    """
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT_DIR, os.environ.get("PYTHONPATH")])),
+        "SPOTIFY_API_URL": f"{fake_url}/v1/",
+        "SPOTIFY_ACCOUNTS_URL": fake_url,
+        "SPOTIPY_CLIENT_ID": os.environ.get("SPOTIPY_CLIENT_ID", "bench-client-id"),
+        "SPOTIPY_CLIENT_SECRET": os.environ.get("SPOTIPY_CLIENT_SECRET", "bench-client-secret"),
+        "SPOTIPY_REDIRECT_URI": f"http://127.0.0.1:{port}/callback",
+        "FRONTEND_URL": FRONTEND_URL,
+        "FLASK_SECRET_KEY": "bench-secret-key",
+        "METADATA_STORE_PATH": os.path.join(work_dir, "metadata.sqlite3"),
+        "GENRE_GRAPH_PATH": os.path.join(work_dir, "genre_graph.json"),
+        "PROFILING_DIR": os.path.join(work_dir, "profiles"),
+        **extra_env,
+    }
+    code = f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True, debug=False, use_reloader=False)"
+    log = open(os.path.join(work_dir, "app.log"), 'wb')
+    process = subprocess.Popen([sys.executable, "-c", code], cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return process
+
+
+def wait_until_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Uygulama başlatılamadı (çıkış kodu {process.returncode}).")
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.1)
+    raise RuntimeError(f"Uygulama {timeout} saniye içinde hazır olmadı.")
+
+
+def run_load(users, routes, concurrency, duration, max_requests):
+    """concurrency thread ile süre (veya istek sayısı) dolana kadar rastgele rota çağırır."""
+    names = list(routes)
+    weights = [routes[name][0] for name in names]
+    stats = {name: RouteStats() for name in names}
+    deadline = time.monotonic() + duration
+    issued = iter(range(max_requests)) if max_requests else None
+    issued_lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(index)
+        while time.monotonic() < deadline:
+            if issued is not None:
+                with issued_lock:
+                    if next(issued, None) is None:
+                        return
+            user = users[rng.randrange(len(users))]
+            name = rng.choices(names, weights)[0]
+            _, method, path, body = routes[name]
+            started = time.perf_counter()
+            try:
+                status, _, _ = user.request(method, path, body(user) if body else None)
+            except (urllib.error.URLError, OSError):
+                status = None
+            stats[name].record(time.perf_counter() - started, status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
+
+
+def summarize(stats, elapsed):
+    rows = []
+    for name, route_stats in stats.items():
+        latencies = sorted(route_stats.latencies)
+        if not latencies:
+            continue
+        rows.append({
+            "route": name,
+            "requests": len(latencies),
+            "errors": route_stats.errors,
+            "rate_limited": route_stats.statuses.get(429, 0),
+            "statuses": {str(status): count for status, count in sorted(route_stats.statuses.items())},
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        })
+    total = sum(row["requests"] for row in rows)
+    errors = sum(row["errors"] for row in rows)
+    rate_limited = sum(row["rate_limited"] for row in rows)
+    all_latencies = sorted(latency for route_stats in stats.values() for latency in route_stats.latencies)
+    overall = {
+        "requests": total, "errors": errors, "error_rate": errors / total if total else 0.0,
+        "rate_limited": rate_limited, "throttle_rate": rate_limited / total if total else 0.0,
+        "throughput": total / elapsed if elapsed else 0.0, "elapsed_s": elapsed,
+        "p50_ms": percentile(all_latencies, 0.50) * 1000, "p95_ms": percentile(all_latencies, 0.95) * 1000,
+        "p99_ms": percentile(all_latencies, 0.99) * 1000,
+    }
+    return rows, overall
+
+
+def format_report(rows, overall, upstream, args):
+    lines = [
+        f"Benchmark: {args.users} kullanıcı, {args.concurrency} eşzamanlı istek, {overall['elapsed_s']:.1f} sn; "
+        f"sahte Spotify gecikmesi {args.latency_ms:g} ms (±%{args.jitter * 100:g}), 429 oranı {args.rate_limit_ratio:g}",
+        "",
+        f"{'Rota':<32} {'İstek':>7} {'Hata':>6} {'429':>5} {'İstek/sn':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}",
+    ]
+    for row in rows:
+        lines.append(f"{row['route']:<32} {row['requests']:>7} {row['errors']:>6} {row['rate_limited']:>5} {row['throughput']:>9.1f} "
+                     f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    lines.append(f"{'TOPLAM':<32} {overall['requests']:>7} {overall['errors']:>6} {overall['rate_limited']:>5} {overall['throughput']:>9.1f} "
+                 f"{overall['p50_ms']:>8.1f} {overall['p95_ms']:>8.1f} {overall['p99_ms']:>8.1f}")
+    lines.append("")
+    lines.append(f"Spotify'a giden çağrılar: {upstream['total_calls']} (enjekte edilen 429: {upstream['rate_limited']}), "
+                 f"rota isteği başına {upstream['total_calls'] / overall['requests'] if overall['requests'] else 0:.2f}")
+    for endpoint, count in sorted(upstream['calls'].items(), key=lambda item: -item[1]):
+        lines.append(f"  {endpoint:<40} {count:>7}")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sahte Spotify sunucusuna karşı çevrimdışı benchmark")
+    parser.add_argument("--users", type=int, default=8, help="Giriş yapan sanal kullanıcı sayısı")
+    parser.add_argument("--concurrency", type=int, default=16, help="Aynı anda gönderilen istek sayısı")
+    parser.add_argument("--duration", type=float, default=20.0, help="Ölçüm süresi (saniye)")
+    parser.add_argument("--requests", type=int, default=0, help="Verilirse bu kadar istekten sonra durulur")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Ölçüme katılmayan ısınma süresi (saniye)")
+    parser.add_argument("--routes", default="", help="Sadece bu rotalar (virgülle ayrılmış, örn: \"GET /profile,GET /playlists\")")
+    parser.add_argument("--timeout", type=float, default=30.0, help="İstek başına zaman aşımı (saniye)")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Sahte Spotify ortalama gecikmesi (ms)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Gecikmenin ±oranı")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="429 dönecek Spotify isteklerinin oranı")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 yanıtlarındaki Retry-After (saniye)")
+    parser.add_argument("--playlists", type=int, default=40, help="Kullanıcı başına playlist sayısı")
+    parser.add_argument("--playlist-tracks", type=int, default=150, help="Playlist başına şarkı sayısı")
+    parser.add_argument("--markets", type=int, default=40, help="available_markets uzunluğu (yük boyutu)")
+    parser.add_argument("--app-env", action="append", default=[], metavar="AD=DEĞER", help="Uygulamaya ek ortam değişkeni (tekrarlanabilir)")
+    parser.add_argument("--output", help="Metin raporun yazılacağı dosya (örn: bench_output.txt)")
+    parser.add_argument("--json", dest="json_path", help="Sonuçların JSON olarak yazılacağı dosya")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Hata oranı bunu aşarsa çıkış kodu 1 olur (örn: 0.01)")
+    parser.add_argument("--max-throttle-rate", type=float, default=None, help="429 oranı bunu aşarsa çıkış kodu 1 olur (örn: 0.05)")
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        selected = [name.strip() for name in args.routes.split(',') if name.strip()]
+        unknown = [name for name in selected if name not in ROUTES]
+        if unknown:
+            parser.error(f"Bilinmeyen rota(lar): {', '.join(unknown)}. Geçerli rotalar: {', '.join(ROUTES)}")
+        routes = {name: ROUTES[name] for name in selected}
+
+    config = FakeSpotifyConfig(latency_ms=args.latency_ms, jitter=args.jitter, rate_limit_ratio=args.rate_limit_ratio,
+                               retry_after=args.retry_after, playlists=args.playlists, playlist_tracks=args.playlist_tracks,
+                               markets=args.markets)
+    fake_server = make_server(config)
+    fake_url = f"http://127.0.0.1:{fake_server.server_address[1]}"
+    threading.Thread(target=fake_server.serve_forever, name="fake-spotify", daemon=True).start()
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        extra_env = dict(item.split('=', 1) for item in args.app_env)
+        app_process = start_app(port, fake_url, work_dir, extra_env)
+        try:
+            wait_until_ready(base_url, app_process)
+            users = [BenchUser(base_url, args.timeout) for _ in range(args.users)]
+            for user in users:
+                user.login()
+            print(f"{len(users)} kullanıcı giriş yaptı; {args.warmup:g} sn ısınma, ardından ölçüm başlıyor.", file=sys.stderr)
+            if args.warmup > 0:
+                run_load(users, routes, args.concurrency, args.warmup, 0)
+            calls_before = fake_server.fake.stats()
+            stats, elapsed = run_load(users, routes, args.concurrency, args.duration, args.requests)
+            calls_after = fake_server.fake.stats()
+        except Exception:
+            with open(os.path.join(work_dir, "app.log"), encoding='utf-8', errors='replace') as log:
+                sys.stderr.write("Uygulama günlüğünün sonu:\n" + "".join(log.readlines()[-40:]))
+            raise
+        finally:
+            app_process.terminate()
+            try:
+                app_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app_process.kill()
+            fake_server.shutdown()
+
+    # Sadece ölçüm sırasındaki Spotify çağrıları raporlanır (giriş ve ısınma hariç)
+    upstream = {
+        "calls": {endpoint: count - calls_before["calls"].get(endpoint, 0) for endpoint, count in calls_after["calls"].items()
+                  if count - calls_before["calls"].get(endpoint, 0) > 0},
+        "total_calls": calls_after["total_calls"] - calls_before["total_calls"],
+        "rate_limited": calls_after["rate_limited"] - calls_before["rate_limited"],
+    }
+    rows, overall = summarize(stats, elapsed)
+    report = format_report(rows, overall, upstream, args)
+    sys.stdout.write(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "overall": overall, "routes": rows, "upstream": upstream}, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.max_error_rate is not None and overall["error_rate"] > args.max_error_rate:
+        print(f"Hata oranı %{overall['error_rate'] * 100:.2f}, eşik %{args.max_error_rate * 100:.2f} aşıldı.", file=sys.stderr)
+        failed = True
+    if args.max_throttle_rate is not None and overall["throttle_rate"] > args.max_throttle_rate:
+        print(f"429 oranı %{overall['throttle_rate'] * 100:.2f}, eşik %{args.max_throttle_rate * 100:.2f} aşıldı.", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe, boyutu sınırlı (LRU) ve süreli (TTL) basit bir bellek içi önbellek.
+    Süresi dolan kayıtlar okunurken, kapasite aşıldığında ise en az kullanılan kayıt silinir.
+
+    stale_ttl > 0 verilirse kayıtlar TTL dolduktan sonra stale_ttl kadar daha "bayat" olarak
+    tutulur; lookup() bu kayıtları is_stale=True ile döndürür (stale-while-revalidate için).
+    """
+
+    def __init__(self, maxsize, ttl, stale_ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._data = OrderedDict() # key -> (fresh_until, expires_at, value)
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """
+        (value, is_stale) döndürür. Kayıt yoksa veya tamamen süresi dolmuşsa (None, False) döner.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            fresh_until, expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None, False
+            self._data.move_to_end(key)
+            if fresh_until <= now:
+                self.stale_hits += 1
+                return value, True
+            self.hits += 1
+            return value, False
+
+    def peek(self, key, default=None):
+        """Taze kaydı, LRU sırasını ve isabet istatistiklerini değiştirmeden döndürür (bakım işleri için)."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[2]
+
+    def get(self, key, default=None):
+        """Sadece taze kayıtları döndürür; bayat kayıtlar için default döner."""
+        value, is_stale = self.lookup(key)
+        if value is None or is_stale:
+            return default
+        return value
+
+    def set(self, key, value, ttl=None):
+        fresh_until = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (fresh_until, fresh_until + self.stale_ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[2]
+
+    def invalidate(self, predicate):
+        """predicate(key) True dönen tüm kayıtları siler, silinen kayıt sayısını döndürür."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
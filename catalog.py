@@ -0,0 +1,320 @@
+import os
+import threading
+
+import numpy as np
+
+
+SPOTIFY_TRACK_URL = "https://open.spotify.com/track/"
+CATALOG_MAX_TRACKS = int(os.environ.get("CATALOG_MAX_TRACKS", 200000)) # Aşılınca en uzun süredir görülmeyen şarkılar atılır
+CATALOG_MAX_ARTISTS = int(os.environ.get("CATALOG_MAX_ARTISTS", 100000)) # Şarkılarda geçen sanatçılar bu sınıra rağmen tutulur
+CATALOG_EVICT_RATIO = float(os.environ.get("CATALOG_EVICT_RATIO", 0.1)) # Sınır aşılınca kapasitenin bu oranı kadar yer açılır
+
+
+def _ensure_capacity(array, size):
+    """Diziyi gerekirse iki katına büyütür (amortize O(1) ekleme)."""
+    if size <= len(array):
+        return array
+    return np.resize(array, max(size, len(array) * 2))
+
+
+def _album_art_url(track):
+    images = (track.get('album') or {}).get('images')
+    if isinstance(images, list) and images:
+        # Orta boy resmi tercih et (genellikle index 1), yoksa ilkini al
+        return images[1]['url'] if len(images) > 1 else images[0]['url']
+    return None
+
+
+class TrackCatalog:
+    """
+    Uygulamanın gördüğü tüm şarkı ve sanatçıları (arama, top items, playlist'ler) biriktiren yerel katalog.
+
+    Sanatçı türleri seyrek çoklu-sıcak (multi-hot) matris olarak (sadece eklenen (satır, sütun) çiftleri),
+    şarkılar ise NumPy dizilerinde (ana sanatçı satırı, albüm, popülerlik) tutulur. Tüm diziler sadece sona
+    eklenerek büyür; türleri değişen sanatçının eski çiftleri silinmek yerine -1 sütununa (ağırlığı hep 0)
+    yönlendirilir. Puanlama kullanıcının zevk vektörüne göre tek bir vektörel geçişte yapılır: önce
+    sanatçılar tür ağırlıklarıyla, sonra şarkılar sanatçı puanı ve popülerlikle puanlanır.
+    Gösterim için gereken metin alanları sütun listelerinde saklanır.
+
+    Katalog max_tracks / max_artists ile sınırlıdır: aşıldığında en uzun süredir görülmeyen (LRU) kayıtlar
+    atılır ve diziler sıkıştırılır (silinmiş tür çiftleri de temizlenir). Sıkıştırma satır numaralarını
+    değiştirdiğinden, satır döndüren metodlar (top_k, score, score_rows) ile features/cards arasında
+    `with catalog.lock:` tutulmalı; satırlar ağ çağrısı gibi beklemeler boyunca saklanacaksa ids() ile
+    ID'lere çevrilmelidir.
+    """
+
+    def __init__(self, initial_capacity=1024, max_tracks=CATALOG_MAX_TRACKS, max_artists=CATALOG_MAX_ARTISTS,
+                 evict_ratio=CATALOG_EVICT_RATIO):
+        self.lock = threading.RLock()
+        self.max_tracks = max_tracks
+        self.max_artists = max_artists
+        self.evict_ratio = evict_ratio
+        self._clock = 0 # Her ekleme çağrısında artar; satırların son görülme zamanı (LRU) için
+        self.genre_index = {} # tür -> sütun
+        # Sanatçılar
+        self.artist_index = {} # artist_id -> satır
+        self._artist_ids = []
+        self._artist_genres = [] # satır -> tür sütunları (tuple)
+        self._artist_entries = [] # satır -> çift dizilerindeki konumlar
+        self._artist_genre_counts = np.zeros(initial_capacity, dtype=np.int32)
+        self._artist_seen = np.zeros(initial_capacity, dtype=np.int64)
+        self._pair_rows = np.zeros(initial_capacity, dtype=np.int32) # (sanatçı satırı, tür sütunu) çiftleri
+        self._pair_columns = np.zeros(initial_capacity, dtype=np.int32)
+        self._pair_count = 0
+        self._live_pairs = 0 # -1 sütununa yönlendirilmemiş çift sayısı
+        # Şarkılar
+        self.track_index = {} # track_id -> satır
+        self._track_ids = []
+        self._track_names = []
+        self._track_artist_names = []
+        self._track_album_art = []
+        self._track_artist_ids = [] # satır -> tüm sanatçı ID'leri (tuple)
+        self._album_index = {} # album_id -> numara
+        self._album_ids = [] # numara -> album_id
+        self._track_artist = np.zeros(initial_capacity, dtype=np.int32) # ana sanatçı satırı
+        self._track_album = np.zeros(initial_capacity, dtype=np.int32)
+        self._track_popularity = np.zeros(initial_capacity, dtype=np.uint8)
+        self._track_seen = np.zeros(initial_capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._track_ids)
+
+    # --- Ekleme ---
+    def _artist_row(self, artist_id):
+        row = self.artist_index.get(artist_id)
+        if row is None:
+            row = len(self._artist_ids)
+            self.artist_index[artist_id] = row
+            self._artist_ids.append(artist_id)
+            self._artist_genres.append(())
+            self._artist_entries.append(())
+            self._artist_genre_counts = _ensure_capacity(self._artist_genre_counts, row + 1)
+            self._artist_seen = _ensure_capacity(self._artist_seen, row + 1)
+            self._artist_genre_counts[row] = 0
+        self._artist_seen[row] = self._clock
+        return row
+
+    def _set_artist_genres(self, row, genres):
+        old_entries = list(self._artist_entries[row])
+        if old_entries:
+            self._pair_columns[old_entries] = -1
+        start, end = self._pair_count, self._pair_count + len(genres)
+        self._pair_rows = _ensure_capacity(self._pair_rows, end)
+        self._pair_columns = _ensure_capacity(self._pair_columns, end)
+        self._pair_rows[start:end] = row
+        self._pair_columns[start:end] = genres
+        self._pair_count = end
+        self._artist_entries[row] = range(start, end)
+        self._artist_genres[row] = genres
+        self._live_pairs += len(genres) - len(old_entries)
+        self._artist_genre_counts[row] = len(genres)
+
+    def add_artists(self, artists):
+        """Türleri bilinen (tam) sanatçı nesnelerini ekler veya türlerini günceller."""
+        with self.lock:
+            self._clock += 1
+            for artist in artists:
+                if not artist or not artist.get('id') or 'genres' not in artist:
+                    continue
+                genres = tuple(self.genre_index.setdefault(genre, len(self.genre_index)) for genre in artist['genres'])
+                row = self._artist_row(artist['id'])
+                if self._artist_genres[row] != genres:
+                    self._set_artist_genres(row, genres)
+            self._evict_if_needed()
+
+    def add_tracks(self, tracks):
+        """
+        Şarkı nesnelerini ekler; daha önce görülenlerin sadece son görülme zamanı güncellenir.
+        Sanatçı türleri add_artists ile gelir.
+        """
+        with self.lock:
+            self._clock += 1
+            for track in tracks:
+                if not track or not track.get('id'):
+                    continue
+                row = self.track_index.get(track['id'])
+                if row is not None:
+                    self._track_seen[row] = self._clock
+                    self._artist_seen[self._track_artist[row]] = self._clock
+                    continue
+                artists = [artist for artist in track.get('artists') or [] if artist and artist.get('id')]
+                if not artists:
+                    continue
+                row = len(self._track_ids)
+                self._track_artist = _ensure_capacity(self._track_artist, row + 1)
+                self._track_album = _ensure_capacity(self._track_album, row + 1)
+                self._track_popularity = _ensure_capacity(self._track_popularity, row + 1)
+                self._track_seen = _ensure_capacity(self._track_seen, row + 1)
+                self.track_index[track['id']] = row
+                self._track_ids.append(track['id'])
+                self._track_names.append(track.get('name', 'N/A'))
+                self._track_artist_names.append(", ".join(artist.get('name', 'N/A') for artist in artists))
+                self._track_album_art.append(_album_art_url(track))
+                self._track_artist_ids.append(tuple(artist['id'] for artist in artists))
+                self._track_artist[row] = self._artist_row(artists[0]['id'])
+                album_id = (track.get('album') or {}).get('id') or track['id'] # Albümü bilinmeyen şarkı tek başına sayılır
+                album = self._album_index.get(album_id)
+                if album is None:
+                    album = self._album_index[album_id] = len(self._album_ids)
+                    self._album_ids.append(album_id)
+                self._track_album[row] = album
+                self._track_popularity[row] = min(100, max(0, track.get('popularity') or 0))
+                self._track_seen[row] = self._clock
+            self._evict_if_needed()
+
+    # --- Kapasite ---
+    def _evict_if_needed(self):
+        n_artists = len(self._artist_ids)
+        if (len(self._track_ids) > self.max_tracks or n_artists > self.max_artists
+                or self._pair_count - self._live_pairs > max(1024, self._live_pairs)):
+            self._compact()
+
+    def _compact(self):
+        """
+        En uzun süredir görülmeyen şarkıları (ve hiçbir şarkıda geçmeyen sanatçıları) atarak kataloğu sınırların
+        evict_ratio kadar altına indirir; dizileri, indeksleri ve tür çiftlerini yeniden oluşturur.
+        """
+        n_tracks, n_artists = len(self._track_ids), len(self._artist_ids)
+        track_rows = np.arange(n_tracks)
+        if n_tracks > self.max_tracks:
+            keep = int(self.max_tracks * (1 - self.evict_ratio))
+            track_rows = np.sort(np.argpartition(-self._track_seen[:n_tracks], keep - 1)[:keep])
+        # Kalan şarkılarda geçen sanatçılar her zaman tutulur; kalan yer en son görülen diğer sanatçılara verilir
+        required = np.zeros(n_artists, dtype=bool)
+        required[self._track_artist[track_rows]] = True
+        artist_rows = np.arange(n_artists)
+        if n_artists > self.max_artists:
+            others = np.flatnonzero(~required)
+            room = int(self.max_artists * (1 - self.evict_ratio)) - int(required.sum())
+            if room < len(others):
+                others = others[np.argpartition(-self._artist_seen[others], room - 1)[:room]] if room > 0 else others[:0]
+            artist_rows = np.sort(np.concatenate([np.flatnonzero(required), others]))
+        artist_map = np.full(n_artists, -1, dtype=np.int32)
+        artist_map[artist_rows] = np.arange(len(artist_rows), dtype=np.int32)
+
+        # Sanatçılar ve tür çiftleri (silinmiş çiftler atılır)
+        self._artist_ids = [self._artist_ids[row] for row in artist_rows]
+        self._artist_genres = [self._artist_genres[row] for row in artist_rows]
+        self.artist_index = {artist_id: row for row, artist_id in enumerate(self._artist_ids)}
+        self._artist_genre_counts = self._artist_genre_counts[artist_rows].copy()
+        self._artist_seen = self._artist_seen[artist_rows].copy()
+        counts = np.fromiter((len(genres) for genres in self._artist_genres), dtype=np.int64, count=len(self._artist_genres))
+        ends = np.cumsum(counts)
+        self._pair_count = self._live_pairs = int(ends[-1]) if len(ends) else 0
+        self._pair_rows = np.repeat(np.arange(len(self._artist_ids), dtype=np.int32), counts)
+        self._pair_columns = np.fromiter((column for genres in self._artist_genres for column in genres), dtype=np.int32,
+                                         count=self._pair_count)
+        self._artist_entries = [range(end - count, end) for end, count in zip(ends.tolist(), counts.tolist())]
+
+        # Şarkılar ve albümler
+        rows = track_rows.tolist()
+        self._track_ids = [self._track_ids[row] for row in rows]
+        self._track_names = [self._track_names[row] for row in rows]
+        self._track_artist_names = [self._track_artist_names[row] for row in rows]
+        self._track_album_art = [self._track_album_art[row] for row in rows]
+        self._track_artist_ids = [self._track_artist_ids[row] for row in rows]
+        self.track_index = {track_id: row for row, track_id in enumerate(self._track_ids)}
+        self._track_artist = artist_map[self._track_artist[track_rows]]
+        albums, self._track_album = np.unique(self._track_album[track_rows], return_inverse=True)
+        self._track_album = self._track_album.astype(np.int32)
+        self._album_ids = [self._album_ids[album] for album in albums.tolist()]
+        self._album_index = {album_id: number for number, album_id in enumerate(self._album_ids)}
+        self._track_popularity = self._track_popularity[track_rows].copy()
+        self._track_seen = self._track_seen[track_rows].copy()
+
+    def unknown_artist_ids(self, artist_ids):
+        """Türleri henüz bilinmeyen sanatçı ID'lerini döndürür."""
+        with self.lock:
+            return [artist_id for artist_id in artist_ids
+                    if artist_id not in self.artist_index or not self._artist_genres[self.artist_index[artist_id]]]
+
+    # --- Puanlama ---
+    def _taste_vector(self, genre_weights):
+        # Son eleman -1 sütunu (silinmiş çiftler) içindir ve hep 0 kalır
+        taste = np.zeros(len(self.genre_index) + 1, dtype=np.float32)
+        for genre, weight in genre_weights.items():
+            column = self.genre_index.get(genre)
+            if column is not None:
+                taste[column] = weight
+        return taste
+
+    def _track_scores(self, rows, artist_scores, popularity_weight, exclude_ids):
+        """rows şarkılarının puanları; artist_scores her şarkının ana sanatçısının puanıdır."""
+        scores = artist_scores + popularity_weight * self._track_popularity[rows].astype(np.float32) / 100
+        scores[artist_scores <= 0] = -np.inf
+        excluded = {self.track_index[track_id] for track_id in exclude_ids if track_id in self.track_index}
+        if excluded:
+            scores[np.isin(rows, np.fromiter(excluded, dtype=np.int64, count=len(excluded)))] = -np.inf
+        return scores
+
+    def score(self, genre_weights, artist_weights=None, popularity_weight=0.2, exclude_ids=()):
+        """
+        Tüm katalog için puan dizisini döndürür (satır sırasıyla).
+        genre_weights: tür -> ağırlık, artist_weights: artist_id -> ek puan.
+        Sanatçı tür puanı, sanatçının tür sayısının kareköküne bölünerek normalize edilir.
+        Türü veya sanatçısı zevkle hiç eşleşmeyen ve hariç tutulan şarkıların puanı -inf olur.
+        """
+        with self.lock:
+            n_tracks = len(self._track_ids)
+            n_artists = len(self._artist_ids)
+            taste = self._taste_vector(genre_weights)
+            pair_weights = taste[self._pair_columns[:self._pair_count]]
+            artist_scores = np.bincount(self._pair_rows[:self._pair_count], weights=pair_weights, minlength=n_artists).astype(np.float32)
+            artist_scores /= np.sqrt(np.maximum(self._artist_genre_counts[:n_artists], 1))
+            for artist_id, weight in (artist_weights or {}).items():
+                row = self.artist_index.get(artist_id)
+                if row is not None:
+                    artist_scores[row] += weight
+            rows = np.arange(n_tracks)
+            return self._track_scores(rows, artist_scores[self._track_artist[:n_tracks]], popularity_weight, exclude_ids)
+
+    def score_rows(self, rows, genre_weights, artist_weights=None, popularity_weight=0.2, exclude_ids=()):
+        """
+        score() ile aynı puanları sadece verilen satırlar için (verilen sırayla) hesaplar; maliyet katalog
+        boyutuna değil satır sayısına bağlıdır (örn: tek bir aramanın sonuçlarını puanlamak için).
+        """
+        with self.lock:
+            rows = np.asarray(rows, dtype=np.int64)
+            taste = self._taste_vector(genre_weights)
+            artist_weights = artist_weights or {}
+            artist_rows, inverse = np.unique(self._track_artist[rows], return_inverse=True)
+            artist_scores = np.array([
+                taste[list(self._artist_genres[row])].sum() / np.sqrt(max(len(self._artist_genres[row]), 1))
+                + artist_weights.get(self._artist_ids[row], 0.0)
+                for row in artist_rows.tolist()], dtype=np.float32)
+            return self._track_scores(rows, artist_scores[inverse], popularity_weight, exclude_ids)
+
+    def top_k(self, genre_weights, k, artist_weights=None, exclude_ids=(), popularity_weight=0.2):
+        """
+        Zevk vektörüne en yakın en fazla k şarkının satırlarını ve puanlarını puana göre azalan sırada,
+        katalogdaki toplam eşleşme sayısıyla birlikte (rows, scores, match_count) olarak döndürür.
+        """
+        scores = self.score(genre_weights, artist_weights, popularity_weight=popularity_weight, exclude_ids=exclude_ids)
+        candidates = np.flatnonzero(np.isfinite(scores))
+        match_count = len(candidates)
+        if match_count > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return candidates, scores[candidates], match_count
+
+    def ids(self, rows):
+        """Satırların şarkı ID'lerini döndürür (satırlar sıkıştırmada değişebildiğinden saklamak için)."""
+        with self.lock:
+            return [self._track_ids[row] for row in rows]
+
+    def features(self, rows):
+        """Yeniden sıralama için satırların (ana sanatçı, albüm, popülerlik) dizilerini döndürür."""
+        with self.lock:
+            rows = np.asarray(rows, dtype=np.int64)
+            return self._track_artist[rows], self._track_album[rows], self._track_popularity[rows]
+
+    def cards(self, rows):
+        """Satırları /recommendations yanıtındaki şarkı kartı formatına çevirir."""
+        with self.lock:
+            return [{
+                "id": self._track_ids[row],
+                "title": self._track_names[row],
+                "artist": self._track_artist_names[row],
+                "album_art_url": self._track_album_art[row],
+                "spotify_url": SPOTIFY_TRACK_URL + self._track_ids[row],
+            } for row in rows]
@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+COALESCE_MAX_PER_USER = int(os.environ.get("COALESCE_MAX_PER_USER", 4)) # Kullanıcı başına aynı anda hesaplanan en fazla farklı istek
+COALESCE_RETRY_AFTER = int(os.environ.get("COALESCE_RETRY_AFTER", 2)) # saniye; sınır aşılınca istemciye önerilen bekleme
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Kullanıcının aynı anda çalışan istek sayısı sınırı aştığında fırlatılır."""
+
+    def __init__(self, user_id, limit):
+        super().__init__(f"Kullanıcı {user_id} için eşzamanlı istek sınırı ({limit}) aşıldı.")
+        self.user_id = user_id
+        self.limit = limit
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'followers')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class RequestCoalescer:
+    """
+    Aynı anahtarlı (örn: kullanıcı, rota, parametreler) eşzamanlı istekleri tek bir hesaplamada birleştirir
+    (single-flight) ve kullanıcı başına aynı anda çalışan farklı hesaplama sayısını sınırlar.
+
+    İlk gelen istek (lider) hesaplamayı yapar; o sürerken gelen aynı anahtarlı istekler sonucu bekler ve
+    aynı sonucu (veya hatayı) alır. Bekleyen istekler sınıra sayılmaz, çünkü Spotify'a ek yük getirmezler.
+    Sınır aşılırsa istek kuyrukta bekletilmez, hemen ConcurrencyLimitExceeded fırlatılır.
+    """
+
+    def __init__(self, max_per_user=COALESCE_MAX_PER_USER):
+        self.max_per_user = max_per_user
+        self._flights = {} # anahtar -> _Flight
+        self._active = {} # user_id -> çalışan hesaplama sayısı
+        self._lock = threading.Lock()
+
+    def acquire(self, user_id):
+        """Kullanıcı için bir hesaplama hakkı ayırır; sınır doluysa ConcurrencyLimitExceeded fırlatır."""
+        with self._lock:
+            self._acquire(user_id)
+
+    def _acquire(self, user_id):
+        active = self._active.get(user_id, 0)
+        if active >= self.max_per_user:
+            raise ConcurrencyLimitExceeded(user_id, self.max_per_user)
+        self._active[user_id] = active + 1
+
+    def release(self, user_id):
+        with self._lock:
+            active = self._active.get(user_id, 0) - 1
+            if active > 0:
+                self._active[user_id] = active
+            else:
+                self._active.pop(user_id, None)
+
+    def run(self, key, user_id, fn):
+        """
+        fn()'i anahtar başına tek seferde çalıştırır ve (sonuç, paylaşıldı_mı) döndürür.
+        Aynı anahtarla devam eden bir hesaplama varsa onun sonucu beklenir.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self._acquire(user_id)
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                followers = flight.followers
+            self.release(user_id)
+            flight.done.set()
+            if followers:
+                logger.debug(f"{followers} adet eşzamanlı istek tek bir hesaplamayla yanıtlandı: {key}")
+        return flight.result, False
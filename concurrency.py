@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+UPSTREAM_WORKERS = int(os.environ.get("UPSTREAM_WORKERS", 16)) # Aynı anda en fazla kaç Spotify çağrısı yapılabilir
+UPSTREAM_CALL_TIMEOUT = float(os.environ.get("UPSTREAM_CALL_TIMEOUT", 10)) # saniye
+
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS, thread_name_prefix="spotify-upstream")
+_worker_state = threading.local()
+
+
+class UpstreamTimeoutError(Exception):
+    """Paralel çalıştırılan bir Spotify çağrısı zaman aşımına uğradığında fırlatılır."""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"'{name}' çağrısı {timeout} saniye içinde tamamlanamadı.")
+        self.name = name
+        self.timeout = timeout
+
+
+def _run_in_worker(fn):
+    _worker_state.active = True
+    try:
+        return fn()
+    finally:
+        _worker_state.active = False
+
+
+def iter_parallel(calls, timeout=UPSTREAM_CALL_TIMEOUT):
+    """
+    run_parallel'in akış (streaming) hâli: çağrıları paralel başlatır ve (isim, sonuç) çiftlerini veriliş
+    sırasıyla, her sonuç hazır olur olmaz üretir. Böylece ilk sonuç, en yavaş çağrı beklenmeden kullanılabilir.
+    Zaman aşımı ve hata davranışı run_parallel ile aynıdır; üreteç erken kapatılırsa kalan çağrılar iptal edilir.
+    """
+    if len(calls) <= 1 or getattr(_worker_state, "active", False):
+        for name, fn in calls.items():
+            yield name, fn()
+        return
+
+    futures = {name: _executor.submit(_run_in_worker, fn) for name, fn in calls.items()}
+    deadline = time.monotonic() + timeout
+    try:
+        for name, future in futures.items():
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                raise UpstreamTimeoutError(name, timeout) from None
+            yield name, result
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+
+def run_parallel(calls, timeout=UPSTREAM_CALL_TIMEOUT):
+    """
+    Birbirinden bağımsız çağrıları (isim -> argümansız callable) ortak, sınırlı thread havuzunda paralel
+    çalıştırır ve sonuçları aynı isimlerle bir dict olarak döndürür. Toplam süre en yavaş çağrı kadardır.
+
+    Her çağrının sonucu en fazla `timeout` saniye beklenir. Bir çağrı hata verirse veya zaman aşımına
+    uğrarsa henüz başlamamış çağrılar iptal edilir ve hata çağırana iletilir (zaman aşımında
+    UpstreamTimeoutError). Havuz içinden çağrılırsa (iç içe kullanım) kilitlenmemek için çağrılar sırayla
+    çalıştırılır.
+    """
+    return dict(iter_parallel(calls, timeout))
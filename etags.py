@@ -0,0 +1,43 @@
+import hashlib
+import json
+import os
+
+from cache import TTLCache
+
+
+ETAG_MEMO_SIZE = int(os.environ.get("ETAG_MEMO_SIZE", 20000)) # Özeti hatırlanan nesne sayısı
+ETAG_MEMO_TTL = int(os.environ.get("ETAG_MEMO_TTL", 6 * 60 * 60)) # saniye
+
+# id(sözlük) -> (sözlük, özet). Nesnenin kendisi de tutulduğu için id, kayıt yaşadığı sürece başka bir
+# nesneye verilemez. Önbellekteki Spotify verileri değiştirilmediğinden özetleri bir kez hesaplanır.
+# Listeler hatırlanmaz: çoğu istek başına yeni oluşturulan dilimlerdir (örn: items[:limit]) ve hatırlanırlarsa
+# hem TTL boyunca bellekte kalır hem de asıl değerli olan eleman özetlerini LRU'dan çıkarırlar.
+_digest_memo = TTLCache(maxsize=ETAG_MEMO_SIZE, ttl=ETAG_MEMO_TTL)
+
+
+def _hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def content_digest(value, memo=True):
+    """
+    JSON'a çevrilebilir bir değerin içerik özetini döndürür. Listelerde özet, elemanların özetlerinden
+    oluşturulur (liste özetinin kendisi hatırlanmaz); böylece önbellekteki listenin bir dilimi bile
+    elemanların hatırlanan özetleriyle, elemanları yeniden serileştirmeden hesaplanır.
+    memo=False, isteğe özel (kısa ömürlü) nesneler içindir; özet hesaplanır ama hatırlanmaz.
+    """
+    if isinstance(value, list):
+        return _hash_bytes("".join(content_digest(item, memo) for item in value).encode())
+    if memo and isinstance(value, dict):
+        entry = _digest_memo.get(id(value))
+        if entry is not None and entry[0] is value:
+            return entry[1]
+    digest = _hash_bytes(json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode())
+    if memo and isinstance(value, dict):
+        _digest_memo.set(id(value), (value, digest))
+    return digest
+
+
+def make_etag(*parts):
+    """Özetlerden ve yanıtın şeklini belirleyen değerlerden (rota, fields vb.) güçlü bir ETag değeri üretir."""
+    return _hash_bytes("\x1f".join(str(part) for part in parts).encode())
@@ -0,0 +1,255 @@
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+GENRE_GRAPH_PATH = os.environ.get("GENRE_GRAPH_PATH", "genre_graph.json")
+GENRE_GRAPH_SAVE_INTERVAL = int(os.environ.get("GENRE_GRAPH_SAVE_INTERVAL", 5 * 60)) # saniye
+GENRE_GRAPH_MAX_GENRES_PER_ARTIST = 8 # Sanatçı başına sayılan en fazla tür (güncelleme maliyetini sabit tutar)
+GENRE_GRAPH_MAX_ARTISTS = int(os.environ.get("GENRE_GRAPH_MAX_ARTISTS", 200000)) # Sayılan en fazla sanatçı (bellek ve dosya boyutu)
+GENRE_GRAPH_NEIGHBOURS = 10 # Tür başına tutulan en güçlü komşu sayısı
+GENRE_GRAPH_RESERVOIR_SIZE = 4096 # Soğuk başlangıç seçimleri için tür örneklemi
+
+
+class GenreGraph:
+    """
+    Uygulamanın gördüğü sanatçı tür listelerinden öğrenilen tür sıklıkları ve seyrek birlikte görülme
+    (co-occurrence) matrisi.
+
+    - Her sanatçı bir kez sayılır; türleri değişirse eski katkısı geri alınır. Sanatçı başına en fazla
+      GENRE_GRAPH_MAX_GENRES_PER_ARTIST tür sayıldığından güncelleme maliyeti sabittir.
+    - En fazla max_artists sanatçı tutulur; aşılınca en uzun süredir görülmeyen sanatçıların katkısı geri alınır.
+    - Her tür için en sık birlikte görüldüğü komşular güncellemeyle birlikte tutulur; related() O(1)'dir.
+    - Tür örneklerinden oluşan bir rezervuar (reservoir sampling) sıklıkla orantılı rastgele tür seçimini
+      O(1) yapar (dinleme geçmişi olmayan kullanıcılar için).
+    Veriler yerel bir JSON dosyasına kaydedilir ve başlangıçta yüklenir.
+    """
+
+    def __init__(self, path=GENRE_GRAPH_PATH, max_genres=GENRE_GRAPH_MAX_GENRES_PER_ARTIST,
+                 neighbours=GENRE_GRAPH_NEIGHBOURS, reservoir_size=GENRE_GRAPH_RESERVOIR_SIZE,
+                 max_artists=GENRE_GRAPH_MAX_ARTISTS):
+        self.path = path
+        self.max_genres = max_genres
+        self.max_artists = max_artists
+        self.neighbours = neighbours
+        self.reservoir_size = reservoir_size
+        self.counts = {} # tür -> sanatçı sayısı
+        self.cooccurrence = {} # tür -> {komşu tür -> birlikte görüldüğü sanatçı sayısı}
+        self.artist_genres = OrderedDict() # artist_id -> sayılan türler (tuple), en son görülen sonda
+        self._top_neighbours = {} # tür -> en sık komşular (sayıya göre azalan)
+        self._reservoir = []
+        self._reservoir_slots = {} # tür -> rezervuardaki pozisyonları (örnek silmeyi O(1) yapar)
+        self._seen_occurrences = 0
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __len__(self):
+        return len(self.counts)
+
+    # --- Güncelleme ---
+    def add_artists(self, artists):
+        """Türleri bilinen (tam) sanatçı nesnelerini ekler; daha önce aynı türlerle görülenler atlanır."""
+        with self._lock:
+            for artist in artists:
+                if not artist or not artist.get('id') or 'genres' not in artist:
+                    continue
+                genres = tuple(dict.fromkeys(artist['genres']))[:self.max_genres]
+                previous = self.artist_genres.get(artist['id'])
+                if previous == genres:
+                    self.artist_genres.move_to_end(artist['id'])
+                    continue
+                if previous:
+                    self._apply(previous, -1)
+                self.artist_genres[artist['id']] = genres
+                self.artist_genres.move_to_end(artist['id'])
+                self._apply(genres, 1)
+                self._dirty = True
+            while len(self.artist_genres) > self.max_artists:
+                _, genres = self.artist_genres.popitem(last=False)
+                self._apply(genres, -1)
+
+    def _apply(self, genres, delta):
+        for genre in genres:
+            self.counts[genre] = self.counts.get(genre, 0) + delta
+            if self.counts[genre] <= 0:
+                del self.counts[genre]
+            if delta > 0:
+                self._sample(genre)
+            else:
+                self._unsample(genre)
+        for genre in genres:
+            row = self.cooccurrence.setdefault(genre, {})
+            changed = False
+            for other in genres:
+                if other == genre:
+                    continue
+                row[other] = row.get(other, 0) + delta
+                if row[other] <= 0:
+                    del row[other]
+                if delta > 0:
+                    self._promote(genre, other, row[other])
+                elif other in self._top_neighbours.get(genre, ()):
+                    changed = True
+            if not row:
+                del self.cooccurrence[genre]
+                self._top_neighbours.pop(genre, None)
+            elif changed:
+                # Komşu listesindeki bir tür azaldığında (türleri değişen veya çıkarılan sanatçı) liste yeniden hesaplanır
+                self._top_neighbours[genre] = sorted(row, key=row.get, reverse=True)[:self.neighbours]
+
+    def _promote(self, genre, other, count):
+        """Artan birlikte görülme sayısına göre genre'nin komşu listesini günceller (en fazla k eleman)."""
+        row = self.cooccurrence[genre]
+        top = self._top_neighbours.setdefault(genre, [])
+        if other not in top:
+            if len(top) >= self.neighbours and row[top[-1]] >= count:
+                return
+            if len(top) >= self.neighbours:
+                top.pop()
+            top.append(other)
+        # k küçük olduğundan tek elemanı yerine kaydırmak yeterli
+        position = top.index(other)
+        while position > 0 and row[top[position - 1]] < count:
+            top[position - 1], top[position] = top[position], top[position - 1]
+            position -= 1
+
+    def _sample(self, genre):
+        """Reservoir sampling: her tür örneği rezervuarda eşit olasılıkla bulunur (sıklıkla orantılı seçim)."""
+        self._seen_occurrences += 1
+        if len(self._reservoir) < self.reservoir_size:
+            self._reservoir_slots.setdefault(genre, set()).add(len(self._reservoir))
+            self._reservoir.append(genre)
+        else:
+            position = self._rng.randrange(self._seen_occurrences)
+            if position < self.reservoir_size:
+                self._release_slot(position)
+                self._reservoir_slots.setdefault(genre, set()).add(position)
+                self._reservoir[position] = genre
+
+    def _unsample(self, genre):
+        """
+        Geri alınan bir tür örneğini rezervuardan çıkarır. Her örnek rezervuarda
+        len(rezervuar) / görülen örnek olasılığıyla bulunduğundan türün bir kopyası bu olasılıkla silinir.
+        """
+        slots = self._reservoir_slots.get(genre)
+        if slots and self._rng.random() * self._seen_occurrences < len(self._reservoir):
+            position = next(iter(slots))
+            last = len(self._reservoir) - 1
+            self._release_slot(position)
+            if position != last:
+                # Son eleman boşalan yere taşınır; liste sırası önemsiz
+                moved = self._reservoir[last]
+                self._release_slot(last)
+                self._reservoir_slots.setdefault(moved, set()).add(position)
+                self._reservoir[position] = moved
+            self._reservoir.pop()
+        self._seen_occurrences = max(0, self._seen_occurrences - 1)
+
+    def _release_slot(self, position):
+        genre = self._reservoir[position]
+        slots = self._reservoir_slots[genre]
+        slots.discard(position)
+        if not slots:
+            del self._reservoir_slots[genre]
+
+    # --- Sorgular ---
+    def related(self, genre, limit=None):
+        """genre ile en sık birlikte görülen türleri [(tür, benzerlik)] olarak döndürür (kosinüs benzerliği)."""
+        with self._lock:
+            row = self.cooccurrence.get(genre) or {}
+            count = self.counts.get(genre, 0)
+            related = [(other, row[other] / math.sqrt(count * self.counts[other]))
+                       for other in self._top_neighbours.get(genre, ())[:limit] if self.counts.get(other)]
+        return sorted(related, key=lambda item: item[1], reverse=True)
+
+    def sample(self, count, rng=None):
+        """Sıklıkla orantılı olarak en fazla count farklı tür seçer. Yeterli veri yoksa daha az döner."""
+        rng = rng or self._rng
+        with self._lock:
+            reservoir = list(self._reservoir)
+        selected = []
+        for _ in range(count * 10): # Tekrar eden seçimler için sınırlı deneme
+            if len(selected) >= count or not reservoir:
+                break
+            genre = reservoir[rng.randrange(len(reservoir))]
+            if genre not in selected:
+                selected.append(genre)
+        return selected
+
+    # --- Kalıcılık ---
+    def save(self):
+        """
+        Değişiklik varsa grafı dosyaya (önce benzersiz bir geçici dosyaya yazıp yer değiştirerek) kaydeder.
+        Kilit altında sadece verinin kopyası alınır; JSON'a çevirme ve yazma kilit dışında yapılır.
+        Yazma başarısız olursa graf yine değişmiş sayılır ve sonraki kayıtta tekrar denenir.
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {
+                "artist_genres": dict(self.artist_genres),
+                "reservoir": list(self._reservoir),
+                "seen_occurrences": self._seen_occurrences,
+            }
+            self._dirty = False
+        temp_path = None
+        try:
+            data = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+            directory = os.path.dirname(self.path) or '.'
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(self.path)}.", suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with self._lock:
+                self._dirty = True
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+
+    def load(self):
+        """Kaydedilmiş grafı yükler. Sayılar ve komşu listeleri sanatçı türlerinden yeniden hesaplanır."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            # Sırayla yazıldığından (en son görülen sonda) sınır aşılırsa en eski sanatçılar atlanır
+            for artist_id, genres in list(data.get('artist_genres', {}).items())[-self.max_artists:]:
+                genres = tuple(genres)
+                self.artist_genres[artist_id] = genres
+                for genre in genres:
+                    self.counts[genre] = self.counts.get(genre, 0) + 1
+                    row = self.cooccurrence.setdefault(genre, {})
+                    for other in genres:
+                        if other != genre:
+                            row[other] = row.get(other, 0) + 1
+            for genre, row in self.cooccurrence.items():
+                self._top_neighbours[genre] = sorted(row, key=row.get, reverse=True)[:self.neighbours]
+            self._reservoir = list(data.get('reservoir', []))[:self.reservoir_size]
+            self._reservoir_slots = {}
+            for position, genre in enumerate(self._reservoir):
+                self._reservoir_slots.setdefault(genre, set()).add(position)
+            self._seen_occurrences = max(data.get('seen_occurrences', 0), len(self._reservoir))
+        return True
+
+    def start_autosave(self, interval=GENRE_GRAPH_SAVE_INTERVAL):
+        """Grafı arka planda belirli aralıklarla kaydeden thread'i başlatır."""
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.warning(f"Tür grafı kaydedilemedi ({self.path}): {e}")
+        stop = threading.Event()
+        threading.Thread(target=run, name="genre-graph-autosave", daemon=True).start()
+        return stop
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+METADATA_STORE_PATH = os.environ.get("METADATA_STORE_PATH", "metadata.sqlite3")
+METADATA_STORE_FLUSH_INTERVAL = float(os.environ.get("METADATA_STORE_FLUSH_INTERVAL", 2)) # saniye; yazmalar bu aralıklarla toplu yapılır
+METADATA_STORE_FLUSH_BATCH = int(os.environ.get("METADATA_STORE_FLUSH_BATCH", 500)) # Bu kadar bekleyen yazma olunca hemen yazılır
+METADATA_STORE_COMPACT_INTERVAL = int(os.environ.get("METADATA_STORE_COMPACT_INTERVAL", 10 * 60)) # saniye
+METADATA_STORE_MAX_ROWS = int(os.environ.get("METADATA_STORE_MAX_ROWS", 200000)) # Tür (kind) başına en fazla kayıt
+
+
+class MetadataStore:
+    """
+    Sanatçı, şarkı ve arama meta verileri için yeniden başlatmalardan etkilenmeyen yerel SQLite deposu.
+
+    - Yazmalar arka planda toplu yapılır (write-behind): put() sadece bellekteki bekleme listesine ekler,
+      aynı anahtara gelen yazmalar birleşir. İstekler disk yazmasını beklemez.
+    - Her kaydın taze kalma (fresh_until) ve silinme (expires_at) zamanı vardır; load() süresi dolmamış
+      kayıtları en son güncellenenden başlayarak döndürür.
+    - Arka plandaki sıkıştırma (compaction) süresi dolan kayıtları siler, tür başına kayıt sayısını
+      max_rows (veya kind_max_rows'taki türe özel sınır) ile sınırlar; en eski güncellenenler silinir ve
+      boşalan alan dosyaya geri verilir.
+    Aynı dosya aynı makinedeki tüm worker'lar tarafından paylaşılabilir (WAL modu).
+    """
+
+    def __init__(self, path=METADATA_STORE_PATH, max_rows=METADATA_STORE_MAX_ROWS, kind_max_rows=None,
+                 flush_interval=METADATA_STORE_FLUSH_INTERVAL, flush_batch=METADATA_STORE_FLUSH_BATCH,
+                 compact_interval=METADATA_STORE_COMPACT_INTERVAL):
+        self.path = path
+        self.max_rows = max_rows
+        self.kind_max_rows = kind_max_rows or {} # kind -> en fazla kayıt (örn: büyük arama sonuçları için daha az)
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.compact_interval = compact_interval
+        self._local = threading.local()
+        self._pending = {} # (kind, key) -> (data, fresh_until, expires_at, updated_at)
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        conn = self._connection()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL") # Sadece tablo oluşturulmadan önce etkili
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata (kind TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, "
+                "fresh_until REAL NOT NULL, expires_at REAL NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (kind, key))")
+            conn.execute("CREATE INDEX IF NOT EXISTS metadata_expires_at ON metadata (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS metadata_kind_updated_at ON metadata (kind, updated_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Yazma ---
+    def put(self, kind, key, value, ttl, stale_ttl=0):
+        """Kaydı arka planda yazılmak üzere sıraya alır. ttl saniye taze, ttl + stale_ttl saniye sonra silinir."""
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        with self._pending_lock:
+            self._pending[(kind, key)] = (data, now + ttl, now + ttl + stale_ttl, now)
+            pending = len(self._pending)
+        if pending >= self.flush_batch:
+            self._wake.set()
+
+    def put_many(self, kind, items, ttl, stale_ttl=0):
+        """(key, value) çiftlerini sıraya alır."""
+        for key, value in items:
+            self.put(kind, key, value, ttl, stale_ttl)
+
+    def flush(self):
+        """
+        Bekleyen yazmaları tek bir transaction'da diske yazar; yazılan kayıt sayısını döndürür.
+        Yazma başarısız olursa kayıtlar bekleme listesine geri konur (bu arada gelen daha yeni yazmalar korunur).
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO metadata (kind, key, data, fresh_until, expires_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(kind, key, *row) for (kind, key), row in pending.items()])
+        except sqlite3.Error:
+            with self._pending_lock:
+                for pending_key, row in pending.items():
+                    self._pending.setdefault(pending_key, row)
+            raise
+        return len(pending)
+
+    # --- Okuma ---
+    def load(self, kind, limit=None):
+        """
+        Süresi dolmamış kayıtları en son güncellenenden başlayarak (key, value, fresh_remaining) olarak üretir.
+        fresh_remaining kaydın kaç saniye daha taze olduğudur (bayat kayıtlarda negatif).
+        """
+        now = time.time()
+        rows = self._connection().execute(
+            "SELECT key, data, fresh_until FROM metadata WHERE kind = ? AND expires_at > ? ORDER BY updated_at DESC LIMIT ?",
+            (kind, now, -1 if limit is None else limit))
+        for key, data, fresh_until in rows:
+            yield key, json.loads(data), fresh_until - now
+
+    # --- Sıkıştırma ---
+    def compact(self):
+        """Süresi dolan kayıtları siler, tür başına kayıt sayısını sınırlar ve boş sayfaları dosyadan atar."""
+        with self._connection() as conn:
+            removed = conn.execute("DELETE FROM metadata WHERE expires_at <= ?", (time.time(),)).rowcount
+            for (kind,) in conn.execute("SELECT DISTINCT kind FROM metadata").fetchall():
+                removed += conn.execute(
+                    "DELETE FROM metadata WHERE kind = ? AND updated_at < (SELECT updated_at FROM metadata WHERE kind = ? "
+                    "ORDER BY updated_at DESC LIMIT 1 OFFSET ?)", (kind, kind, self.kind_max_rows.get(kind, self.max_rows) - 1)).rowcount
+        conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    # --- Arka Plan ---
+    def start(self):
+        """Yazmaları toplu yapan ve periyodik sıkıştırmayı çalıştıran arka plan thread'ini başlatır."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="metadata-store", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        next_compaction = time.monotonic() + self.compact_interval
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + self.compact_interval
+                    removed = self.compact()
+                    logger.debug(f"Meta veri deposu sıkıştırıldı, {removed} kayıt silindi.")
+            except sqlite3.Error as e:
+                logger.warning(f"Meta veri deposuna yazılamadı ({self.path}): {e}")
+
+    def close(self):
+        """Arka plan thread'ini durdurur ve bekleyen yazmaları diske yazar (örn: çıkışta)."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning(f"Meta veri deposuna son yazmalar yapılamadı ({self.path}): {e}")
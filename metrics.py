@@ -0,0 +1,177 @@
+import bisect
+import math
+import os
+import re
+import threading
+
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "") # Verilirse /metrics için "Authorization: Bearer <token>" gerekir
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # saniye
+
+
+# --- Metrik Türleri ---
+# Prometheus metin formatında (0.0.4) dışa aktarılan, bağımlılıksız hafif metrikler. Değerler süreç (worker)
+# başınadır; birden fazla worker çalışıyorsa Prometheus her birini ayrı hedef olarak toplamalıdır.
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Sadece artan sayaç. inc() etiket değerlerini label_names sırasıyla alır."""
+
+    type = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Histogram:
+    """Sabit kovalı süre histogramı; observe() O(log kova sayısı) ve tek kilit alımıdır."""
+
+    type = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # etiketler -> [kova sayıları..., toplam, adet]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), values):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.label_names, labels, [("le", _number(bound))]), cumulative
+            yield f"{self.name}_sum", _labels(self.label_names, labels), values[-1]
+            yield f"{self.name}_count", _labels(self.label_names, labels), cumulative
+
+
+class CallbackMetric:
+    """Değerleri toplama (scrape) anında callback() -> {etiket değerleri (tuple): değer} ile hesaplanan metrik."""
+
+    def __init__(self, name, help_text, metric_type, label_names, callback):
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.label_names = tuple(label_names)
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback().items():
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def callback(self, name, help_text, metric_type, label_names, callback):
+        return self.register(CallbackMetric(name, help_text, metric_type, label_names, callback))
+
+    def render(self):
+        """Tüm metrikleri Prometheus metin formatında döndürür."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# --- Uygulama Metrikleri ---
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Rota başına istek süresi (akış yanıtlarında ilk bayta kadar).", ("route", "method", "status"))
+SPOTIFY_REQUEST_SECONDS = registry.histogram(
+    "spotify_request_duration_seconds", "Spotify Web API çağrısı başına süre (sıra beklemesi hariç).", ("method", "endpoint", "status"))
+SPOTIFY_QUEUE_WAIT_SECONDS = registry.histogram(
+    "spotify_queue_wait_seconds", "Çağrıların istek bütçesi için sırada bekleme süresi.", ("priority",))
+SPOTIFY_RATE_LIMITED = registry.counter(
+    "spotify_rate_limited_total", "Spotify'dan alınan 429 yanıtları.")
+SPOTIFY_BUDGET_REJECTIONS = registry.counter(
+    "spotify_budget_rejections_total", "Yerel istek bütçesi aşıldığı için Spotify'a gönderilmeden reddedilen çağrılar.", ("priority",))
+SPOTIFY_RETRIES = registry.counter(
+    "spotify_retries_total", "Spotify çağrılarının tekrar denemeleri.", ("reason",))
+TOKEN_REFRESHES = registry.counter(
+    "token_refreshes_total", "Access token yenilemeleri.", ("result",))
+COALESCED_REQUESTS = registry.counter(
+    "coalesced_requests_total", "Devam eden aynı isteğin yanıtını paylaşan istekler.", ("route",))
+CONCURRENCY_REJECTIONS = registry.counter(
+    "concurrency_rejections_total", "Kullanıcı başına eşzamanlı istek sınırı nedeniyle 429 dönen istekler.", ("route",))
+
+
+def register_cache_metrics(caches):
+    """{ad: TTLCache} önbelleklerinin isabet/ıska sayılarını ve isabet oranını toplama anında stats() ile okur."""
+    def collect(field):
+        return lambda: {(name,): cache.stats()[field] for name, cache in caches.items()}
+    registry.callback("cache_hits_total", "Önbellek isabetleri (taze).", "counter", ("cache",), collect("hits"))
+    registry.callback("cache_stale_hits_total", "Önbellek isabetleri (bayat).", "counter", ("cache",), collect("stale_hits"))
+    registry.callback("cache_misses_total", "Önbellek ıskaları.", "counter", ("cache",), collect("misses"))
+    registry.callback("cache_hit_ratio", "Başlangıçtan beri isabet oranı (bayat dahil).", "gauge", ("cache",), collect("hit_ratio"))
+    registry.callback("cache_entries", "Önbellekteki kayıt sayısı.", "gauge", ("cache",), collect("size"))
+
+
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
+def spotify_endpoint(url):
+    """Spotify URL'sini metrik etiketi olarak normalize eder: sorgu ve sunucu atılır, ID'ler (ve kullanıcı adları) {id} olur."""
+    path = url.split('?', 1)[0]
+    parts = path.split('/v1/', 1)[-1].strip('/').split('/')
+    return "/".join("{id}" if _SPOTIFY_ID.match(part) or (index and parts[index - 1] == 'users') else part
+                    for index, part in enumerate(parts))
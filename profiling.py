@@ -0,0 +1,82 @@
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0").lower() in ("1", "true") # Kapalıyken başlık yok sayılır
+PROFILING_HEADER = os.environ.get("PROFILING_HEADER", "X-Profile") # Bu başlıkla gelen istekler profillenir
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "") # Verilirse başlık değeri bu token olmalıdır
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL", 0.005)) # saniye; örnekleme aralığı
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "profiles") # Sonuçların yazılacağı klasör
+PROFILING_MAX_DEPTH = 64 # Örnek başına en fazla çerçeve
+
+
+class SamplingProfiler:
+    """
+    Tek bir thread'in (örn: isteği işleyen thread) çağrı yığınını belirli aralıklarla örnekleyen profiler.
+
+    Hedef thread yavaşlatılmaz; örnekleme ayrı bir thread'de sys._current_frames() ile yapılır. Sonuç,
+    flamegraph araçlarının (flamegraph.pl, speedscope) okuduğu "katlanmış yığın" (folded stacks) formatındadır.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILING_INTERVAL, max_depth=PROFILING_MAX_DEPTH):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = {} # "dış;...;iç" -> örnek sayısı
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            stack = ";".join(reversed(names))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def folded(self):
+        """Sonucu en sık yığından başlayarak katlanmış yığın formatında döndürür."""
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
+
+    def save(self, name, directory=PROFILING_DIR):
+        """Sonucu directory/<zaman>-<name>.folded dosyasına yazar ve dosya adını döndürür."""
+        os.makedirs(directory, exist_ok=True)
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{name}.folded"
+        with open(os.path.join(directory, file_name), 'w', encoding='utf-8') as f:
+            f.write(self.folded())
+        return file_name
+
+
+def profiling_requested(header_value):
+    """İstek başlığına göre profillemenin açılıp açılmayacağını döndürür."""
+    if not PROFILING_ENABLED or not header_value:
+        return False
+    return not PROFILING_TOKEN or hmac.compare_digest(header_value.encode(), PROFILING_TOKEN.encode())
@@ -0,0 +1,96 @@
+import re
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson # requirements.txt'te; wheel'i olmayan platformlarda kurulamazsa standart json kullanılır
+except ImportError:
+    orjson = None
+
+
+# --- Alan Projeksiyonu ---
+# Spotify'ın 'fields' parametresiyle aynı söz dizimi: virgülle ayrılmış alan adları, iç içe alanlar
+# parantez içinde. Örn: "id,name,album(name,images(url)),artists(name)". Listelere her elemana uygulanır.
+
+class FieldsSyntaxError(ValueError):
+    """fields ifadesi geçersiz olduğunda fırlatılır."""
+
+
+_FIELDS_TOKEN = re.compile(r"[^,()]+|[,()]")
+
+
+def _parse_names(tokens, position):
+    tree = {}
+    while True:
+        if position >= len(tokens) or tokens[position] in ',()':
+            raise FieldsSyntaxError(f"Alan adı bekleniyordu (öğe {position}).")
+        name = tokens[position]
+        position += 1
+        subtree = None
+        if position < len(tokens) and tokens[position] == '(':
+            subtree, position = _parse_names(tokens, position + 1)
+            if position >= len(tokens) or tokens[position] != ')':
+                raise FieldsSyntaxError(f"'{name}(' kapanmamış.")
+            position += 1
+        tree[name] = subtree
+        if position < len(tokens) and tokens[position] == ',':
+            position += 1
+            continue
+        return tree, position
+
+
+@lru_cache(maxsize=256)
+def parse_fields(spec):
+    """
+    fields ifadesini {alan: alt_ağaç veya None} ağacına çevirir (None: alanın tamamı alınır).
+    Aynı ifadeler tekrar tekrar ayrıştırılmaz. Geçersiz ifadede FieldsSyntaxError fırlatılır.
+    """
+    tokens = _FIELDS_TOKEN.findall(spec.replace(' ', ''))
+    tree, position = _parse_names(tokens, 0)
+    if position != len(tokens):
+        raise FieldsSyntaxError(f"Beklenmeyen '{tokens[position]}' (öğe {position}).")
+    return tree
+
+
+def project(value, tree):
+    """Değerden sadece ağaçtaki alanları bırakır; listelere her elemana uygulanır, olmayan alanlar atlanır."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {name: project(value[name], subtree) for name, subtree in tree.items() if name in value}
+    return value
+
+
+# --- JSON Serileştirme ---
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    orjson kuruluysa jsonify/request.get_json için orjson kullanan sağlayıcı: yanıt gövdesi ara str
+    oluşturmadan doğrudan bytes olarak üretilir (orjson requirements.txt'te listelidir). orjson import
+    edilemezse standart sağlayıcı gibi davranır, ancak anahtar sıralaması ve ASCII kaçışı kapalıdır
+    (daha az CPU, Türkçe karakterlerde daha küçük gövde).
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype,
+        )
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+DIVERSIFY_CANDIDATE_FACTOR = 10 # Cezalar sadece en iyi k x bu kadar aday için hesaplanır
+
+
+def group_ranks(keys, order_scores):
+    """
+    Her elemanın kendi grubundaki (aynı key) sırasını döndürür: grubun en yüksek puanlısı 0, sonraki 1, ...
+    Python döngüsü olmadan hesaplanır: puana göre sıralanmış dizi, key'e göre kararlı (stable) sıralanır.
+    """
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(-order_scores)
+    order = order[np.argsort(keys[order], kind='stable')]
+    sorted_keys = keys[order]
+    positions = np.arange(n)
+    group_start = np.zeros(n, dtype=bool)
+    group_start[0] = True
+    group_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    first_positions = np.maximum.accumulate(np.where(group_start, positions, 0))
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = positions - first_positions
+    return ranks
+
+
+def diversify(relevance, artist_keys, album_keys, popularity, k, artist_penalty=0.3, album_penalty=0.4,
+              popularity_balance=0.15, jitter=0.1, seed=None, candidate_factor=DIVERSIFY_CANDIDATE_FACTOR):
+    """
+    Aday listesini çeşitliliği gözeterek yeniden sıralar ve seçilen k adayın indekslerini döndürür.
+
+    Maximal-marginal-relevance'ın tek geçişlik bir yaklaşımıdır: her aday, aynı sanatçıdan/albümden
+    kendisinden daha alakalı kaç aday olduğu kadar cezalandırılır (ikinci şarkı artist_penalty, üçüncü
+    2 * artist_penalty, ...). Popülerliği havuz ortalamasından çok uzak olanlar popularity_balance
+    oranında cezalandırılır. jitter > 0 ise her istekte farklı sonuç için alaka puanına küçük bir
+    rastgele gürültü eklenir; seed verilirse sonuç tekrarlanabilir olur.
+    Sanatçı/albüm cezaları sadece (gürültü ve popülerlik dengesinden sonraki) en iyi k * candidate_factor
+    aday için hesaplanır; cezalar puanı sadece düşürdüğünden bu, adaylar birkaç sanatçıda yoğunlaşmadıkça
+    sonucu değiştirmez ve süreyi havuz boyutundan neredeyse bağımsız kılar. None verilirse tüm havuz kullanılır.
+    Tüm hesaplama NumPy dizileri üzerinde yapılır (birkaç bin aday için milisaniyenin altında).
+    """
+    relevance = np.asarray(relevance, dtype=np.float64)
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    max_relevance = relevance.max()
+    scores = relevance / max_relevance if max_relevance > 0 else np.zeros(n)
+    if jitter:
+        scores = scores + jitter * np.random.default_rng(seed).random(n)
+
+    popularity = np.asarray(popularity, dtype=np.float64) / 100
+    scores = scores - popularity_balance * np.abs(popularity - popularity.mean())
+    candidates = np.arange(n)
+    if candidate_factor and n > k * candidate_factor:
+        candidates = np.argpartition(-scores, k * candidate_factor - 1)[:k * candidate_factor]
+        scores = scores[candidates]
+    scores = scores - artist_penalty * group_ranks(np.asarray(artist_keys)[candidates], scores)
+    scores = scores - album_penalty * group_ranks(np.asarray(album_keys)[candidates], scores)
+
+    if len(scores) > k:
+        selected = np.argpartition(-scores, k - 1)[:k]
+    else:
+        selected = np.arange(len(scores))
+    return candidates[selected[np.argsort(-scores[selected], kind='stable')]]
@@ -0,0 +1,198 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from spotipy import SpotifyException
+
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_POOL_SIZE = int(os.environ.get("RECOMMENDATION_POOL_SIZE", 60)) # Kullanıcı başına hazır tutulan öneri sayısı
+RECOMMENDATION_POOL_LOW_WATER = int(os.environ.get("RECOMMENDATION_POOL_LOW_WATER", 24)) # Bunun altına düşünce arka planda doldurulur
+RECOMMENDATION_POOL_ACTIVE_WINDOW = int(os.environ.get("RECOMMENDATION_POOL_ACTIVE_WINDOW", 15 * 60)) # saniye; bu süredir istek yapmayan kullanıcının havuzu silinir
+RECOMMENDATION_POOL_MAX_AGE = int(os.environ.get("RECOMMENDATION_POOL_MAX_AGE", 60 * 60)) # saniye; daha eski öneriler sunulmaz
+RECOMMENDATION_POOL_SHOWN_LIMIT = int(os.environ.get("RECOMMENDATION_POOL_SHOWN_LIMIT", 500)) # Kullanıcı başına hatırlanan gösterilmiş şarkı sayısı
+RECOMMENDATION_POOL_SWEEP_INTERVAL = int(os.environ.get("RECOMMENDATION_POOL_SWEEP_INTERVAL", 60)) # saniye
+
+
+class _UserPool:
+    __slots__ = ('entries', 'built_at', 'shown', 'shown_order', 'last_active', 'context', 'refilling')
+
+    def __init__(self):
+        self.entries = deque() # (şarkı kartı, query_basis)
+        self.built_at = 0.0
+        self.shown = set()
+        self.shown_order = deque()
+        self.last_active = 0.0
+        self.context = None # Arka planda Spotify'a erişmek için (örn: token_info)
+        self.refilling = False
+
+
+class RecommendationPool:
+    """
+    Aktif kullanıcılar için önceden sıralanmış öneri havuzları.
+
+    Her /recommendations isteği havuzdan henüz gösterilmemiş bir sonraki sayfayı alır (yerel işlem).
+    Havuz low_water'ın altına düştüğünde veya eskidiğinde arka plandaki tek bir worker thread,
+    builder(user_id, context, exclude_ids, count) -> [(kart, query_basis), ...] ile havuzu yeniden doldurur.
+    Gösterilen şarkılar hatırlanır ve yeni havuzlara alınmaz. active_window süresince istek yapmayan
+    kullanıcıların havuzları (ve saklanan context'leri) silinir.
+    """
+
+    def __init__(self, builder, size=RECOMMENDATION_POOL_SIZE, low_water=RECOMMENDATION_POOL_LOW_WATER,
+                 active_window=RECOMMENDATION_POOL_ACTIVE_WINDOW, max_age=RECOMMENDATION_POOL_MAX_AGE,
+                 shown_limit=RECOMMENDATION_POOL_SHOWN_LIMIT, sweep_interval=RECOMMENDATION_POOL_SWEEP_INTERVAL):
+        self.builder = builder
+        self.size = size
+        self.low_water = low_water
+        self.active_window = active_window
+        self.max_age = max_age
+        self.shown_limit = shown_limit
+        self.sweep_interval = sweep_interval
+        self._users = {} # user_id -> _UserPool
+        self._lock = threading.Lock()
+        self._refill_queue = queue.Queue()
+        self._worker = None
+
+    def _user(self, user_id):
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserPool()
+        return state
+
+    def touch(self, user_id, context):
+        """Kullanıcıyı aktif olarak işaretler ve arka plan doldurması için context'ini günceller."""
+        with self._lock:
+            state = self._user(user_id)
+            state.last_active = time.monotonic()
+            state.context = context
+
+    def take(self, user_id, count):
+        """
+        Havuzdan gösterilmemiş count adet (kart, query_basis) alır ve gösterildi olarak işaretler.
+        Havuz yoksa, eskimişse veya yeterli öneri kalmadıysa None döner (istek öneriyi kendisi hesaplar).
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                return None
+            if state.built_at and time.monotonic() - state.built_at > self.max_age:
+                state.entries.clear()
+                state.built_at = 0.0
+            while state.entries and state.entries[0][0]['id'] in state.shown:
+                state.entries.popleft()
+            page = None
+            if len(state.entries) >= count:
+                page = [state.entries.popleft() for _ in range(count)]
+                self._mark_shown(state, [card['id'] for card, _ in page])
+            # Hiç havuz yoksa öneriyi istek kendisi hesaplayıp havuzu dolduracağından arka plan işi başlatılmaz
+            if state.built_at and len(state.entries) < self.low_water:
+                self._request_refill(user_id, state)
+            return page
+
+    def fill(self, user_id, entries, replace=False):
+        """
+        Yeni hesaplanan önerileri havuzun sonuna ekler (gösterilmiş ve havuzda zaten olanlar atlanır).
+        replace=True ise havuzdaki eski öneriler atılır.
+        """
+        with self._lock:
+            state = self._user(user_id)
+            if replace:
+                state.entries.clear()
+            pooled = {card['id'] for card, _ in state.entries}
+            for card, query_basis in entries:
+                if len(state.entries) >= self.size:
+                    break
+                if card['id'] not in state.shown and card['id'] not in pooled:
+                    state.entries.append((card, query_basis))
+                    pooled.add(card['id'])
+            state.built_at = time.monotonic()
+
+    def mark_shown(self, user_id, track_ids):
+        with self._lock:
+            self._mark_shown(self._user(user_id), track_ids)
+
+    def _mark_shown(self, state, track_ids):
+        for track_id in track_ids:
+            if track_id not in state.shown:
+                state.shown.add(track_id)
+                state.shown_order.append(track_id)
+        while len(state.shown_order) > self.shown_limit:
+            state.shown.discard(state.shown_order.popleft())
+
+    def refill(self, user_id):
+        """Havuzun arka planda doldurulmasını ister (örn: istek sadece gösterilecek sayfayı hesapladığında)."""
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is not None:
+                self._request_refill(user_id, state)
+
+    def shown_ids(self, user_id):
+        with self._lock:
+            state = self._users.get(user_id)
+            return frozenset(state.shown) if state else frozenset()
+
+    def forget(self, user_id):
+        """Kullanıcının havuzunu, gösterilen şarkılarını ve context'ini siler (örn: çıkışta)."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    # --- Arka Plan Doldurma ---
+    def _request_refill(self, user_id, state):
+        if state.refilling or state.context is None:
+            return
+        state.refilling = True
+        self._refill_queue.put(user_id)
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="recommendation-pool", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        # Süpürme kuyruğun boşalmasına bağlı değildir; sürekli doldurma trafiğinde de sweep_interval'da bir yapılır
+        next_sweep = time.monotonic() + self.sweep_interval
+        while True:
+            try:
+                self._refill(self._refill_queue.get(timeout=max(0.0, next_sweep - time.monotonic())))
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_sweep:
+                self._sweep()
+                next_sweep = time.monotonic() + self.sweep_interval
+
+    def _refill(self, user_id):
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                return
+            context = state.context
+            replace = time.monotonic() - state.built_at > self.max_age / 2 # Eskimeye yaklaşan havuz yenilenir
+            exclude_ids = frozenset(state.shown) if replace else frozenset(state.shown) | {card['id'] for card, _ in state.entries}
+        try:
+            entries = self.builder(user_id, context, exclude_ids, self.size)
+            if entries:
+                self.fill(user_id, entries, replace=replace)
+                logger.debug(f"Kullanıcı {user_id} için öneri havuzu dolduruldu ({len(entries)} aday).")
+        except SpotifyException as e:
+            logger.warning(f"Kullanıcı {user_id} için öneri havuzu doldurulamadı: {e}")
+            if e.http_status in [401, 403]:
+                self.forget(user_id)
+        except Exception as e:
+            logger.warning(f"Kullanıcı {user_id} için öneri havuzu doldurulurken beklenmedik hata: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                state = self._users.get(user_id)
+                if state is not None:
+                    state.refilling = False
+
+    def _sweep(self):
+        """Aktif olmayan kullanıcıları siler; aktiflerin azalmış veya eskimeye yaklaşan havuzlarını doldurur."""
+        now = time.monotonic()
+        with self._lock:
+            for user_id, state in list(self._users.items()):
+                if now - state.last_active > self.active_window:
+                    del self._users[user_id]
+                elif len(state.entries) < self.low_water or now - state.built_at > self.max_age / 2:
+                    self._request_refill(user_id, state)
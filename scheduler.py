@@ -0,0 +1,149 @@
+import logging
+import math
+import os
+import threading
+import time
+
+from spotipy import SpotifyException
+
+from cache import TTLCache
+from metrics import SPOTIFY_QUEUE_WAIT_SECONDS, SPOTIFY_RATE_LIMITED, SPOTIFY_BUDGET_REJECTIONS, SPOTIFY_RETRIES
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0 # Kullanıcının beklediği çağrılar (arama, playlist'e ekleme vb.)
+PRIORITY_BACKGROUND = 1 # Önbellek yenileme, ön hazırlık gibi beklemeye dayanıklı işler
+
+SPOTIFY_APP_RATE = float(os.environ.get("SPOTIFY_APP_RATE", 50)) # Uygulama geneli saniyede istek
+SPOTIFY_APP_BURST = int(os.environ.get("SPOTIFY_APP_BURST", 100))
+SPOTIFY_USER_RATE = float(os.environ.get("SPOTIFY_USER_RATE", 15)) # Kullanıcı başına saniyede etkileşimli istek
+SPOTIFY_USER_BURST = int(os.environ.get("SPOTIFY_USER_BURST", 30))
+SPOTIFY_USER_BACKGROUND_RATE = float(os.environ.get("SPOTIFY_USER_BACKGROUND_RATE", 5)) # Kullanıcı başına saniyede arka plan isteği (ayrı kova)
+SPOTIFY_USER_BACKGROUND_BURST = int(os.environ.get("SPOTIFY_USER_BACKGROUND_BURST", 10))
+SPOTIFY_MAX_QUEUE_WAIT = float(os.environ.get("SPOTIFY_MAX_QUEUE_WAIT", 5)) # Bir çağrı sırada en fazla kaç saniye bekleyebilir
+SPOTIFY_RATE_LIMIT_RETRIES = int(os.environ.get("SPOTIFY_RATE_LIMIT_RETRIES", 2)) # 429 sonrası tekrar deneme sayısı
+SPOTIFY_BACKGROUND_RESERVE = float(os.environ.get("SPOTIFY_BACKGROUND_RESERVE", 0.25)) # Arka plan işlerinin dokunamayacağı bütçe oranı
+
+
+class TokenBucket:
+    """Saniyede `rate` jeton dolan, en fazla `capacity` jeton tutan kova. Kilit dışarıdan sağlanır."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Bir jeton için kaç saniye beklenmesi gerektiğini döndürür (0 ise hemen alınabilir)."""
+        self.refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+def _retry_after_seconds(error):
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('Retry-After', 1)))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class UpstreamScheduler:
+    """
+    Tüm Spotify çağrılarının geçtiği merkezi zamanlayıcı.
+
+    - Uygulama geneli ve kullanıcı başına jeton kovası bütçesi uygular; bütçe dolunca çağrılar sırada bekler.
+      Kullanıcı başına etkileşimli ve arka plan çağrılarının ayrı kovaları vardır; böylece bir kullanıcının
+      öneri havuzu veya indeks hazırlığı, aynı kullanıcının etkileşimli isteklerini sıraya sokmaz.
+    - Spotify 429 döndürdüğünde Retry-After süresi boyunca tüm çağrıları bekletir ve çağrıyı tekrar dener.
+    - Etkileşimli çağrılar önceliklidir: bekleyen etkileşimli çağrı varken veya uygulama bütçesinin
+      SPOTIFY_BACKGROUND_RESERVE kadarı kalmışken arka plan çağrıları sıraya girer.
+    Bekleme süresi SPOTIFY_MAX_QUEUE_WAIT'i (veya çağrıya verilen max_wait'i) aşacaksa 429 SpotifyException fırlatılır.
+    """
+
+    def __init__(self, app_rate=SPOTIFY_APP_RATE, app_burst=SPOTIFY_APP_BURST, user_rate=SPOTIFY_USER_RATE,
+                 user_burst=SPOTIFY_USER_BURST, max_wait=SPOTIFY_MAX_QUEUE_WAIT, max_retries=SPOTIFY_RATE_LIMIT_RETRIES,
+                 background_reserve=SPOTIFY_BACKGROUND_RESERVE, user_background_rate=SPOTIFY_USER_BACKGROUND_RATE,
+                 user_background_burst=SPOTIFY_USER_BACKGROUND_BURST):
+        self.user_limits = {
+            PRIORITY_INTERACTIVE: (user_rate, user_burst),
+            PRIORITY_BACKGROUND: (user_background_rate, user_background_burst),
+        }
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.background_reserve = background_reserve * app_burst
+        self._app_bucket = TokenBucket(app_rate, app_burst)
+        self._user_buckets = TTLCache(maxsize=10000, ttl=10 * 60) # (user_key, öncelik) -> TokenBucket
+        self._blocked_until = 0.0
+        self._waiting_interactive = 0
+        self._cond = threading.Condition()
+
+    def _user_bucket(self, user_key, priority):
+        bucket = self._user_buckets.get((user_key, priority))
+        if bucket is None:
+            bucket = TokenBucket(*self.user_limits[priority])
+            self._user_buckets.set((user_key, priority), bucket)
+        return bucket
+
+    def acquire(self, user_key=None, priority=PRIORITY_INTERACTIVE, max_wait=None):
+        started = time.monotonic()
+        deadline = started + (self.max_wait if max_wait is None else max_wait)
+        with self._cond:
+            interactive = priority == PRIORITY_INTERACTIVE
+            if interactive:
+                self._waiting_interactive += 1
+            try:
+                user_bucket = self._user_bucket(user_key, priority) if user_key else None
+                while True:
+                    now = time.monotonic()
+                    wait = self._blocked_until - now
+                    if wait <= 0:
+                        wait = self._app_bucket.wait_time(now)
+                        if user_bucket:
+                            wait = max(wait, user_bucket.wait_time(now))
+                        if wait <= 0 and not interactive and (
+                                self._waiting_interactive > 0 or self._app_bucket.tokens < self.background_reserve + 1):
+                            wait = 1 / self._app_bucket.rate
+                        if wait <= 0:
+                            self._app_bucket.tokens -= 1
+                            if user_bucket:
+                                user_bucket.tokens -= 1
+                            SPOTIFY_QUEUE_WAIT_SECONDS.observe(now - started, str(priority))
+                            return
+                    if now + wait > deadline:
+                        SPOTIFY_BUDGET_REJECTIONS.inc(str(priority))
+                        raise SpotifyException(429, -1, "Spotify istek bütçesi aşıldı, lütfen daha sonra tekrar deneyin.",
+                                               headers={'Retry-After': str(math.ceil(wait))})
+                    self._cond.wait(wait)
+            finally:
+                if interactive:
+                    self._waiting_interactive -= 1
+                    self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after):
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._cond.notify_all()
+
+    def call(self, fn, user_key=None, priority=PRIORITY_INTERACTIVE, max_wait=None):
+        """fn'i bütçe ve öncelik kurallarına göre çalıştırır; 429 alınırsa Retry-After kadar bekleyip tekrar dener."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(user_key, priority, max_wait)
+            try:
+                return fn()
+            except SpotifyException as e:
+                if e.http_status == 429:
+                    SPOTIFY_RATE_LIMITED.inc()
+                if e.http_status != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = _retry_after_seconds(e)
+                logger.warning(f"Spotify 429 döndürdü, {retry_after} saniye sonra tekrar denenecek (deneme {attempt + 1}).")
+                self.on_rate_limited(retry_after)
+                if retry_after > (self.max_wait if max_wait is None else max_wait):
+                    raise
+                SPOTIFY_RETRIES.inc("rate_limit")
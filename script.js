@@ -49,6 +49,35 @@ function clearError() {
 
 // --- API Call Functions ---
 
+// Hata yanıtlarını işler: login gerekiyorsa false döner, diğer hatalarda mesajı gösterip hata fırlatır.
+async function checkResponse(response) {
+    if (response.status === 401) {
+        // Yetkilendirme hatası (login gerekli)
+        console.warn('Yetkilendirme gerekli, login sayfasına yönlendiriliyor olabilir.');
+        handleLogoutUI(); // Login gerekli ise logout olmuş gibi göster
+        showError("Oturum süresi doldu veya giriş yapmanız gerekiyor.");
+        return false;
+    }
+
+    if (!response.ok) {
+        let errorData;
+        try {
+            errorData = await response.json();
+        } catch (e) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        const errorMessage = errorData.error || `İstek başarısız oldu (HTTP ${response.status})`;
+        if (errorData.login_required) {
+            handleLogoutUI();
+            showError("Oturum süresi doldu veya giriş yapmanız gerekiyor.");
+        } else {
+            showError(errorMessage);
+        }
+        throw new Error(errorMessage); // Hata fırlat
+    }
+    return true;
+}
+
 async function fetchApi(endpoint, options = {}) {
     showLoading();
     clearError(); // Yeni istek öncesi eski hatayı temizle
@@ -62,31 +91,10 @@ async function fetchApi(endpoint, options = {}) {
             },
         });
 
-        if (response.status === 401) {
-            // Yetkilendirme hatası (login gerekli)
-            console.warn('Yetkilendirme gerekli, login sayfasına yönlendiriliyor olabilir.');
-            handleLogoutUI(); // Login gerekli ise logout olmuş gibi göster
-            showError("Oturum süresi doldu veya giriş yapmanız gerekiyor.");
+        if (!(await checkResponse(response))) {
             return null; // Hata durumunda null dön
         }
 
-        if (!response.ok) {
-            let errorData;
-            try {
-                errorData = await response.json();
-            } catch (e) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-            }
-            const errorMessage = errorData.error || `İstek başarısız oldu (HTTP ${response.status})`;
-            if (errorData.login_required) {
-                handleLogoutUI();
-                showError("Oturum süresi doldu veya giriş yapmanız gerekiyor.");
-            } else {
-                showError(errorMessage);
-            }
-            throw new Error(errorMessage); // Hata fırlat
-        }
-
         const contentType = response.headers.get("content-type");
         if (contentType && contentType.indexOf("application/json") !== -1) {
             return await response.json();
@@ -102,6 +110,49 @@ async function fetchApi(endpoint, options = {}) {
     }
 }
 
+// NDJSON akışı döndüren endpoint'ler için: her satır geldiği anda onRecord ile işlenir.
+// Akış başarıyla tamamlanırsa true, hata olursa false döner.
+async function fetchApiStream(endpoint, options = {}, onRecord) {
+    showLoading();
+    clearError(); // Yeni istek öncesi eski hatayı temizle
+    try {
+        const response = await fetch(`${backendUrl}${endpoint}`, {
+            credentials: 'include', // Session cookie'lerini göndermek için önemli
+            ...options,
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'application/x-ndjson',
+                ...(options.headers || {}),
+            },
+        });
+
+        if (!(await checkResponse(response))) {
+            return false;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop(); // Son satır henüz tamamlanmamış olabilir
+            lines.filter(line => line.trim()).forEach(line => onRecord(JSON.parse(line)));
+            hideLoading(); // İlk sonuçlar gösterildi
+        }
+        if (buffer.trim()) onRecord(JSON.parse(buffer));
+        return true;
+
+    } catch (error) {
+        console.error(`API akış hatası (${endpoint}):`, error);
+        return false;
+    } finally {
+        hideLoading();
+    }
+}
+
 // --- UI Update Functions ---
 
 function handleLoginUI(userData) {
@@ -152,6 +203,11 @@ function displayTracks(tracks, containerElement) {
         return;
     }
 
+    appendTracks(tracks, containerElement);
+}
+
+// Şarkı kartlarını mevcut içeriği silmeden ekler (akışla gelen sonuçlar için)
+function appendTracks(tracks, containerElement) {
     tracks.forEach(track => {
         const trackElement = document.createElement('div');
         trackElement.classList.add('song-card'); // Stil için sınıf
@@ -210,53 +266,77 @@ function attachActionListeners(container) {
 // ÖNİZLEME FONKSİYONU KALDIRILDI
 // function handlePreviewClick(event) { ... }
 
-async function handleAddToPlaylistClick(event) {
-    const trackId = event.target.dataset.trackId;
-    if (!trackId) return;
-
+// Kullanıcıya playlist seçtirir; seçilen playlist'i ({id, name}) veya iptal/hata durumunda null döndürür.
+async function choosePlaylist(promptText) {
     if (userPlaylists.length === 0) {
         const playlistsData = await fetchApi('/playlists');
         if (!playlistsData || !Array.isArray(playlistsData)) {
             showError("Playlistler alınamadı veya geçersiz formatta.");
-            return;
+            return null;
         }
         userPlaylists = playlistsData;
     }
 
     if (userPlaylists.length === 0) {
         showError("Hiç playlist'iniz bulunamadı veya alınamadı.");
-        return;
+        return null;
     }
 
     // TODO: Burayı daha kullanıcı dostu bir modal ile değiştir.
     let playlistOptions = userPlaylists.map((pl, index) => `${index + 1}: ${pl.name}`).join('\n');
-    const choice = prompt(`Şarkıyı hangi playlist'e eklemek istersiniz?\n(Numara girin):\n${playlistOptions}`);
+    const choice = prompt(`${promptText}\n(Numara girin):\n${playlistOptions}`);
 
-    if (choice === null || choice.trim() === '') return;
+    if (choice === null || choice.trim() === '') return null;
 
     const choiceIndex = parseInt(choice) - 1;
     if (isNaN(choiceIndex) || choiceIndex < 0 || choiceIndex >= userPlaylists.length) {
         showError("Geçersiz playlist numarası.");
-        return;
+        return null;
     }
+    return userPlaylists[choiceIndex];
+}
+
+async function handleAddToPlaylistClick(event) {
+    const trackId = event.target.dataset.trackId;
+    if (!trackId) return;
 
-    const selectedPlaylistId = userPlaylists[choiceIndex].id;
-    const selectedPlaylistName = userPlaylists[choiceIndex].name;
+    const playlist = await choosePlaylist("Şarkıyı hangi playlist'e eklemek istersiniz?");
+    if (!playlist) return;
 
     const result = await fetchApi('/playlist/add', {
         method: 'POST',
         body: JSON.stringify({
-            playlist_id: selectedPlaylistId,
+            playlist_id: playlist.id,
             track_uri: trackId // Backend ID veya URI kabul ediyor (Backend'e göre ayarla)
         })
     });
 
     if (result && result.message) {
-        alert(`Şarkı "${selectedPlaylistName}" playlistine başarıyla eklendi!`);
+        alert(`Şarkı "${playlist.name}" playlistine başarıyla eklendi!`);
     }
     // Hata mesajı fetchApi içinde gösteriliyor
 }
 
+async function handleAddAllToPlaylistClick(trackIds) {
+    if (!trackIds || trackIds.length === 0) return;
+
+    const playlist = await choosePlaylist(`${trackIds.length} şarkıyı hangi playlist'e eklemek istersiniz?`);
+    if (!playlist) return;
+
+    // Tek istekte gönderilir; playlist'te zaten olan şarkılar backend'de atlanır
+    const result = await fetchApi('/playlist/add_bulk', {
+        method: 'POST',
+        body: JSON.stringify({
+            playlist_id: playlist.id,
+            track_ids: trackIds
+        })
+    });
+
+    if (result && result.message) {
+        alert(`"${playlist.name}": ${result.message}`);
+    }
+}
+
 function handleShareClick(event) {
     const spotifyUrl = event.target.dataset.spotifyUrl;
     if (!spotifyUrl) {
@@ -309,22 +389,48 @@ async function fetchInitialRecommendations() {
 async function fetchUserRecommendations() {
     if (!recommendationsDiv) return;
     recommendationsDiv.innerHTML = ''; // Mevcut içeriği temizle
-    const response = await fetchApi('/recommendations', { method: 'POST' });
-    if (response && response.recommendations) {
-        displayTracks(response.recommendations, recommendationsDiv);
-        if (response.message) {
-            console.info("Öneri Bilgisi:", response.message);
+    const trackIds = [];
+    let summary = null;
+    let streamError = null;
+    // Öneriler akış olarak istenir; her ipucunun kartları hazır oldukça eklenir, en sonda özet gelir
+    const completed = await fetchApiStream('/recommendations', { method: 'POST' }, record => {
+        if (record.recommendations) {
+            appendTracks(record.recommendations, recommendationsDiv);
+            trackIds.push(...record.recommendations.map(track => track.id).filter(Boolean));
+        } else if (record.error) {
+            streamError = record;
+        } else {
+            summary = record;
+        }
+    });
+    if (streamError) {
+        if (streamError.login_required) handleLogoutUI();
+        showError(streamError.error);
+    }
+    if (summary) {
+        if (trackIds.length === 0) {
+            displayTracks([], recommendationsDiv);
+        } else {
+            const addAllButton = document.createElement('button');
+            addAllButton.classList.add('control-button');
+            addAllButton.textContent = "➕ Tümünü Playlist'e Ekle";
+            addAllButton.style.display = 'block';
+            addAllButton.style.margin = '0 auto 10px';
+            addAllButton.onclick = () => handleAddAllToPlaylistClick(trackIds);
+            recommendationsDiv.prepend(addAllButton);
+        }
+        if (summary.message) {
+            console.info("Öneri Bilgisi:", summary.message);
             const infoMsg = document.createElement('p');
-            infoMsg.textContent = response.message;
+            infoMsg.textContent = summary.message;
             infoMsg.style.textAlign = 'center';
             infoMsg.style.marginBottom = '10px';
             recommendationsDiv.prepend(infoMsg);
         }
-    } else if (response && response.error) {
-        recommendationsDiv.innerHTML = '<p>Öneriler alınamadı.</p>';
-    } else {
-        recommendationsDiv.innerHTML = '<p>Öneriler alınırken bir sorun oluştu.</p>';
+    } else if (trackIds.length === 0) {
+        recommendationsDiv.innerHTML = (completed || streamError) ? '<p>Öneriler alınamadı.</p>' : '<p>Öneriler alınırken bir sorun oluştu.</p>';
     }
+    // Akış yarıda kesildiyse o ana kadar gelen öneriler gösterilmeye devam eder
 }
 
 async function fetchAndDisplayProfile() {
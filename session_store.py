@@ -0,0 +1,252 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from cache import TTLCache
+
+
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory") # 'memory' veya 'sqlite'
+SESSION_SQLITE_PATH = os.environ.get("SESSION_SQLITE_PATH", "sessions.sqlite3")
+SESSION_PURGE_INTERVAL = int(os.environ.get("SESSION_PURGE_INTERVAL", 60 * 60)) # saniye; süresi dolan SQLite oturumları bu aralıklarla silinir
+SESSION_MEMORY_SIZE = int(os.environ.get("SESSION_MEMORY_SIZE", 100000)) # oturum sayısı
+SESSION_TOUCH_INTERVAL = float(os.environ.get("SESSION_TOUCH_INTERVAL", 60 * 60)) # Aktif oturumun süresi en fazla bu sıklıkla (saniye) uzatılır
+
+
+class SessionRecord:
+    """
+    Bir oturum için sunucuda tutulan kompakt kayıt: sadece rotaların kullandığı token ve kullanıcı alanları.
+    Session'daki 'token_info' ve 'user_data' sözlüklerine ve geri dönüştürülür; diğer anahtarlar saklanmaz.
+    """
+
+    __slots__ = (
+        'access_token', 'refresh_token', 'expires_at', 'scope', 'token_type',
+        'user_id', 'display_name', 'email', 'image_url', 'profile_url', 'country', 'product',
+    )
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+        for name in self.__slots__[len(values):]:
+            setattr(self, name, None)
+
+    @classmethod
+    def from_session(cls, data):
+        token_info = data.get('token_info') or {}
+        user_data = data.get('user_data') or {}
+        images = user_data.get('images') or []
+        return cls(
+            token_info.get('access_token'),
+            token_info.get('refresh_token'),
+            token_info.get('expires_at'),
+            token_info.get('scope'),
+            token_info.get('token_type'),
+            user_data.get('id'),
+            user_data.get('display_name'),
+            user_data.get('email'),
+            images[0].get('url') if images and images[0] else None,
+            (user_data.get('external_urls') or {}).get('spotify'),
+            user_data.get('country'),
+            user_data.get('product'),
+        )
+
+    def to_session(self):
+        data = {}
+        if self.access_token:
+            data['token_info'] = {
+                "access_token": self.access_token,
+                "refresh_token": self.refresh_token,
+                "expires_at": self.expires_at,
+                "expires_in": max(0, int(self.expires_at - time.time())) if self.expires_at else 0,
+                "scope": self.scope,
+                "token_type": self.token_type or "Bearer",
+            }
+        if self.user_id:
+            data['user_data'] = {
+                "id": self.user_id,
+                "display_name": self.display_name,
+                "email": self.email,
+                "images": [{"url": self.image_url}] if self.image_url else [],
+                "external_urls": {"spotify": self.profile_url} if self.profile_url else {},
+                "country": self.country,
+                "product": self.product,
+            }
+        return data
+
+    def to_row(self):
+        return [getattr(self, name) for name in self.__slots__]
+
+
+def compact_user_data(user_data):
+    """sp.me() yanıtından sadece rotaların ve frontend'in kullandığı alanları bırakır."""
+    return SessionRecord.from_session({'user_data': user_data}).to_session()['user_data']
+
+
+# --- Backend'ler ---
+class MemorySessionBackend:
+    """Tek süreçli dağıtımlar için bellek içi (TTL + LRU) oturum deposu."""
+
+    def __init__(self, maxsize=SESSION_MEMORY_SIZE):
+        self._records = TTLCache(maxsize=maxsize, ttl=31 * 24 * 60 * 60)
+
+    def get(self, sid):
+        return self._records.get(sid)
+
+    def set(self, sid, record, ttl):
+        self._records.set(sid, record, ttl=ttl)
+
+    def touch(self, sid, ttl):
+        record = self._records.get(sid)
+        if record is not None:
+            self._records.set(sid, record, ttl=ttl)
+
+    def delete(self, sid):
+        self._records.pop(sid)
+
+
+class SQLiteSessionBackend:
+    """
+    Yerel SQLite dosyasında oturum deposu; aynı makinedeki worker'lar arasında paylaşılır ve yeniden
+    başlatmalardan etkilenmez. Kayıtlar alan sırasıyla JSON dizisi olarak saklanır.
+    Süresi dolan kayıtlar, yazmalar sırasında en fazla purge_interval saniyede bir silinir.
+    """
+
+    def __init__(self, path=SESSION_SQLITE_PATH, purge_interval=SESSION_PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+        self._purge_lock = threading.Lock()
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())).fetchone()
+        return SessionRecord(*json.loads(row[0])) if row else None
+
+    def set(self, sid, record, ttl):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                         (sid, json.dumps(record.to_row(), separators=(',', ':')), time.time() + ttl))
+        self._purge_if_due()
+
+    def touch(self, sid, ttl):
+        with self._connection() as conn:
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (time.time() + ttl, sid))
+
+    def delete(self, sid):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def _purge_if_due(self):
+        with self._purge_lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + self.purge_interval
+        self.purge_expired()
+
+
+def create_session_backend(name=SESSION_BACKEND):
+    if name == 'sqlite':
+        return SQLiteSessionBackend()
+    if name == 'memory':
+        return MemorySessionBackend()
+    raise ValueError(f"Bilinmeyen SESSION_BACKEND: {name}")
+
+
+# --- Flask Session Arayüzü ---
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.authenticated = 'token_info' in self # Oturum açılırken token var mıydı
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Oturum verisini sunucu tarafındaki backend'de tutar; cookie'de sadece imzalı, opak bir oturum ID'si bulunur.
+    Böylece her istekte büyük bir imzalı cookie'nin serileştirilmesi, imzalanması ve gönderilmesi önlenir.
+
+    - Token oturuma ilk kez yazıldığında (giriş) oturum ID'si yenilenir; girişten önce bilinen bir ID ile
+      oturum sabitleme (session fixation) yapılamaz.
+    - Kullanılan oturumların sunucu tarafı süresi en fazla SESSION_TOUCH_INTERVAL'da bir uzatılır; aktif bir
+      kullanıcının kaydı girişten 31 gün sonra silinmez, her istekte backend'e yazılmaz.
+    """
+
+    def __init__(self, backend, touch_interval=SESSION_TOUCH_INTERVAL):
+        self.backend = backend
+        self._touched = TTLCache(maxsize=SESSION_MEMORY_SIZE, ttl=touch_interval) # son süre uzatması yapılan oturumlar
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='server-side-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            record = self.backend.get(sid) if sid else None
+            if record is not None:
+                if self._touched.get(sid) is None:
+                    self.backend.touch(sid, ttl=app.permanent_session_lifetime.total_seconds())
+                    self._touched.set(sid, True)
+                return ServerSideSession(record.to_session(), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                self.backend.delete(session.sid)
+                self._touched.pop(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified and not session.authenticated and 'token_info' in session:
+            self.backend.delete(session.sid)
+            self._touched.pop(session.sid)
+            session.sid = secrets.token_urlsafe(24)
+            session.new = True
+        if session.modified:
+            self.backend.set(session.sid, SessionRecord.from_session(session),
+                             ttl=app.permanent_session_lifetime.total_seconds())
+        if session.new or (session.modified and self.should_set_cookie(app, session)):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
@@ -0,0 +1,141 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import spotipy
+
+from cache import TTLCache
+from scheduler import UpstreamScheduler, PRIORITY_INTERACTIVE
+from metrics import SPOTIFY_REQUEST_SECONDS, SPOTIFY_RETRIES, spotify_endpoint
+
+
+SPOTIFY_POOL_SIZE = int(os.environ.get("SPOTIFY_POOL_SIZE", 32)) # api.spotify.com için açık tutulacak bağlantı sayısı
+SPOTIFY_MAX_RETRIES = int(os.environ.get("SPOTIFY_MAX_RETRIES", 3))
+SPOTIFY_REQUESTS_TIMEOUT = float(os.environ.get("SPOTIFY_REQUESTS_TIMEOUT", 5)) # saniye
+SPOTIFY_CLIENT_CACHE_SIZE = int(os.environ.get("SPOTIFY_CLIENT_CACHE_SIZE", 1024)) # token başına istemci sayısı
+SPOTIFY_CLIENT_CACHE_TTL = 60 * 60 # Spotify access token'ları 1 saat geçerlidir
+SPOTIFY_API_URL = os.environ.get("SPOTIFY_API_URL", "https://api.spotify.com/v1/") # Testler/benchmark için sahte sunucuya yönlendirilebilir
+SPOTIFY_ACCOUNTS_URL = os.environ.get("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com") # OAuth authorize/token adresleri
+
+
+class CountingRetry(Retry):
+    """Her tekrar denemeyi (bağlantı hatası veya 5xx) spotify_retries_total metriğine sayan Retry."""
+
+    def increment(self, method=None, url=None, response=None, error=None, *args, **kwargs):
+        SPOTIFY_RETRIES.inc(f"status_{response.status}" if response is not None else "connection")
+        return super().increment(method, url, response, error, *args, **kwargs)
+
+
+def build_pooled_session(pool_size=SPOTIFY_POOL_SIZE, max_retries=SPOTIFY_MAX_RETRIES):
+    """
+    Keep-alive ve TLS oturumlarını yeniden kullanan, retry ayarlı ortak bir requests.Session oluşturur.
+    429 yanıtları burada tekrar denenmez; Retry-After'ı tüm çağrılara uygulayan UpstreamScheduler'a bırakılır.
+    """
+    retry = CountingRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=False,
+        status=max_retries,
+        allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+        status_forcelist=(500, 502, 503, 504),
+        backoff_factor=0.3,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class PooledSpotify(spotipy.Spotify):
+    """
+    Ortak bağlantı havuzunu kullanan hafif spotipy istemcisi.
+    Tüm çağrılar (varsa) UpstreamScheduler üzerinden, istemcinin kullanıcı anahtarı, önceliği ve (verilmişse)
+    en fazla sıra bekleme süresiyle yapılır.
+    spotipy.Spotify nesne silinirken session'ı kapatır; havuz paylaşıldığı için burada kapatılmaz.
+    """
+
+    def __init__(self, *args, scheduler=None, user_key=None, priority=PRIORITY_INTERACTIVE, max_wait=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix = SPOTIFY_API_URL.rstrip('/') + '/'
+        self.scheduler = scheduler
+        self.user_key = user_key
+        self.priority = priority
+        self.max_wait = max_wait
+
+    def _internal_call(self, method, url, payload, params):
+        if self.scheduler is None:
+            return self._timed_call(method, url, payload, params)
+        # spotipy params sözlüğünü değiştirdiği için her denemede kopyası gönderilir
+        return self.scheduler.call(
+            lambda: self._timed_call(method, url, payload, dict(params)),
+            user_key=self.user_key,
+            priority=self.priority,
+            max_wait=self.max_wait,
+        )
+
+    def _timed_call(self, method, url, payload, params):
+        """Tek bir HTTP çağrısını (sıra beklemesi hariç) yapar ve süresini endpoint başına kaydeder."""
+        started = time.perf_counter()
+        status = "200"
+        try:
+            return super()._internal_call(method, url, payload, params)
+        except spotipy.SpotifyException as e:
+            status = str(e.http_status)
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            SPOTIFY_REQUEST_SECONDS.observe(time.perf_counter() - started, method, spotify_endpoint(url), status)
+
+    def __del__(self):
+        pass
+
+
+def use_accounts_url(auth_manager, accounts_url=SPOTIFY_ACCOUNTS_URL):
+    """spotipy OAuth/Client Credentials yöneticisinin authorize ve token adreslerini accounts_url'e yönlendirir."""
+    accounts_url = accounts_url.rstrip('/')
+    auth_manager.OAUTH_AUTHORIZE_URL = f"{accounts_url}/authorize"
+    auth_manager.OAUTH_TOKEN_URL = f"{accounts_url}/api/token"
+    return auth_manager
+
+
+class SpotifyClientManager:
+    """
+    Tüm Spotify istemcilerinin tek bir bağlantı havuzunu paylaşmasını sağlar.
+    Kullanıcı istemcileri (access token, kullanıcı anahtarı, öncelik, max_wait) başına önbelleğe alınır; token
+    yenilendiğinde evict() ile atılır.
+    """
+
+    def __init__(self, pool_size=SPOTIFY_POOL_SIZE, max_retries=SPOTIFY_MAX_RETRIES,
+                 requests_timeout=SPOTIFY_REQUESTS_TIMEOUT, cache_size=SPOTIFY_CLIENT_CACHE_SIZE, scheduler=None):
+        self.session = build_pooled_session(pool_size, max_retries)
+        self.requests_timeout = requests_timeout
+        self.scheduler = scheduler or UpstreamScheduler()
+        self._clients = TTLCache(maxsize=cache_size, ttl=SPOTIFY_CLIENT_CACHE_TTL)
+
+    def for_token(self, access_token, user_key=None, priority=PRIORITY_INTERACTIVE, max_wait=None):
+        """
+        user_key kullanıcı başına bütçe için kullanılır; verilmezse access token kullanılır.
+        max_wait verilirse çağrılar sırada SPOTIFY_MAX_QUEUE_WAIT yerine en fazla bu kadar bekler.
+        """
+        # user_key anahtarın parçasıdır; aksi hâlde kullanıcı anahtarsız oluşturulan istemci (örn: giriş sırasındaki
+        # sp.me()) sonraki çağrılara da dönerek bütçeyi kullanıcı yerine token başına tutar
+        key = (access_token, user_key, priority, max_wait)
+        client = self._clients.get(key)
+        if client is None:
+            client = PooledSpotify(auth=access_token, requests_session=self.session,
+                                   requests_timeout=self.requests_timeout, scheduler=self.scheduler,
+                                   user_key=user_key or access_token, priority=priority, max_wait=max_wait)
+            self._clients.set(key, client)
+        return client
+
+    def evict(self, access_token):
+        self._clients.invalidate(lambda key: key[0] == access_token)
+
+    def app_client(self, client_credentials_manager, priority=PRIORITY_INTERACTIVE):
+        """Client Credentials akışı için (kullanıcıdan bağımsız) havuzlu istemci döndürür."""
+        return PooledSpotify(client_credentials_manager=client_credentials_manager, requests_session=self.session,
+                             requests_timeout=self.requests_timeout, scheduler=self.scheduler, priority=priority)
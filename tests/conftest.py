@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, 'bench')]
+
+from fake_spotify import FakeSpotifyConfig, make_server # noqa: E402
+
+
+# Uygulama modülleri ortam değişkenlerini import anında okuduğu için sahte Spotify sunucusu ve geçici
+# dosya yolları, herhangi bir uygulama modülü import edilmeden önce ayarlanır.
+_fake_server = make_server(FakeSpotifyConfig(latency_ms=0, jitter=0, artists=300, tracks=3000, playlists=5, playlist_tracks=120))
+threading.Thread(target=_fake_server.serve_forever, name="fake-spotify", daemon=True).start()
+_fake_url = f"http://127.0.0.1:{_fake_server.server_address[1]}"
+_work_dir = tempfile.mkdtemp(prefix="tests-")
+os.environ.update({
+    "SPOTIFY_API_URL": f"{_fake_url}/v1/",
+    "SPOTIFY_ACCOUNTS_URL": _fake_url,
+    "SPOTIPY_CLIENT_ID": "test-client-id",
+    "SPOTIPY_CLIENT_SECRET": "test-client-secret",
+    "SPOTIPY_REDIRECT_URI": "http://localhost/callback",
+    "FLASK_SECRET_KEY": "test-secret-key",
+    "FRONTEND_URL": "http://frontend.test/",
+    "METADATA_STORE_PATH": os.path.join(_work_dir, "metadata.sqlite3"),
+    "GENRE_GRAPH_PATH": os.path.join(_work_dir, "genre_graph.json"),
+    "PROFILING_DIR": os.path.join(_work_dir, "profiles"),
+})
+os.chdir(_work_dir) # spotipy token önbelleği (.cache) gibi göreli dosyalar proje klasörüne yazılmasın
+
+
+@pytest.fixture(scope="session")
+def fake_spotify():
+    """Testlerin paylaştığı sahte Spotify verisi (bench/fake_spotify.py)."""
+    return _fake_server.fake
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app
+    app.app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def logged_in_client(client, fake_spotify):
+    """OAuth callback akışıyla giriş yapmış (her seferinde yeni bir kullanıcı) test istemcisi."""
+    response = client.get(f"/callback?code={fake_spotify.authorize()}")
+    assert response.status_code == 302, response.location
+    response = client.get(response.location)
+    assert response.status_code == 302 and 'error=' not in response.location, response.location
+    return client
@@ -0,0 +1,21 @@
+from run_bench import RouteStats, summarize
+
+
+def route_stats(statuses, exceptions=0):
+    stats = RouteStats()
+    for status, count in statuses.items():
+        for _ in range(count):
+            stats.record(0.01, status)
+    for _ in range(exceptions):
+        stats.record(0.01)
+    return stats
+
+
+def test_throttled_requests_are_reported_separately_from_errors():
+    rows, overall = summarize({
+        "GET /profile": route_stats({200: 90, 429: 8, 500: 1}, exceptions=1),
+        "GET /playlists": route_stats({200: 98, 429: 2}),
+    }, elapsed=1.0)
+    assert [row["rate_limited"] for row in rows] == [8, 2]
+    assert overall["errors"] == 2 and overall["error_rate"] == 0.01
+    assert overall["rate_limited"] == 10 and overall["throttle_rate"] == 0.05
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+
+from catalog import TrackCatalog
+
+
+GENRES = ['pop', 'rock', 'jazz', 'metal', 'soul']
+
+
+def artist(i):
+    return {'id': f'a{i}', 'name': f'A{i}', 'genres': random.Random(i).sample(GENRES, 2)}
+
+
+def track(i, artists=70):
+    return {'id': f't{i}', 'name': f'T{i}', 'artists': [{'id': f'a{i % artists}', 'name': f'A{i % artists}'}],
+            'album': {'id': f'al{i // 3}'}, 'popularity': i % 100}
+
+
+def filled_catalog(batches=30):
+    catalog = TrackCatalog(initial_capacity=4, max_tracks=100, max_artists=50)
+    for batch in range(batches):
+        catalog.add_tracks([track(i) for i in range(batch * 10, batch * 10 + 10)])
+        catalog.add_artists([artist(i) for i in range(70)])
+        catalog.add_tracks([track(0)]) # t0 sürekli yeniden görülür
+    return catalog
+
+
+def test_capacity_evicts_least_recently_seen_tracks():
+    catalog = filled_catalog()
+    assert len(catalog) <= 100
+    assert 't0' in catalog.track_index # Sık görülen şarkı atılmaz
+    assert 't15' not in catalog.track_index
+    assert 't295' in catalog.track_index
+
+
+def test_compaction_keeps_rows_consistent():
+    catalog = filled_catalog()
+    for track_id, row in catalog.track_index.items():
+        i = int(track_id[1:])
+        assert catalog.ids([row]) == [track_id]
+        artist_rows, album_rows, popularity = catalog.features([row])
+        assert catalog._artist_ids[artist_rows[0]] == f'a{i % 70}'
+        assert popularity[0] == i % 100
+    albums = {}
+    for track_id, row in catalog.track_index.items():
+        albums.setdefault(int(track_id[1:]) // 3, set()).add(int(catalog.features([row])[1][0]))
+    assert all(len(numbers) == 1 for numbers in albums.values())
+    assert len({next(iter(numbers)) for numbers in albums.values()}) == len(albums)
+    # Silinmiş tür çiftleri sıkıştırmada temizlenir
+    assert catalog._pair_count == catalog._live_pairs
+
+
+def test_artists_beyond_capacity_are_dropped_unless_referenced():
+    catalog = TrackCatalog(max_tracks=1000, max_artists=20)
+    catalog.add_tracks([track(i, artists=5) for i in range(5)])
+    catalog.add_artists([artist(i) for i in range(100)])
+    assert len(catalog.artist_index) <= 20
+    assert all(f'a{i}' in catalog.artist_index for i in range(5))
+
+
+def test_score_rows_matches_full_score():
+    catalog = filled_catalog()
+    genre_weights = {'pop': 1.0, 'jazz': 0.5}
+    full = catalog.score(genre_weights, {'a3': 0.2}, exclude_ids={'t0'})
+    rows = np.arange(len(catalog))[::3]
+    subset = catalog.score_rows(rows, genre_weights, {'a3': 0.2}, exclude_ids={'t0'})
+    assert np.array_equal(np.isinf(full[rows]), np.isinf(subset))
+    assert np.allclose(full[rows][np.isfinite(subset)], subset[np.isfinite(subset)])
+    assert len(catalog.score_rows([], genre_weights)) == 0
+
+
+def test_top_k_orders_by_score():
+    catalog = filled_catalog()
+    rows, scores, match_count = catalog.top_k({'pop': 1.0}, 5)
+    assert len(rows) == 5 and match_count >= 5
+    assert list(scores) == sorted(scores, reverse=True)
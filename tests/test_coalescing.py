@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from coalescing import ConcurrencyLimitExceeded, RequestCoalescer
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def start(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def test_concurrent_identical_requests_share_one_computation():
+    coalescer = RequestCoalescer(max_per_user=1)
+    started, finish = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        finish.wait(2)
+        return "body"
+
+    leader = start(lambda: results.append(coalescer.run("key", "u1", compute)))
+    started.wait(2)
+    followers = [start(lambda: results.append(coalescer.run("key", "u1", compute))) for _ in range(3)]
+    wait_for(lambda: coalescer._flights["key"].followers == 3)
+    finish.set()
+    for thread in [leader, *followers]:
+        thread.join(2)
+    assert calls == [1]
+    assert sorted(results) == [("body", False), ("body", True), ("body", True), ("body", True)]
+    assert coalescer._active == {} and coalescer._flights == {}
+
+
+def test_followers_receive_the_leaders_error():
+    coalescer = RequestCoalescer()
+    started, finish = threading.Event(), threading.Event()
+    errors = []
+
+    def compute():
+        started.set()
+        finish.wait(2)
+        raise ValueError("upstream")
+
+    def call():
+        try:
+            coalescer.run("key", "u1", compute)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = start(call)
+    started.wait(2)
+    follower = start(call)
+    wait_for(lambda: coalescer._flights["key"].followers == 1)
+    finish.set()
+    leader.join(2)
+    follower.join(2)
+    assert len(errors) == 2 and errors[0] is errors[1]
+    assert coalescer._active == {}
+
+
+def test_distinct_requests_are_limited_per_user():
+    coalescer = RequestCoalescer(max_per_user=1)
+    coalescer.acquire("u1")
+    with pytest.raises(ConcurrencyLimitExceeded):
+        coalescer.run("other", "u1", lambda: "body")
+    assert coalescer.run("key", "u2", lambda: "body") == ("body", False) # Diğer kullanıcılar etkilenmez
+    coalescer.release("u1")
+    assert coalescer.run("other", "u1", lambda: "body") == ("body", False)
+    assert coalescer._active == {}
+
+
+def test_non_object_json_body_is_rejected_on_coalesced_routes(logged_in_client):
+    response = logged_in_client.post('/recommendations', json=[1, 2])
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_non_object_json_body_does_not_break_the_request_key(logged_in_client):
+    response = logged_in_client.get('/profile', json=[1, 2])
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("route", ['/playlist/add', '/playlist/add_bulk'])
+def test_non_object_json_body_is_rejected_on_playlist_routes(logged_in_client, route):
+    response = logged_in_client.post(route, json=[1, 2])
+    assert response.status_code == 400
+    assert response.is_json
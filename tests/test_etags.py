@@ -0,0 +1,18 @@
+import etags
+from etags import content_digest
+
+
+def test_list_slices_reuse_item_digests_without_growing_the_memo(monkeypatch):
+    monkeypatch.setattr(etags, '_digest_memo', etags.TTLCache(maxsize=1000, ttl=60))
+    items = [{"id": f"a{n}", "genres": ["rock"]} for n in range(10)]
+    digest = content_digest(items[:5])
+    for _ in range(100):
+        assert content_digest(items[:5]) == digest
+    assert len(etags._digest_memo._data) == 5 # Sadece eleman (sözlük) özetleri
+
+
+def test_digest_changes_with_content_and_order():
+    items = [{"id": "a1"}, {"id": "a2"}]
+    assert content_digest(items) != content_digest(items[::-1])
+    assert content_digest([{"id": "a1"}], memo=False) == content_digest([{"id": "a1"}])
+    assert content_digest({"b": 1, "a": 2}, memo=False) == content_digest({"a": 2, "b": 1}, memo=False)
@@ -0,0 +1,90 @@
+import os
+import random
+
+import pytest
+
+from genre_graph import GenreGraph
+
+
+def artist(artist_id, *genres):
+    return {"id": artist_id, "genres": list(genres)}
+
+
+def rebuilt(graph, tmp_path):
+    """Aynı sanatçı türlerinden sıfırdan hesaplanan graf (sayılar ve komşular karşılaştırması için)."""
+    fresh = GenreGraph(path=str(tmp_path / "fresh.json"), max_artists=graph.max_artists)
+    fresh.add_artists([artist(artist_id, *genres) for artist_id, genres in graph.artist_genres.items()])
+    return fresh
+
+
+def assert_reservoir_consistent(graph):
+    slots = {}
+    for position, genre in enumerate(graph._reservoir):
+        slots.setdefault(genre, set()).add(position)
+    assert slots == graph._reservoir_slots
+
+
+def test_changed_genres_are_removed_from_counts_and_reservoir(tmp_path):
+    graph = GenreGraph(path=str(tmp_path / "graph.json"))
+    graph.add_artists([artist("a1", "rock", "indie"), artist("a2", "rock", "pop")])
+    graph.add_artists([artist("a1", "jazz")])
+    assert graph.counts == {"rock": 1, "pop": 1, "jazz": 1}
+    assert sorted(graph._reservoir) == ["jazz", "pop", "rock"] # Rezervuar dolu değilken örnekler kesin silinir
+    assert_reservoir_consistent(graph)
+    assert [genre for genre, _ in graph.related("rock")] == ["pop"]
+
+
+def test_least_recently_seen_artists_are_evicted(tmp_path):
+    graph = GenreGraph(path=str(tmp_path / "graph.json"), max_artists=3)
+    graph.add_artists([artist("a1", "rock"), artist("a2", "pop"), artist("a3", "jazz")])
+    graph.add_artists([artist("a1", "rock")]) # a1 yeniden görüldü, en eski a2
+    graph.add_artists([artist("a4", "metal", "rock")])
+    assert list(graph.artist_genres) == ["a3", "a1", "a4"]
+    assert graph.counts == {"rock": 2, "jazz": 1, "metal": 1}
+    assert_reservoir_consistent(graph)
+
+
+def test_random_updates_match_a_rebuilt_graph(tmp_path):
+    rng = random.Random(5)
+    genres = [f"g{n}" for n in range(30)]
+    graph = GenreGraph(path=str(tmp_path / "graph.json"), max_artists=50, reservoir_size=64, neighbours=4)
+    for _ in range(400):
+        graph.add_artists([artist(f"a{rng.randrange(120)}", *rng.sample(genres, rng.randint(0, 5)))])
+    fresh = rebuilt(graph, tmp_path)
+    assert graph.counts == fresh.counts
+    assert graph.cooccurrence == fresh.cooccurrence
+    for genre, row in graph.cooccurrence.items():
+        top = graph._top_neighbours[genre]
+        assert sorted((row[other] for other in top), reverse=True) == sorted(row.values(), reverse=True)[:4]
+    assert len(graph._reservoir) <= 64
+    assert_reservoir_consistent(graph)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "graph.json")
+    graph = GenreGraph(path=path)
+    graph.add_artists([artist("a1", "rock", "indie"), artist("a2", "rock", "pop")])
+    assert graph.save() is True
+    assert graph.save() is False # Değişiklik yok
+    loaded = GenreGraph(path=path, max_artists=1)
+    assert loaded.load()
+    assert list(loaded.artist_genres) == ["a2"] # Sınır aşılınca en son görülenler yüklenir
+    assert loaded.counts == {"rock": 1, "pop": 1}
+    assert_reservoir_consistent(loaded)
+    assert os.listdir(tmp_path) == ["graph.json"]
+
+
+def test_failed_save_keeps_the_graph_dirty_and_cleans_up(tmp_path, monkeypatch):
+    graph = GenreGraph(path=str(tmp_path / "graph.json"))
+    graph.add_artists([artist("a1", "rock")])
+
+    def failing_replace(src, dst):
+        raise OSError("disk dolu")
+
+    monkeypatch.setattr(os, 'replace', failing_replace)
+    with pytest.raises(OSError):
+        graph.save()
+    assert os.listdir(tmp_path) == []
+    monkeypatch.undo()
+    assert graph.save() is True
+    assert os.listdir(tmp_path) == ["graph.json"]
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from metadata_store import MetadataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetadataStore(path=str(tmp_path / "metadata.sqlite3"))
+
+
+class FailingConnection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_puts_are_coalesced_and_loaded_newest_first(store):
+    store.put('artist', 'a1', {"name": "old"}, ttl=60)
+    store.put('artist', 'a1', {"name": "new"}, ttl=60)
+    store.put('artist', 'a2', {"name": "other"}, ttl=60)
+    assert store.flush() == 2
+    assert store.flush() == 0
+    loaded = {key: value for key, value, _ in store.load('artist')}
+    assert loaded == {"a1": {"name": "new"}, "a2": {"name": "other"}}
+
+
+def test_failed_flush_requeues_rows_without_overwriting_newer_ones(store, monkeypatch):
+    store.put('artist', 'a1', {"name": "first"}, ttl=60)
+    store.put('artist', 'a2', {"name": "kept"}, ttl=60)
+    connection = store._connection
+
+    def failing_connection():
+        store.put('artist', 'a1', {"name": "newer"}, ttl=60) # Yazma sırasında gelen daha yeni kayıt
+        return FailingConnection()
+
+    monkeypatch.setattr(store, '_connection', failing_connection)
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    monkeypatch.setattr(store, '_connection', connection)
+
+    assert store.flush() == 2
+    loaded = {key: value for key, value, _ in store.load('artist')}
+    assert loaded == {"a1": {"name": "newer"}, "a2": {"name": "kept"}}
+
+
+def test_compact_keeps_the_newest_rows_per_kind(tmp_path):
+    store = MetadataStore(path=str(tmp_path / "metadata.sqlite3"), max_rows=2, kind_max_rows={'search': 1})
+    for n in range(4):
+        store.put('track', f't{n}', n, ttl=60)
+        store.put('search', f's{n}', n, ttl=60)
+        store.flush()
+    store.put('track', 'expired', 0, ttl=-1)
+    store.flush()
+    store.compact()
+    assert [key for key, _, _ in store.load('track')] == ['t3', 't2']
+    assert [key for key, _, _ in store.load('search')] == ['s3']
@@ -0,0 +1,64 @@
+from spotipy import SpotifyException
+
+
+def track_id(n):
+    return f"tr{n:020d}" # spotipy sadece 22 karakterlik ID'leri kabul eder
+
+
+def first_playlist_id(client):
+    response = client.get('/playlists')
+    assert response.status_code == 200
+    return response.get_json()[0]['id']
+
+
+def first_track_id(client, app_module, playlist_id):
+    return next(iter(app_module.playlist_index_cache.get(playlist_id)['track_ids']))
+
+
+def test_non_string_track_uri_is_rejected(logged_in_client):
+    playlist_id = first_playlist_id(logged_in_client)
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": 123})
+    assert response.status_code == 400
+    assert response.is_json
+
+
+def test_duplicate_add_returns_409(logged_in_client, app_module):
+    playlist_id = first_playlist_id(logged_in_client)
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": f"spotify:track:{track_id(900001)}"})
+    assert response.status_code == 200
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": track_id(900001)})
+    assert response.status_code == 409
+    existing = first_track_id(logged_in_client, app_module, playlist_id)
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": existing})
+    assert response.status_code == 409
+
+
+def test_playlist_too_large_to_index_still_accepts_adds(logged_in_client, app_module, monkeypatch, fake_spotify):
+    monkeypatch.setattr(app_module, 'PLAYLIST_INDEX_MAX_PAGES', 1) # Test playlist'leri 2 sayfa
+    playlist_id = first_playlist_id(logged_in_client)
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": track_id(900002)})
+    assert response.status_code == 200
+    assert app_module.playlist_index_cache.get(playlist_id)['track_ids'] is None
+
+    def playlist_reads():
+        return sum(count for key, count in fake_spotify.stats()['calls'].items()
+                   if key.startswith('GET ') and key.split(' ')[1].startswith('playlists/'))
+
+    reads = playlist_reads()
+    response = logged_in_client.post('/playlist/add_bulk', json={"playlist_id": playlist_id, "track_ids": [track_id(900003), track_id(900003)]})
+    assert response.status_code == 200
+    assert response.get_json()['added'] == [track_id(900003)]
+    assert playlist_reads() == reads # İndekssiz kayıt önbellekte; playlist yeniden okunmaz
+
+
+def test_budget_exhausted_while_indexing_falls_back_to_plain_add(logged_in_client, app_module, monkeypatch):
+    playlist_id = first_playlist_id(logged_in_client)
+    app_module.playlist_index_cache.pop(playlist_id)
+
+    def budget_exceeded(*args, **kwargs):
+        raise SpotifyException(429, -1, "Spotify istek bütçesi aşıldı.", headers={'Retry-After': '1'})
+
+    monkeypatch.setattr(app_module, 'get_playlist_index', budget_exceeded)
+    response = logged_in_client.post('/playlist/add', json={"playlist_id": playlist_id, "track_uri": track_id(900004)})
+    assert response.status_code == 200
+    assert app_module.playlist_index_cache.get(playlist_id)['track_ids'] is None # Kısa süre yeniden denenmez
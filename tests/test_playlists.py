@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.fixture
+def many_playlists(fake_spotify, monkeypatch):
+    monkeypatch.setattr(fake_spotify.config, 'playlists', 230) # 5 sayfa
+    return 230
+
+
+def list_calls(fake_spotify):
+    return fake_spotify.stats()['calls'].get('GET me/playlists', 0)
+
+
+def user_id(client):
+    with client.session_transaction() as session:
+        return session['user_data']['id']
+
+
+def expire(app_module, client):
+    """Önbellekteki listeyi bayat hâle getirir (ilk sayfa ile yeniden doğrulanır)."""
+    key = user_id(client)
+    app_module.user_playlists_cache.set(key, app_module.user_playlists_cache.peek(key), ttl=0)
+
+
+def test_remaining_pages_are_fetched_in_capped_groups(logged_in_client, app_module, fake_spotify, many_playlists, monkeypatch):
+    monkeypatch.setattr(app_module, 'PLAYLISTS_PAGE_CONCURRENCY', 2)
+    calls = list_calls(fake_spotify)
+    response = logged_in_client.get('/playlists')
+    assert response.status_code == 200
+    playlists = response.get_json()
+    assert len(playlists) == many_playlists and len({playlist['id'] for playlist in playlists}) == many_playlists
+    assert list_calls(fake_spotify) - calls == 5
+
+
+def test_first_page_revalidation_is_bounded(logged_in_client, app_module, fake_spotify, many_playlists, monkeypatch):
+    assert logged_in_client.get('/playlists').status_code == 200
+
+    expire(app_module, logged_in_client)
+    calls = list_calls(fake_spotify)
+    assert len(logged_in_client.get('/playlists').get_json()) == many_playlists
+    assert list_calls(fake_spotify) - calls == 1 # Sadece ilk sayfa
+
+    monkeypatch.setattr(app_module, 'PLAYLISTS_FULL_REFRESH_INTERVAL', 0)
+    expire(app_module, logged_in_client)
+    calls = list_calls(fake_spotify)
+    assert len(logged_in_client.get('/playlists').get_json()) == many_playlists
+    assert list_calls(fake_spotify) - calls == 5 # Son tam çekim eski, tüm sayfalar yeniden çekilir
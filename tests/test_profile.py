@@ -0,0 +1,17 @@
+def test_profile_feeds_the_catalog_on_304_too(logged_in_client, app_module, monkeypatch):
+    first = logged_in_client.get('/profile')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    remembered = []
+    monkeypatch.setattr(app_module, 'remember_artists', lambda artists: remembered.append('artists'))
+    monkeypatch.setattr(app_module, 'remember_tracks', lambda tracks: remembered.append('tracks'))
+    response = logged_in_client.get('/profile', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert remembered == ['artists', 'tracks']
+
+
+def test_profile_tracks_are_in_the_catalog(logged_in_client, app_module):
+    profile = logged_in_client.get('/profile').get_json()
+    assert profile['top_tracks']
+    assert all(track['id'] in app_module.track_catalog.track_index for track in profile['top_tracks'])
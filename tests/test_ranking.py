@@ -0,0 +1,35 @@
+import numpy as np
+
+from ranking import diversify, group_ranks
+
+
+def test_group_ranks_orders_within_group():
+    ranks = group_ranks(np.array([1, 2, 1, 1]), np.array([0.5, 0.9, 0.7, 0.1]))
+    assert list(ranks) == [1, 0, 0, 2]
+
+
+def test_diversify_penalizes_repeated_artists():
+    relevance = np.array([1.0, 0.99, 0.98, 0.5])
+    artists = np.array([1, 1, 1, 2])
+    albums = np.arange(4)
+    selected = diversify(relevance, artists, albums, np.full(4, 50), 2, artist_penalty=1.5, jitter=0,
+                         popularity_balance=0)
+    assert list(selected) == [0, 3]
+
+
+def test_candidate_cap_keeps_selection_and_original_indices():
+    rng = np.random.default_rng(3)
+    n = 5000
+    relevance = rng.random(n)
+    artists = rng.integers(0, n // 5, n)
+    albums = rng.integers(0, n // 3, n)
+    popularity = rng.integers(0, 100, n)
+    capped = diversify(relevance, artists, albums, popularity, 12, seed=7)
+    full = diversify(relevance, artists, albums, popularity, 12, seed=7, candidate_factor=None)
+    assert list(capped) == list(full)
+    assert len(set(capped.tolist())) == 12 and capped.max() < n
+
+
+def test_diversify_small_pool_returns_everything():
+    selected = diversify(np.array([0.2, 0.8]), np.array([1, 2]), np.array([1, 2]), np.array([10, 20]), 5, jitter=0)
+    assert sorted(selected.tolist()) == [0, 1]
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from spotipy import SpotifyException
+
+from recommendation_pool import RecommendationPool
+
+
+def card(n):
+    return {"id": f"t{n}"}
+
+
+def entries(start, count):
+    return [(card(n), "basis") for n in range(start, start + count)]
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Builder:
+    def __init__(self, size=10):
+        self.size = size
+        self.calls = []
+        self.next = 1000
+
+    def __call__(self, user_id, context, exclude_ids, count):
+        self.calls.append((user_id, context, exclude_ids))
+        self.next += self.size
+        return entries(self.next, self.size)
+
+
+def test_take_returns_unshown_pages_and_skips_shown_tracks():
+    pool = RecommendationPool(Builder(), size=10, low_water=0)
+    assert pool.take("u1", 3) is None
+    pool.fill("u1", entries(0, 6))
+    pool.mark_shown("u1", ["t0"])
+    pool.fill("u1", entries(0, 2)) # t0 gösterildi, t1 zaten havuzda: eklenmez
+    page = pool.take("u1", 3)
+    assert [c["id"] for c, _ in page] == ["t1", "t2", "t3"]
+    assert pool.take("u1", 3) is None # Sadece t4, t5 kalır
+    assert {"t0", "t1", "t2", "t3"} <= pool.shown_ids("u1")
+
+
+def test_low_water_triggers_background_refill_excluding_shown_and_pooled():
+    builder = Builder()
+    pool = RecommendationPool(builder, size=10, low_water=4)
+    pool.touch("u1", {"token": "a"})
+    pool.fill("u1", entries(0, 5))
+    pool.take("u1", 2)
+    assert wait_until(lambda: builder.calls)
+    user_id, context, exclude_ids = builder.calls[0]
+    assert user_id == "u1" and context == {"token": "a"}
+    assert {f"t{n}" for n in range(5)} <= exclude_ids
+    assert wait_until(lambda: pool.take("u1", 8) is not None)
+
+
+def test_refill_without_context_is_not_scheduled():
+    builder = Builder()
+    pool = RecommendationPool(builder, size=10, low_water=4)
+    pool.fill("u1", entries(0, 5))
+    pool.take("u1", 2)
+    time.sleep(0.1)
+    assert builder.calls == []
+
+
+def test_unauthorized_refill_forgets_the_user():
+    def builder(user_id, context, exclude_ids, count):
+        raise SpotifyException(401, -1, "expired")
+
+    pool = RecommendationPool(builder, size=10, low_water=4)
+    pool.touch("u1", {})
+    pool.fill("u1", entries(0, 5))
+    pool.take("u1", 2)
+    assert wait_until(lambda: pool.shown_ids("u1") == frozenset())
+
+
+def test_sweep_runs_under_steady_refill_traffic():
+    refilled = threading.Event()
+    pool = RecommendationPool(lambda *args: refilled.set() or [], size=10, low_water=4, active_window=0.2,
+                              sweep_interval=0.2)
+    pool.touch("idle", {})
+    pool.touch("busy", {})
+    stop = time.monotonic() + 1.0
+    while time.monotonic() < stop:
+        pool.touch("busy", {})
+        pool.refill("busy") # Kuyruk hiç boş kalmadan beklemez
+        time.sleep(0.02)
+    assert refilled.is_set()
+    assert "idle" not in pool._users
+    assert "busy" in pool._users
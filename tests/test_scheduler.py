@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from spotipy import SpotifyException
+
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, UpstreamScheduler
+
+
+def scheduler(**kwargs):
+    options = dict(app_rate=1000, app_burst=1000, user_rate=1000, user_burst=1000, user_background_rate=1000,
+                   user_background_burst=1000, max_wait=1, max_retries=2, background_reserve=0)
+    options.update(kwargs)
+    return UpstreamScheduler(**options)
+
+
+def timed(fn):
+    started = time.monotonic()
+    fn()
+    return time.monotonic() - started
+
+
+def test_burst_is_immediate_then_calls_wait_for_the_bucket():
+    upstream = scheduler(user_rate=10, user_burst=3)
+    assert timed(lambda: [upstream.acquire("u1") for _ in range(3)]) < 0.05
+    assert 0.07 < timed(lambda: upstream.acquire("u1")) < 0.3
+    assert timed(lambda: upstream.acquire("u2")) < 0.05 # Diğer kullanıcının bütçesi etkilenmez
+
+
+def test_call_is_rejected_with_429_when_the_wait_exceeds_max_wait():
+    upstream = scheduler(user_rate=1, user_burst=1, max_wait=0.2)
+    upstream.acquire("u1")
+    with pytest.raises(SpotifyException) as error:
+        upstream.acquire("u1")
+    assert error.value.http_status == 429
+    assert error.value.headers['Retry-After'] == "1"
+
+
+def test_per_call_max_wait_overrides_the_default():
+    upstream = scheduler(user_rate=4, user_burst=1, max_wait=5)
+    upstream.acquire("u1")
+    with pytest.raises(SpotifyException):
+        upstream.acquire("u1", max_wait=0.1)
+    assert timed(lambda: upstream.call(lambda: None, "u1")) < 0.5
+
+
+def test_background_calls_have_their_own_user_lane():
+    upstream = scheduler(user_rate=1, user_burst=2, user_background_rate=1, user_background_burst=2, max_wait=0.1)
+    upstream.acquire("u1", PRIORITY_BACKGROUND)
+    upstream.acquire("u1", PRIORITY_BACKGROUND)
+    with pytest.raises(SpotifyException):
+        upstream.acquire("u1", PRIORITY_BACKGROUND)
+    assert timed(lambda: [upstream.acquire("u1", PRIORITY_INTERACTIVE) for _ in range(2)]) < 0.05
+
+
+def test_background_waits_while_interactive_calls_are_queued():
+    upstream = scheduler(app_rate=20, app_burst=1, max_wait=2)
+    upstream.acquire() # Uygulama kovası boşaldı
+    order = []
+    interactive = threading.Thread(target=lambda: (upstream.acquire(), order.append("interactive")))
+    background = threading.Thread(target=lambda: (upstream.acquire(priority=PRIORITY_BACKGROUND), order.append("background")))
+    background.start()
+    time.sleep(0.01)
+    interactive.start()
+    interactive.join()
+    background.join()
+    assert order == ["interactive", "background"]
+
+
+def test_background_keeps_the_reserve_for_interactive_calls():
+    upstream = scheduler(app_rate=1, app_burst=4, background_reserve=0.5, max_wait=0.1)
+    upstream.acquire(priority=PRIORITY_BACKGROUND)
+    upstream.acquire(priority=PRIORITY_BACKGROUND)
+    with pytest.raises(SpotifyException):
+        upstream.acquire(priority=PRIORITY_BACKGROUND)
+    upstream.acquire() # Etkileşimli çağrılar rezervi kullanabilir
+    upstream.acquire()
+
+
+def test_rate_limited_call_is_retried_after_retry_after():
+    upstream = scheduler()
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise SpotifyException(429, -1, "rate limited", headers={'Retry-After': '0.2'})
+        return "ok"
+
+    assert upstream.call(fn, "u1") == "ok"
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.19
+
+
+def test_rate_limit_blocks_other_callers_too():
+    upstream = scheduler()
+    upstream.on_rate_limited(0.2)
+    assert timed(lambda: upstream.acquire("other")) >= 0.19
+
+
+def test_non_429_errors_are_not_retried():
+    upstream = scheduler()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise SpotifyException(404, -1, "not found")
+
+    with pytest.raises(SpotifyException):
+        upstream.call(fn)
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_retries():
+    upstream = scheduler(max_retries=1)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise SpotifyException(429, -1, "rate limited", headers={'Retry-After': '0'})
+
+    with pytest.raises(SpotifyException):
+        upstream.call(fn)
+    assert len(calls) == 2
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from flask import Flask, session
+
+from session_store import MemorySessionBackend, SQLiteSessionBackend, ServerSideSessionInterface
+
+
+def make_app(backend, touch_interval=3600):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSideSessionInterface(backend, touch_interval=touch_interval)
+
+    @app.route("/visit")
+    def visit():
+        session['user_data'] = {"id": "visitor"}
+        return "ok"
+
+    @app.route("/login")
+    def login():
+        session['token_info'] = {"access_token": "a", "refresh_token": "r", "expires_at": int(time.time()) + 3600}
+        return "ok"
+
+    @app.route("/me")
+    def me():
+        return (session.get('token_info') or {}).get('access_token') or "anon"
+
+    return app
+
+
+def current_sid(app, client):
+    return app.session_interface._signer(app).unsign(client.get_cookie("session").value).decode()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionBackend()
+    return SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"))
+
+
+def test_login_rotates_session_id(backend):
+    app = make_app(backend)
+    client = app.test_client()
+    client.get("/visit")
+    fixed_sid = current_sid(app, client)
+
+    client.get("/login")
+    sid = current_sid(app, client)
+    assert sid != fixed_sid
+    assert backend.get(fixed_sid) is None
+    assert backend.get(sid).access_token == "a"
+    assert client.get("/me").text == "a"
+
+
+def test_token_refresh_keeps_session_id(backend):
+    app = make_app(backend)
+    client = app.test_client()
+    client.get("/login")
+    sid = current_sid(app, client)
+    client.get("/login")
+    assert current_sid(app, client) == sid
+
+
+def test_access_extends_expiry(backend):
+    app = make_app(backend, touch_interval=0)
+    app.permanent_session_lifetime = 2
+    client = app.test_client()
+    client.get("/login")
+    for _ in range(3):
+        time.sleep(1)
+        assert client.get("/me").text == "a"
+    time.sleep(2.2)
+    assert client.get("/me").text == "anon"
+
+
+def test_sqlite_backend_purges_expired_sessions_on_write(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite3"), purge_interval=0)
+    app = make_app(backend)
+    app.permanent_session_lifetime = 0.2
+    for _ in range(3):
+        app.test_client().get("/login")
+    time.sleep(0.3)
+    app.permanent_session_lifetime = 60
+    app.test_client().get("/login")
+    rows = backend._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    assert rows == 1
@@ -0,0 +1,21 @@
+from spotify_client import SpotifyClientManager
+from scheduler import PRIORITY_BACKGROUND
+
+
+def test_clients_are_cached_per_user_key():
+    manager = SpotifyClientManager()
+    anonymous = manager.for_token("tok")
+    client = manager.for_token("tok", user_key="user-1")
+    assert client is not anonymous
+    assert client.user_key == "user-1" and anonymous.user_key == "tok"
+    assert manager.for_token("tok", user_key="user-1") is client
+
+
+def test_evict_drops_every_client_of_the_token():
+    manager = SpotifyClientManager()
+    clients = [manager.for_token("tok"), manager.for_token("tok", user_key="user-1", priority=PRIORITY_BACKGROUND, max_wait=1)]
+    other = manager.for_token("other", user_key="user-1")
+    manager.evict("tok")
+    assert manager.for_token("tok") is not clients[0]
+    assert manager.for_token("tok", user_key="user-1", priority=PRIORITY_BACKGROUND, max_wait=1) is not clients[1]
+    assert manager.for_token("other", user_key="user-1") is other
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from token_refresh import TokenRefresher, TokenRefreshUnavailable
+
+
+class FakeOAuth:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def refresh_access_token(self, refresh_token):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("invalid_grant")
+        return {"access_token": f"new-{refresh_token}", "refresh_token": refresh_token, "expires_at": time.time() + 3600}
+
+
+def token(expires_in=-10, refresh_token="rt-1"):
+    return {"access_token": "old", "refresh_token": refresh_token, "expires_at": time.time() + expires_in}
+
+
+def test_concurrent_refreshes_share_one_call():
+    oauth = FakeOAuth(delay=0.1)
+    refresher = TokenRefresher(oauth)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(refresher.refresh(token()))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert oauth.calls == 1
+    assert {result["access_token"] for result in results} == {"new-rt-1"}
+
+
+def test_latest_returns_token_refreshed_by_another_request():
+    refresher = TokenRefresher(FakeOAuth())
+    old = token()
+    refresher.refresh(old)
+    assert refresher.latest(old)["access_token"] == "new-rt-1"
+    assert refresher.latest(token(refresh_token="other")) is not None
+
+
+def test_timeout_raises_unavailable_and_refresh_continues():
+    oauth = FakeOAuth(delay=0.3)
+    refresher = TokenRefresher(oauth, timeout=0.05)
+    old = token()
+    with pytest.raises(TokenRefreshUnavailable):
+        refresher.refresh(old)
+    time.sleep(0.4)
+    assert refresher.latest(old)["access_token"] == "new-rt-1"
+    assert oauth.calls == 1
+
+
+def test_refresh_ahead_backs_off_after_failure():
+    oauth = FakeOAuth(fail=True)
+    refresher = TokenRefresher(oauth, refresh_ahead=300, backoff=0.2)
+    expiring = token(expires_in=100)
+    refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.05)
+    for _ in range(5):
+        refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.05)
+    assert oauth.calls == 1
+
+    time.sleep(0.2)
+    refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.05)
+    assert oauth.calls == 2
+
+    # Bekleme süresi her hatada ikiye katlanır
+    time.sleep(0.25)
+    refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.05)
+    assert oauth.calls == 2
+
+
+def test_success_clears_backoff():
+    oauth = FakeOAuth(fail=True)
+    refresher = TokenRefresher(oauth, refresh_ahead=300, backoff=0.1)
+    expiring = token(expires_in=100)
+    refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.15)
+    oauth.fail = False
+    refresher.refresh_ahead_of_expiry(expiring)
+    time.sleep(0.05)
+    assert oauth.calls == 2
+    assert refresher.latest(expiring)["access_token"] == "new-rt-1"
+
+
+def test_not_refreshed_when_far_from_expiry():
+    oauth = FakeOAuth()
+    refresher = TokenRefresher(oauth, refresh_ahead=300)
+    refresher.refresh_ahead_of_expiry(token(expires_in=3000))
+    time.sleep(0.05)
+    assert oauth.calls == 0
+
+
+# --- get_token (uygulama) ---
+def _set_expires_at(client, expires_at):
+    with client.session_transaction() as session:
+        token_info = dict(session['token_info'])
+        token_info['expires_at'] = expires_at
+        session['token_info'] = token_info
+
+
+def _unavailable(token_info):
+    raise TokenRefreshUnavailable("test: zaman aşımı")
+
+
+def test_refresh_timeout_on_expired_token_returns_503_and_keeps_session(logged_in_client, app_module, monkeypatch):
+    _set_expires_at(logged_in_client, time.time() - 10)
+    monkeypatch.setattr(app_module.token_refresher, 'refresh', _unavailable)
+    response = logged_in_client.get('/user_data')
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    with logged_in_client.session_transaction() as session:
+        assert session.get('token_info') and session.get('user_data')
+
+
+def test_refresh_timeout_serves_token_that_has_not_expired_yet(logged_in_client, app_module, monkeypatch):
+    _set_expires_at(logged_in_client, time.time() + 30) # is_token_expired 60 sn erken True döner
+    monkeypatch.setattr(app_module.token_refresher, 'refresh', _unavailable)
+    response = logged_in_client.get('/user_data')
+    assert response.status_code == 200
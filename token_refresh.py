@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import requests
+
+from cache import TTLCache
+from metrics import TOKEN_REFRESHES
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_AHEAD = int(os.environ.get("TOKEN_REFRESH_AHEAD", 5 * 60)) # Süre dolmadan bu kadar saniye önce arka planda yenile
+TOKEN_REFRESH_TIMEOUT = float(os.environ.get("TOKEN_REFRESH_TIMEOUT", 10)) # saniye
+TOKEN_REFRESH_CACHE_SIZE = int(os.environ.get("TOKEN_REFRESH_CACHE_SIZE", 4096))
+TOKEN_REFRESH_BACKOFF = float(os.environ.get("TOKEN_REFRESH_BACKOFF", 5)) # saniye; başarısız arka plan yenilemesinden sonra ilk bekleme
+TOKEN_REFRESH_BACKOFF_MAX = float(os.environ.get("TOKEN_REFRESH_BACKOFF_MAX", 5 * 60)) # saniye; bekleme her hatada ikiye katlanır
+
+
+class TokenRefreshUnavailable(Exception):
+    """Yenileme zaman aşımına uğradığında veya Accounts servisine ulaşılamadığında fırlatılır (geçici hata, oturum korunur)."""
+
+
+class TokenRefresher:
+    """
+    Access token yenilemelerini kullanıcı (refresh_token) başına tek bir çağrıda birleştirir.
+
+    Aynı anda gelen istekler aynı yenilemeyi bekler; süresi dolmak üzere olan token'lar ise istek
+    beklemeden arka planda yenilenir. Yenilenen token'lar eski refresh_token ile saklanır, böylece
+    hâlâ eski token'ı taşıyan istekler latest() ile yenisini alıp session'a yazabilir.
+    Arka plan yenilemesi başarısız olursa aynı token için üstel artan bir süre (backoff) yeniden denenmez.
+    """
+
+    def __init__(self, oauth, on_refresh=None, refresh_ahead=TOKEN_REFRESH_AHEAD, timeout=TOKEN_REFRESH_TIMEOUT,
+                 backoff=TOKEN_REFRESH_BACKOFF, backoff_max=TOKEN_REFRESH_BACKOFF_MAX):
+        self.oauth = oauth
+        self.on_refresh = on_refresh
+        self.refresh_ahead = refresh_ahead
+        self.timeout = timeout
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._refreshed = TTLCache(maxsize=TOKEN_REFRESH_CACHE_SIZE, ttl=60 * 60) # refresh_token -> yeni token_info
+        self._failures = TTLCache(maxsize=TOKEN_REFRESH_CACHE_SIZE, ttl=backoff_max) # refresh_token -> (hata sayısı, tekrar deneme zamanı)
+        self._inflight = {} # refresh_token -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="token-refresh")
+
+    def latest(self, token_info):
+        """Başka bir istekte yenilenmiş daha güncel bir token varsa onu, yoksa token_info'yu döndürür."""
+        newer = self._refreshed.get(token_info.get('refresh_token'))
+        if newer and newer.get('expires_at', 0) > token_info.get('expires_at', 0):
+            return newer
+        return token_info
+
+    def refresh(self, token_info):
+        """
+        Token'ı yeniler ve sonucu bekler. Devam eden bir yenileme varsa ona katılır.
+        Zaman aşımı veya bağlantı hatasında TokenRefreshUnavailable fırlatılır; yenileme arka planda sürer.
+        """
+        try:
+            return self._submit(token_info).result(timeout=self.timeout)
+        except FuturesTimeoutError as e:
+            raise TokenRefreshUnavailable(f"Token yenileme {self.timeout} saniyede tamamlanmadı.") from e
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.RetryError) as e:
+            raise TokenRefreshUnavailable(f"Spotify Accounts servisine ulaşılamadı: {e}") from e
+
+    def refresh_ahead_of_expiry(self, token_info):
+        """
+        Token'ın süresinin dolmasına refresh_ahead saniyeden az kaldıysa arka planda yenilemeyi başlatır.
+        Son denemesi başarısız olan token'lar için bekleme süresi dolmadan yeniden denenmez.
+        """
+        expires_at = token_info.get('expires_at')
+        refresh_token = token_info.get('refresh_token')
+        if not expires_at or not refresh_token or expires_at - time.time() >= self.refresh_ahead:
+            return
+        failure = self._failures.get(refresh_token)
+        if failure and failure[1] > time.monotonic():
+            return
+        self._submit(token_info)
+
+    def _submit(self, token_info):
+        refresh_token = token_info['refresh_token']
+        with self._lock:
+            future = self._inflight.get(refresh_token)
+            if future is None:
+                future = self._executor.submit(self._do_refresh, token_info)
+                self._inflight[refresh_token] = future
+        return future
+
+    def _do_refresh(self, token_info):
+        refresh_token = token_info['refresh_token']
+        try:
+            logger.info("Spotify token yenileniyor...")
+            new_token_info = self.oauth.refresh_access_token(refresh_token)
+            self._refreshed.set(refresh_token, new_token_info)
+            self._failures.pop(refresh_token)
+            if self.on_refresh:
+                self.on_refresh(token_info, new_token_info)
+            logger.info("Token başarıyla yenilendi.")
+            TOKEN_REFRESHES.inc("success")
+            return new_token_info
+        except Exception as e:
+            TOKEN_REFRESHES.inc("failure")
+            failures = (self._failures.get(refresh_token) or (0, 0))[0] + 1
+            delay = min(self.backoff * 2 ** (failures - 1), self.backoff_max)
+            self._failures.set(refresh_token, (failures, time.monotonic() + delay))
+            logger.warning(f"Token yenilenemedi ({failures}. deneme, arka planda {delay:.0f} sn sonra tekrar denenecek): {e}")
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(refresh_token, None)